@@ -0,0 +1,130 @@
+-- Per-user running counters in metrics, maintained by statement-level triggers
+--
+-- metric_key                 counts
+--   sent_type_0 .. sent_type_3   send_log rows per send_type (0=main, 1-3=reminders)
+--   contacts_replied             professor_contact rows with contact_status = 3
+--   queue_pending                email_queue rows with status = 0
+--   counters_ready               1 once api/user_counters.py has backfilled the user
+--
+-- Each trigger fires once per statement and aggregates its transition table, so a
+-- bulk insert of N rows costs one upsert per (user, key), not N.
+
+----------------------------
+-- HELPER
+----------------------------
+CREATE OR REPLACE FUNCTION metrics_add(p_users CITEXT[], p_keys TEXT[], p_deltas BIGINT[])
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO metrics (user_email, metric_key, metric_value, updated_at)
+    SELECT u, k, d, now()
+    FROM unnest(p_users, p_keys, p_deltas) AS t(u, k, d)
+    WHERE d <> 0
+    ORDER BY u, k                      -- fixed lock order between concurrent writers
+    ON CONFLICT (user_email, metric_key)
+    DO UPDATE SET metric_value = COALESCE(metrics.metric_value, 0) + EXCLUDED.metric_value,
+                  updated_at = now();
+$$;
+
+----------------------------
+-- SEND LOG
+----------------------------
+CREATE OR REPLACE FUNCTION counters_send_log() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM metrics_add(array_agg(user_email), array_agg(metric_key), array_agg(delta))
+        FROM (SELECT user_email, 'sent_type_' || send_type AS metric_key, count(*) AS delta
+              FROM new_rows GROUP BY 1, 2) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM metrics_add(array_agg(user_email), array_agg(metric_key), array_agg(delta))
+        FROM (SELECT user_email, 'sent_type_' || send_type AS metric_key, -count(*) AS delta
+              FROM old_rows GROUP BY 1, 2) d;
+    ELSE
+        PERFORM metrics_add(array_agg(user_email), array_agg(metric_key), array_agg(delta))
+        FROM (SELECT user_email, metric_key, sum(delta) AS delta
+              FROM (SELECT user_email, 'sent_type_' || send_type AS metric_key, 1 AS delta FROM new_rows
+                    UNION ALL
+                    SELECT user_email, 'sent_type_' || send_type, -1 FROM old_rows) c
+              GROUP BY 1, 2) d;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_send_log_counters_ins ON send_log;
+DROP TRIGGER IF EXISTS trg_send_log_counters_upd ON send_log;
+DROP TRIGGER IF EXISTS trg_send_log_counters_del ON send_log;
+CREATE TRIGGER trg_send_log_counters_ins AFTER INSERT ON send_log
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION counters_send_log();
+CREATE TRIGGER trg_send_log_counters_upd AFTER UPDATE ON send_log
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION counters_send_log();
+CREATE TRIGGER trg_send_log_counters_del AFTER DELETE ON send_log
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION counters_send_log();
+
+----------------------------
+-- PROFESSOR CONTACT
+----------------------------
+CREATE OR REPLACE FUNCTION counters_professor_contact() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM metrics_add(array_agg(user_email), array_agg('contacts_replied'::text), array_agg(delta))
+        FROM (SELECT user_email, count(*) AS delta
+              FROM new_rows WHERE contact_status = 3 GROUP BY 1) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM metrics_add(array_agg(user_email), array_agg('contacts_replied'::text), array_agg(delta))
+        FROM (SELECT user_email, -count(*) AS delta
+              FROM old_rows WHERE contact_status = 3 GROUP BY 1) d;
+    ELSE
+        PERFORM metrics_add(array_agg(user_email), array_agg('contacts_replied'::text), array_agg(delta))
+        FROM (SELECT user_email, sum(delta) AS delta
+              FROM (SELECT user_email, 1 AS delta FROM new_rows WHERE contact_status = 3
+                    UNION ALL
+                    SELECT user_email, -1 FROM old_rows WHERE contact_status = 3) c
+              GROUP BY 1) d;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_professor_contact_counters_ins ON professor_contact;
+DROP TRIGGER IF EXISTS trg_professor_contact_counters_upd ON professor_contact;
+DROP TRIGGER IF EXISTS trg_professor_contact_counters_del ON professor_contact;
+CREATE TRIGGER trg_professor_contact_counters_ins AFTER INSERT ON professor_contact
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION counters_professor_contact();
+CREATE TRIGGER trg_professor_contact_counters_upd AFTER UPDATE ON professor_contact
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION counters_professor_contact();
+CREATE TRIGGER trg_professor_contact_counters_del AFTER DELETE ON professor_contact
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION counters_professor_contact();
+
+----------------------------
+-- EMAIL QUEUE
+----------------------------
+CREATE OR REPLACE FUNCTION counters_email_queue() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM metrics_add(array_agg(user_email), array_agg('queue_pending'::text), array_agg(delta))
+        FROM (SELECT user_email, count(*) AS delta
+              FROM new_rows WHERE status = 0 GROUP BY 1) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM metrics_add(array_agg(user_email), array_agg('queue_pending'::text), array_agg(delta))
+        FROM (SELECT user_email, -count(*) AS delta
+              FROM old_rows WHERE status = 0 GROUP BY 1) d;
+    ELSE
+        PERFORM metrics_add(array_agg(user_email), array_agg('queue_pending'::text), array_agg(delta))
+        FROM (SELECT user_email, sum(delta) AS delta
+              FROM (SELECT user_email, 1 AS delta FROM new_rows WHERE status = 0
+                    UNION ALL
+                    SELECT user_email, -1 FROM old_rows WHERE status = 0) c
+              GROUP BY 1) d;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_email_queue_counters_ins ON email_queue;
+DROP TRIGGER IF EXISTS trg_email_queue_counters_upd ON email_queue;
+DROP TRIGGER IF EXISTS trg_email_queue_counters_del ON email_queue;
+CREATE TRIGGER trg_email_queue_counters_ins AFTER INSERT ON email_queue
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION counters_email_queue();
+CREATE TRIGGER trg_email_queue_counters_upd AFTER UPDATE ON email_queue
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION counters_email_queue();
+CREATE TRIGGER trg_email_queue_counters_del AFTER DELETE ON email_queue
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION counters_email_queue();
@@ -0,0 +1,67 @@
+-- Per-user change events over NOTIFY applyche_events, relayed to clients by api/event_hub.py
+--
+-- payload: {"user": <email>, "type": <type>, "data": {...}}
+--   counters   every metrics_add call: {"<metric_key>": <delta>, ...}
+--   queue      every statement changing email_queue: {"op", "count", "by_status", "ids"}
+--              (by_status counts the new status; ids lists at most the first 100)
+--   send       written by api/queue_worker.py for each send outcome
+--
+-- NOTIFY is transactional: listeners only see changes that were committed.
+-- Payloads must stay under 8000 bytes, hence the cap on ids.
+
+----------------------------
+-- COUNTER DELTAS
+----------------------------
+CREATE OR REPLACE FUNCTION metrics_add(p_users CITEXT[], p_keys TEXT[], p_deltas BIGINT[])
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO metrics (user_email, metric_key, metric_value, updated_at)
+    SELECT u, k, d, now()
+    FROM unnest(p_users, p_keys, p_deltas) AS t(u, k, d)
+    WHERE d <> 0
+    ORDER BY u, k                      -- fixed lock order between concurrent writers
+    ON CONFLICT (user_email, metric_key)
+    DO UPDATE SET metric_value = COALESCE(metrics.metric_value, 0) + EXCLUDED.metric_value,
+                  updated_at = now();
+
+    SELECT pg_notify('applyche_events', json_build_object(
+               'user', u, 'type', 'counters', 'data', json_object_agg(k, d))::text)
+    FROM unnest(p_users, p_keys, p_deltas) AS t(u, k, d)
+    WHERE d <> 0
+    GROUP BY u;
+$$;
+
+----------------------------
+-- EMAIL QUEUE
+----------------------------
+CREATE OR REPLACE FUNCTION events_email_queue() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('applyche_events', json_build_object(
+                    'user', user_email, 'type', 'queue',
+                    'data', json_build_object('op', 'delete', 'count', n, 'ids', ids))::text)
+        FROM (SELECT user_email, count(*) AS n, (array_agg(id ORDER BY id))[1:100] AS ids
+              FROM old_rows GROUP BY 1) e;
+    ELSE
+        PERFORM pg_notify('applyche_events', json_build_object(
+                    'user', s.user_email, 'type', 'queue',
+                    'data', json_build_object('op', lower(TG_OP), 'count', s.n,
+                                              'by_status', s.by_status, 'ids', i.ids))::text)
+        FROM (SELECT user_email, sum(n) AS n, json_object_agg(status, n) AS by_status
+              FROM (SELECT user_email, status, count(*) AS n FROM new_rows GROUP BY 1, 2) c
+              GROUP BY 1) s
+        JOIN (SELECT user_email, (array_agg(id ORDER BY id))[1:100] AS ids
+              FROM new_rows GROUP BY 1) i USING (user_email);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_email_queue_events_ins ON email_queue;
+DROP TRIGGER IF EXISTS trg_email_queue_events_upd ON email_queue;
+DROP TRIGGER IF EXISTS trg_email_queue_events_del ON email_queue;
+CREATE TRIGGER trg_email_queue_events_ins AFTER INSERT ON email_queue
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION events_email_queue();
+CREATE TRIGGER trg_email_queue_events_upd AFTER UPDATE ON email_queue
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION events_email_queue();
+CREATE TRIGGER trg_email_queue_events_del AFTER DELETE ON email_queue
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION events_email_queue();
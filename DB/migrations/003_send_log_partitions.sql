@@ -0,0 +1,116 @@
+-- send_log partitioned by month of sent_time
+--
+-- Partitions are named send_log_yYYYYmMM and cover one UTC calendar month. The
+-- queue worker keeps the coming months created (api/send_log_partitions.py);
+-- send_log_default only catches rows outside every partition and is emptied into
+-- the right partition when that month is created. Old months are detached and
+-- moved to the send_log_archive schema (or dropped) by
+--     python -m api.send_log_partitions --keep-months 24
+--
+-- The primary key becomes (id, sent_time): a partitioned table's unique
+-- constraints must include the partition key. Ids still come from send_log_id_seq.
+
+----------------------------
+-- PARTITION MAINTENANCE
+----------------------------
+CREATE OR REPLACE FUNCTION send_log_ensure_partitions(p_from DATE, p_months INT)
+RETURNS int LANGUAGE plpgsql AS $$
+DECLARE
+    v_month   DATE := date_trunc('month', p_from)::date;
+    v_name    TEXT;
+    v_lower   TIMESTAMPTZ;
+    v_upper   TIMESTAMPTZ;
+    v_created INT := 0;
+BEGIN
+    FOR i IN 1 .. p_months LOOP
+        v_name  := 'send_log_y' || to_char(v_month, 'YYYY') || 'm' || to_char(v_month, 'MM');
+        v_lower := v_month::timestamp AT TIME ZONE 'UTC';
+        v_upper := (v_month + interval '1 month')::timestamp AT TIME ZONE 'UTC';
+
+        IF to_regclass(v_name) IS NULL THEN
+            IF to_regclass('send_log_default') IS NOT NULL
+               AND EXISTS (SELECT 1 FROM send_log_default WHERE sent_time >= v_lower AND sent_time < v_upper) THEN
+                -- A partition cannot be created over rows in the default partition: move them first
+                EXECUTE format('CREATE TABLE %I (LIKE send_log INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', v_name);
+                EXECUTE format('WITH moved AS (DELETE FROM send_log_default WHERE sent_time >= %L AND sent_time < %L RETURNING *)
+                                INSERT INTO %I SELECT * FROM moved', v_lower, v_upper, v_name);
+                EXECUTE format('ALTER TABLE send_log ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                               v_name, v_lower, v_upper);
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF send_log FOR VALUES FROM (%L) TO (%L)',
+                               v_name, v_lower, v_upper);
+            END IF;
+            v_created := v_created + 1;
+        END IF;
+
+        v_month := (v_month + interval '1 month')::date;
+    END LOOP;
+    RETURN v_created;
+END;
+$$;
+
+----------------------------
+-- CONVERT AN EXISTING PLAIN TABLE
+----------------------------
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'send_log'::regclass) = 'r' THEN
+        ALTER TABLE send_log RENAME TO send_log_unpartitioned;
+        ALTER INDEX send_log_pkey RENAME TO send_log_unpartitioned_pkey;
+        ALTER INDEX IF EXISTS idx_send_log_user_time RENAME TO idx_send_log_unpartitioned_user_time;
+
+        CREATE TABLE send_log (
+            id BIGINT NOT NULL DEFAULT nextval('send_log_id_seq'),
+            user_email CITEXT NOT NULL REFERENCES users(email) ON DELETE CASCADE,
+            sent_to CITEXT NOT NULL,
+            sent_time TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            subject TEXT,
+            body TEXT,
+            template_id INTEGER REFERENCES email_templates(id) ON DELETE SET NULL,
+            send_type SMALLINT NOT NULL,
+            delivery_status SMALLINT NOT NULL,
+            remote_message_id TEXT,
+            PRIMARY KEY (id, sent_time)
+        ) PARTITION BY RANGE (sent_time);
+        ALTER SEQUENCE send_log_id_seq OWNED BY send_log.id;
+        CREATE INDEX idx_send_log_user_time ON send_log (user_email, sent_time DESC);
+        CREATE TABLE send_log_default PARTITION OF send_log DEFAULT;
+
+        -- One partition per month of history, up to the current month
+        PERFORM send_log_ensure_partitions(
+            first_month,
+            ((extract(year FROM age(this_month, first_month)) * 12
+              + extract(month FROM age(this_month, first_month)))::int + 1))
+        FROM (SELECT date_trunc('month', now() AT TIME ZONE 'UTC')::date AS this_month,
+                     COALESCE(date_trunc('month', min(sent_time) AT TIME ZONE 'UTC'),
+                              date_trunc('month', now() AT TIME ZONE 'UTC'))::date AS first_month
+              FROM send_log_unpartitioned) m;
+
+        -- Before the counter triggers exist: history is already counted
+        INSERT INTO send_log (id, user_email, sent_to, sent_time, subject, body, template_id,
+                              send_type, delivery_status, remote_message_id)
+        SELECT id, user_email, sent_to, sent_time, subject, body, template_id,
+               send_type, delivery_status, remote_message_id
+        FROM send_log_unpartitioned;
+
+        DROP TABLE send_log_unpartitioned;
+    END IF;
+END;
+$$;
+
+-- Tables created from api/db_models.py are partitioned already but have no partitions yet
+CREATE TABLE IF NOT EXISTS send_log_default PARTITION OF send_log DEFAULT;
+SELECT send_log_ensure_partitions(date_trunc('month', now() AT TIME ZONE 'UTC')::date, 4);
+
+----------------------------
+-- COUNTER TRIGGERS (see 001_user_counters.sql)
+----------------------------
+DROP TRIGGER IF EXISTS trg_send_log_counters_ins ON send_log;
+DROP TRIGGER IF EXISTS trg_send_log_counters_upd ON send_log;
+DROP TRIGGER IF EXISTS trg_send_log_counters_del ON send_log;
+CREATE TRIGGER trg_send_log_counters_ins AFTER INSERT ON send_log
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION counters_send_log();
+CREATE TRIGGER trg_send_log_counters_upd AFTER UPDATE ON send_log
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION counters_send_log();
+CREATE TRIGGER trg_send_log_counters_del AFTER DELETE ON send_log
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION counters_send_log();
@@ -0,0 +1,19 @@
+-- Mark users created from now on with counters_ready
+--
+-- A new user has no send_log, professor_contact or email_queue rows yet, and the
+-- triggers of 001_user_counters.sql count every row added later, so their counters
+-- are exact from the start without a backfill. Without the marker the dashboard
+-- would keep counting their history row by row.
+
+CREATE OR REPLACE FUNCTION counters_new_users() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO metrics (user_email, metric_key, metric_value, updated_at)
+    SELECT email, 'counters_ready', 1, now() FROM new_rows
+    ON CONFLICT (user_email, metric_key) DO NOTHING;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_users_counters_ready ON users;
+CREATE TRIGGER trg_users_counters_ready AFTER INSERT ON users
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION counters_new_users();
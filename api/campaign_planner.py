@@ -0,0 +1,277 @@
+"""
+Campaign planner
+
+Turns a user's sending rules and professor contacts into the complete
+email_queue schedule (main email plus every enabled reminder) with vectorized
+date arithmetic, and inserts it with a single bulk INSERT.
+
+Rules are read as follows:
+- main_mail_number / reminder_one / reminder_two / reminder_three: emails of that
+  kind sent per sending day; a reminder set to 0 ends the chain there
+- period_between_reminders: sending days between one email and the next reminder
+- send_working_day_only: sending days are Monday to Friday
+- start_time_send: time of the first email of a day, in the professor's
+  timezone when local_professor_time is set (see api/send_windows.py), else UTC
+- delay_sending_mail: minutes between two emails of the same day
+
+A day holds only as many emails as fit between start_time_send and the end of
+the send window (17:00, see api/send_windows.py) at that spacing; the rest spill
+into the following sending days, keeping each reminder at least
+period_between_reminders sending days after the email before it.
+"""
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, insert, exists, func
+from sqlalchemy.orm import Session
+
+from api.db_models import (
+    ContactStatus,
+    Department,
+    EmailQueue,
+    EmailQueueStatus,
+    EmailTemplate,
+    Professor,
+    ProfessorContact,
+    SendingRules,
+    SendType,
+    University,
+)
+from api.send_windows import (
+    DEFAULT_END_TIME,
+    DEFAULT_SPACING_MINUTES,
+    DEFAULT_START_TIME,
+    MINUTES_PER_DAY,
+    from_minutes,
+    local_to_utc,
+    position_country,
+    resolve_zones,
+    time_to_minutes,
+    to_minutes,
+)
+from controller.mail_merge import CompiledTemplate, template_text
+
+DEFAULT_START_MINUTES = 9 * 60
+
+REMINDERS = [
+    (SendType.FIRST_REMINDER, "reminder_one"),
+    (SendType.SECOND_REMINDER, "reminder_two"),
+    (SendType.THIRD_REMINDER, "reminder_three"),
+]
+
+PLAN_COLUMNS = [
+    "contact_id", "to_email", "university_id", "country", "subject", "body",
+    "template_id", "send_type", "day", "slot", "scheduled_at",
+]
+
+
+class CampaignPlanError(ValueError):
+    """The user's rules, templates or contacts do not allow a campaign to be planned"""
+
+
+def load_contacts(db: Session, user_email: str) -> pd.DataFrame:
+    """
+    Active, not yet replied and not yet queued contacts of a user, in contact order.
+    Column names double as the placeholders available to templates.
+    """
+    already_queued = exists().where(
+        EmailQueue.user_email == ProfessorContact.user_email,
+        EmailQueue.to_email == ProfessorContact.professor_email,
+    )
+    result = db.execute(
+        select(
+            ProfessorContact.id.label("contact_id"),
+            Professor.email.label("email"),
+            Professor.name.label("name"),
+            Professor.major.label("major"),
+            University.id.label("university_id"),
+            University.name.label("university"),
+            func.coalesce(University.country, position_country(Professor.email)).label("country"),
+            Department.university_deparment_name.label("department"),
+        )
+        .join(Professor, Professor.email == ProfessorContact.professor_email)
+        .outerjoin(University, University.id == Professor.university_id)
+        .outerjoin(Department, Department.id == Professor.department_id)
+        .where(
+            ProfessorContact.user_email == user_email,
+            ProfessorContact.is_active.is_(True),
+            ProfessorContact.contact_status != ContactStatus.REPLIED,
+            ~already_queued,
+        )
+        .order_by(ProfessorContact.id)
+    )
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def latest_templates(db: Session, user_email: str) -> Dict[int, EmailTemplate]:
+    """Most recent template of each type for a user"""
+    templates = db.execute(
+        select(EmailTemplate)
+        .where(EmailTemplate.user_email == user_email)
+        .order_by(EmailTemplate.template_type, EmailTemplate.created_at.desc())
+    ).scalars()
+    latest: Dict[int, EmailTemplate] = {}
+    for template in templates:
+        latest.setdefault(template.template_type, template)
+    return latest
+
+
+def pack_days(arrival: np.ndarray, per_day: int) -> np.ndarray:
+    """
+    First-come-first-served sending days: item i goes out on the earliest day
+    >= arrival[i] while no day receives more than `per_day` items.
+
+    Items i, i + per_day, i + 2 * per_day, ... share a "lane" that carries one item
+    per day, so within a lane day[m] = max(arrival[m], day[m - 1] + 1), which is
+    m + cummax(arrival[m] - m) and can be computed for all lanes at once.
+    """
+    arrival = np.asarray(arrival, dtype=np.int64)
+    index = np.arange(len(arrival))
+    rank = index // per_day
+    lane = index % per_day
+    return pd.Series(arrival - rank).groupby(lane).cummax().to_numpy() + rank
+
+
+def plan_campaign(db: Session, user_email: str, start_at: Optional[datetime] = None) -> pd.DataFrame:
+    """Compute the full main + reminders timeline for every eligible contact of a user."""
+    rules = db.execute(select(SendingRules).where(SendingRules.user_email == user_email)).scalar_one_or_none()
+    if rules is None:
+        raise CampaignPlanError("Sending rules not found")
+    templates = latest_templates(db, user_email)
+    if SendType.MAIN not in templates:
+        raise CampaignPlanError("No main email template")
+
+    contacts = load_contacts(db, user_email)
+    n = len(contacts)
+    if n == 0:
+        return pd.DataFrame(columns=PLAN_COLUMNS)
+
+    # Sending-day index of every email, per kind of email
+    streams = [(SendType.MAIN, pack_days(np.zeros(n, dtype=np.int64), max(rules.main_mail_number, 1)))]
+    period = max(rules.period_between_reminders, 1)
+    for send_type, per_day_attr in REMINDERS:
+        per_day = getattr(rules, per_day_attr)
+        if per_day <= 0 or send_type not in templates:
+            break
+        streams.append((send_type, pack_days(streams[-1][1] + period, per_day)))
+
+    main_subject = templates[SendType.MAIN].subject
+    parts = []
+    for send_type, days in streams:
+        template = templates[send_type]
+        try:
+            subjects = CompiledTemplate(template.subject or main_subject).render_all(contacts)
+            # GUI-saved bodies are toHtml() documents; emails are rendered from their text
+            bodies = CompiledTemplate(template_text(template.template_body)).render_all(contacts)
+        except (KeyError, ValueError) as e:
+            raise CampaignPlanError(
+                f"Template {template.id} cannot be rendered ({e}); "
+                f"available placeholders: {', '.join(contacts.columns)}"
+            )
+        parts.append(pd.DataFrame({
+            "position": np.arange(n),
+            "contact_id": contacts["contact_id"].to_numpy(),
+            "to_email": contacts["email"].to_numpy(),
+            "university_id": contacts["university_id"].to_numpy(),
+            "country": contacts["country"].to_numpy(),
+            "subject": subjects,
+            "body": bodies,
+            "template_id": template.id,
+            "send_type": send_type,
+            "day": days,
+        }))
+
+    plan = pd.concat(parts, ignore_index=True)
+    _fit_days(plan, daily_slots(rules), period)
+    plan["slot"] = plan.groupby("day").cumcount().to_numpy()
+    plan["scheduled_at"] = _timestamps(rules, plan, start_at)
+    return plan[PLAN_COLUMNS]
+
+
+def enqueue_campaign(db: Session, user_email: str, start_at: Optional[datetime] = None) -> pd.DataFrame:
+    """Plan a campaign and insert it into email_queue in one bulk INSERT (the caller commits)."""
+    plan = plan_campaign(db, user_email, start_at)
+    if not plan.empty:
+        records = (
+            plan[["to_email", "subject", "body", "template_id", "scheduled_at"]]
+            .assign(user_email=user_email, status=EmailQueueStatus.PENDING)
+            .to_dict("records")
+        )
+        db.execute(insert(EmailQueue), records)
+    return plan
+
+
+def daily_slots(rules: SendingRules) -> int:
+    """How many emails fit into one day's send window at the rules' spacing."""
+    start = time_to_minutes(rules.start_time_send, DEFAULT_START_TIME)
+    end = time_to_minutes(DEFAULT_END_TIME, DEFAULT_END_TIME)
+    window = (end if end > start else MINUTES_PER_DAY) - start
+    spacing = rules.delay_sending_mail or DEFAULT_SPACING_MINUTES
+    return max(-(-window // spacing), 1)
+
+
+def _fit_days(plan: pd.DataFrame, per_day: int, period: int) -> None:
+    """
+    Move emails a day cannot hold to the next sending days (first come, first
+    served, main emails first), then push back reminders that came closer than
+    `period` days to the email before them, until both hold. Sorts `plan` by
+    day, send type and contact in place.
+    """
+    while True:
+        plan.sort_values(["day", "send_type", "position"], kind="stable", inplace=True, ignore_index=True)
+        plan["day"] = pack_days(plan["day"].to_numpy(), per_day)
+        # Sending day of the previous email to the same contact (NaN for main emails)
+        previous = plan.set_index(["send_type", "position"])["day"].reindex(
+            pd.MultiIndex.from_arrays([plan["send_type"] - 1, plan["position"]])
+        ).to_numpy() + period
+        late = previous > plan["day"].to_numpy()
+        if not late.any():
+            return
+        plan.loc[late, "day"] = previous[late].astype(np.int64)
+
+
+def _timestamps(rules: SendingRules, plan: pd.DataFrame, start_at: Optional[datetime]) -> pd.Series:
+    start_at = start_at or datetime.now(timezone.utc)
+    if start_at.tzinfo is None:
+        start_at = start_at.replace(tzinfo=timezone.utc)
+    start_at = start_at.astimezone(timezone.utc)
+    now_minutes = to_minutes([start_at])[0]
+
+    start_minutes = DEFAULT_START_MINUTES
+    if rules.start_time_send is not None:
+        start_time = rules.start_time_send
+        start_minutes = start_time.hour * 60 + start_time.minute
+        offset = start_time.utcoffset()
+        if offset and not rules.local_professor_time:
+            start_minutes -= int(offset.total_seconds() // 60)
+
+    spacing = rules.delay_sending_mail or DEFAULT_SPACING_MINUTES
+    minutes = start_minutes + plan["slot"].to_numpy() * spacing
+    if rules.local_professor_time:
+        zones = resolve_zones(plan["country"])
+    else:
+        zones = np.full(len(plan), "UTC", dtype=object)
+
+    # Start one sending day later where today's window has already opened
+    # (in the professor's timezone when sending in local time)
+    first_day = np.datetime64(start_at.date(), "D")
+    day_index = plan["day"].to_numpy()
+    opened = local_to_utc(np.full(len(plan), first_day.astype(np.int64)), start_minutes, zones) <= now_minutes
+    days = np.where(
+        opened,
+        _sending_dates(rules, first_day + np.timedelta64(1, "D"), day_index),
+        _sending_dates(rules, first_day, day_index),
+    )
+    scheduled = local_to_utc(days, minutes, zones)
+    return from_minutes(scheduled)
+
+
+def _sending_dates(rules: SendingRules, first_day: np.datetime64, day_index: np.ndarray) -> np.ndarray:
+    """Days since the epoch of each sending-day index."""
+    if rules.send_working_day_only:
+        dates = np.busday_offset(first_day, day_index, roll="forward")
+    else:
+        dates = first_day + day_index.astype("timedelta64[D]")
+    return dates.astype(np.int64)
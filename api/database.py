@@ -2,10 +2,11 @@
 Database connection and utilities for FastAPI using SQLAlchemy
 """
 import os
-from typing import Generator
+from typing import AsyncGenerator, Generator
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from dotenv import load_dotenv
 from contextlib import contextmanager
 
@@ -23,17 +24,55 @@ DB_PORT = 5433
 # Using psycopg (psycopg3) driver
 DATABASE_URL = f"postgresql+psycopg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Connection pool settings (see model/server_info.env)
+# DB_POOL_MODE: "queue" keeps connections open between requests,
+# "null" opens one per checkout (use it behind an external pooler such as PgBouncer)
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+
+def engine_options(queue_pool=QueuePool) -> dict:
+    """Keyword arguments for create_engine / create_async_engine built from the pool settings"""
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    options = {
+        "echo": False,  # Set to True for SQL query logging
+        "connect_args": connect_args,
+    }
+    if DB_POOL_MODE == "null":
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=queue_pool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            pool_use_lifo=True,  # let surplus connections go idle and be recycled
+        )
+    return options
+
+
 # Create SQLAlchemy engine
 # Note: future=True is not needed in SQLAlchemy 2.0+
-engine = create_engine(
-    DATABASE_URL,
-    poolclass=NullPool,
-    echo=False,  # Set to True for SQL query logging
-)
+engine = create_engine(DATABASE_URL, **engine_options())
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the route handlers (psycopg async); it has its own pool with the same settings
+async_engine = create_async_engine(DATABASE_URL, **engine_options(queue_pool=AsyncAdaptedQueuePool))
+
+# expire_on_commit=False: objects stay readable after commit without an implicit (sync) reload
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -47,6 +86,37 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency function to get an async database session
+    Queries awaited on it do not block the event loop
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _pool_stats(pool) -> dict:
+    stats = {"status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+    return stats
+
+
+def get_pool_stats() -> dict:
+    """Live statistics of the sync and async connection pools"""
+    return {
+        "mode": DB_POOL_MODE,
+        **_pool_stats(engine.pool),
+        "async": _pool_stats(async_engine.pool),
+    }
+
+
 @contextmanager
 def get_db_session() -> Generator[Session, None, None]:
     """
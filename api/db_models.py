@@ -4,15 +4,16 @@ SQLAlchemy ORM models for ApplyChe database
 from sqlalchemy import (
     Column, Integer, BigInteger, String, Text, Boolean, SmallInteger,
     Numeric, Date, Time, DateTime, ForeignKey, UniqueConstraint, CheckConstraint,
-    Index, JSON
+    Index, JSON, text
 )
 from sqlalchemy.dialects.postgresql import CITEXT, JSONB
+from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
 
-class Base(DeclarativeBase):
+class Base(AsyncAttrs, DeclarativeBase):
     pass
 
 
@@ -20,6 +21,29 @@ class Base(DeclarativeBase):
 # for compatibility. The actual enum values are handled at the application level.
 
 
+class EmailQueueStatus:
+    """Values stored in email_queue.status"""
+    PENDING = 0
+    SENT = 1
+    FAILED = 2
+    RETRYING = 3
+    CLAIMED = 4  # leased by a queue worker, see api/queue_worker.py
+
+
+class SendType:
+    """Values stored in send_log.send_type (and email_templates.template_type)"""
+    MAIN = 0
+    FIRST_REMINDER = 1
+    SECOND_REMINDER = 2
+    THIRD_REMINDER = 3
+
+
+class ContactStatus:
+    """Values stored in professor_contact.contact_status"""
+    NOT_CONTACTED = 0
+    REPLIED = 3
+
+
 # ============================================
 # USERS / AUTH
 # ============================================
@@ -264,6 +288,7 @@ class ProfessorContact(Base):
         UniqueConstraint('user_email', 'professor_email', 'position_id', name='uq_prof_contact'),
         Index('idx_prof_contact_user', 'user_email'),
         Index('idx_prof_contact_prof', 'professor_email'),
+        Index('idx_prof_contact_user_replied', 'user_email', postgresql_where=text('contact_status = 3')),
     )
     
     # Relationships
@@ -343,7 +368,7 @@ class SendingRules(Base):
     send_working_day_only = Column(Boolean, server_default='true', nullable=False)
     period_between_reminders = Column(SmallInteger, server_default='7', nullable=False)
     delay_sending_mail = Column(SmallInteger, server_default='0', nullable=False)
-    start_time_send = Column(Time(timezone=True), server_default="'09:00:00'::time", nullable=True)
+    start_time_send = Column(Time(timezone=True), server_default=text("'09:00:00'::time"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     __table_args__ = (
@@ -373,8 +398,11 @@ class EmailQueue(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     __table_args__ = (
-        Index('idx_email_queue_status_sched', 'status', 'scheduled_at'),
         Index('idx_email_queue_user_sched', 'user_email', 'scheduled_at'),
+        # Partial indexes for the hot predicates, see DB/migrations/004_hot_path_indexes.sql
+        Index('idx_email_queue_due', 'scheduled_at', postgresql_where=text('status IN (0, 3)')),
+        Index('idx_email_queue_lease', 'last_attempt_at', postgresql_where=text('status = 4')),
+        Index('idx_email_queue_user_pending', 'user_email', postgresql_where=text('status = 0')),
     )
     
     # Relationships
@@ -385,13 +413,15 @@ class EmailQueue(Base):
 # ============================================
 # SEND LOG
 # ============================================
+# Partitioned by month of sent_time, see DB/migrations/003_send_log_partitions.sql
 class SendLog(Base):
     __tablename__ = 'send_log'
     
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     user_email = Column(CITEXT, ForeignKey('users.email', ondelete='CASCADE'), nullable=False)
     sent_to = Column(CITEXT, nullable=False)
-    sent_time = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Part of the primary key: unique constraints of a partitioned table must include its partition key
+    sent_time = Column(DateTime(timezone=True), primary_key=True, server_default=func.now(), nullable=False)
     subject = Column(Text, nullable=True)
     body = Column(Text, nullable=True)
     template_id = Column(Integer, ForeignKey('email_templates.id', ondelete='SET NULL'), nullable=True)
@@ -401,6 +431,8 @@ class SendLog(Base):
     
     __table_args__ = (
         Index('idx_send_log_user_time', 'user_email', 'sent_time'),
+        Index('idx_send_log_user_type', 'user_email', 'send_type'),
+        {'postgresql_partition_by': 'RANGE (sent_time)'},
     )
     
     # Relationships
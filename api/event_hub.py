@@ -0,0 +1,225 @@
+"""
+Per-user live events, relayed from PostgreSQL NOTIFY to Server-Sent Events
+
+Counter deltas and queue changes are announced by the triggers in
+DB/migrations/002_event_notify.sql; the queue worker adds one `send` event per
+outcome with `notify()`. Because NOTIFY is delivered on commit, whichever
+process made the change, every API process sees it.
+
+Each API process keeps one LISTEN connection. Every event gets an id
+`<epoch>-<seq>` and is kept in a small per-user ring buffer, so a client that
+reconnects with Last-Event-ID receives what it missed. When that is no longer
+possible (buffer overrun, server restart, LISTEN connection lost) it receives a
+`resync` event instead and should reload its state, e.g. from /api/workspace.
+"""
+import asyncio
+import json
+import logging
+import secrets
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+
+from api.stats_cache import invalidate_user
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "applyche_events"
+RESYNC = "resync"
+
+# (seq, type, data)
+Event = Tuple[int, str, Dict[str, Any]]
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def notify(user_email: str, event_type: str, data: Dict[str, Any]):
+    """Statement that announces an event when the surrounding transaction commits."""
+    payload = json.dumps({"user": user_email, "type": event_type, "data": data}, default=_json_default)
+    return select(func.pg_notify(CHANNEL, payload))
+
+
+class Subscription:
+    """Events waiting to be sent to one connected client"""
+
+    def __init__(self, hub: "EventHub", user: str, max_pending: int):
+        self.hub = hub
+        self.user = user
+        self.max_pending = max_pending
+        self._pending: Deque[Event] = deque()
+        self._wake = asyncio.Event()
+
+    def push(self, event: Event) -> None:
+        if len(self._pending) >= self.max_pending:
+            # The client is not keeping up: drop its backlog and have it reload
+            self._pending.clear()
+            event = self.hub.resync_event()
+        self._pending.append(event)
+        self._wake.set()
+
+    async def next(self, timeout: float) -> List[Event]:
+        """Events that arrived since the last call, waiting up to `timeout` seconds for one."""
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._wake.clear()
+        events = list(self._pending)
+        self._pending.clear()
+        return events
+
+
+class EventHub:
+    """LISTENs on CHANNEL and fans events out to per-user subscriptions"""
+
+    def __init__(self, conninfo: Optional[str] = None, buffer_size: int = 500, max_users: int = 10000,
+                 max_pending: int = 1000, reconnect_delay: float = 2.0):
+        self.conninfo = conninfo
+        self.buffer_size = buffer_size
+        self.max_users = max_users
+        self.max_pending = max_pending
+        self.reconnect_delay = reconnect_delay
+        # Ids of an earlier process (or an earlier hub) can never be resumed
+        self.epoch = secrets.token_hex(4)
+        self._seq = 0
+        # user -> (recent events, seq of the newest event that fell out of the buffer)
+        self._buffers: "OrderedDict[str, Tuple[Deque[Event], int]]" = OrderedDict()
+        # Events up to this seq may be missing for users without a buffer (evicted, or listener lost)
+        self._forgotten = 0
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # -----------------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------------
+    def start(self) -> None:
+        """Start listening in the running event loop (no-op if already listening)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _conninfo(self) -> str:
+        if self.conninfo is None:
+            from api.database import engine
+            self.conninfo = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        return self.conninfo
+
+    async def _listen(self) -> None:
+        import psycopg
+
+        connected_before = False
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self._conninfo(), autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    if connected_before:
+                        # Anything sent while we were away is lost
+                        self._resync_all()
+                    connected_before = True
+                    logger.info("Listening for %s notifications", CHANNEL)
+                    async for notification in conn.notifies():
+                        self._dispatch(notification.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Event listener connection failed, reconnecting in %ss", self.reconnect_delay)
+            await asyncio.sleep(self.reconnect_delay)
+
+    # -----------------------------------------------------
+    # Publishing
+    # -----------------------------------------------------
+    def _dispatch(self, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            user, event_type, data = message["user"], message["type"], message.get("data", {})
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed %s payload: %r", CHANNEL, payload[:200])
+            return
+        # Another process changed this user's data: cached stats are stale
+        invalidate_user(user)
+        self.publish(user, event_type, data)
+
+    def publish(self, user_email: str, event_type: str, data: Dict[str, Any]) -> Event:
+        user = user_email.lower()
+        self._seq += 1
+        event = (self._seq, event_type, data)
+
+        events, dropped = self._buffers.pop(user, (deque(), self._forgotten))
+        if len(events) >= self.buffer_size:
+            dropped = events.popleft()[0]
+        events.append(event)
+        self._buffers[user] = (events, dropped)
+        while len(self._buffers) > self.max_users:
+            _, (evicted, _) = self._buffers.popitem(last=False)
+            self._forgotten = max(self._forgotten, evicted[-1][0])
+
+        for subscription in self._subscribers.get(user, ()):
+            subscription.push(event)
+        return event
+
+    def resync_event(self) -> Event:
+        return (self._seq, RESYNC, {})
+
+    def _resync_all(self) -> None:
+        # The lost notifications take a seq, so clients that had seen everything before resync too
+        self._seq += 1
+        self._forgotten = self._seq
+        for user, (events, _) in self._buffers.items():
+            self._buffers[user] = (events, self._seq)
+        for subscriptions in self._subscribers.values():
+            for subscription in subscriptions:
+                subscription.push(self.resync_event())
+
+    # -----------------------------------------------------
+    # Subscribing
+    # -----------------------------------------------------
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def _replay(self, user: str, last_event_id: str) -> List[Event]:
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return [self.resync_event()]
+        last_seq = int(seq)
+        events, dropped = self._buffers.get(user, ((), self._forgotten))
+        if last_seq < dropped:
+            return [self.resync_event()]
+        return [event for event in events if event[0] > last_seq]
+
+    def subscribe(self, user_email: str, last_event_id: Optional[str] = None) -> Subscription:
+        """
+        Subscribe to the events of a user. With `last_event_id`, events after it
+        are delivered first (or a resync event if they are no longer available).
+        """
+        self.start()
+        user = user_email.lower()
+        subscription = Subscription(self, user, self.max_pending)
+        if last_event_id:
+            for event in self._replay(user, last_event_id):
+                subscription.push(event)
+        self._subscribers.setdefault(user, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscribers.get(subscription.user)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user]
+
+
+# One listener per API process
+event_hub = EventHub()
@@ -0,0 +1,141 @@
+"""
+EXPLAIN check for the hot-path indexes
+
+Plans each hot query (the queue worker's claim statements as the worker builds
+them, and the dashboard counts) and checks that it reads the index built for it
+in DB/migrations/004_hot_path_indexes.sql, index-only where the query only needs
+indexed columns, without sequential or bitmap scans or an explicit sort
+anywhere in the plan. On a small development database the planner rightly
+prefers sequential scans, so by default those are discouraged for the check;
+pass --natural to plan with the server's own settings, e.g. on production data.
+
+Usage:
+    python -m api.index_check [--user EMAIL] [--natural]
+"""
+import argparse
+import json
+import sys
+from typing import Iterator, List, Set
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Engine
+
+from api.db_models import (
+    ContactStatus,
+    EmailQueue,
+    EmailQueueStatus,
+    ProfessorContact,
+    SendLog,
+)
+from api.queue_worker import claim_statement, due_ids, expired_lease_ids
+
+LEASE_SECONDS = 900
+BATCH_SIZE = 50
+# Plan nodes that mean a hot query is not served by its index alone
+_UNWANTED_NODES = {"Seq Scan", "Bitmap Heap Scan", "Sort", "Incremental Sort"}
+
+
+def hot_queries(user_email: str):
+    """(name, statement, index, index_only) of every query with a purpose-built index"""
+    return [
+        (
+            "claim of due queue items",
+            claim_statement(due_ids(BATCH_SIZE)),
+            "idx_email_queue_due",
+            False,
+        ),
+        (
+            "claim of expired leases",
+            claim_statement(expired_lease_ids(LEASE_SECONDS, BATCH_SIZE), reclaim=True),
+            "idx_email_queue_lease",
+            False,
+        ),
+        (
+            "pending items of a user",
+            select(func.count()).where(
+                EmailQueue.user_email == user_email,
+                EmailQueue.status == EmailQueueStatus.PENDING,
+            ),
+            "idx_email_queue_user_pending",
+            True,
+        ),
+        (
+            "replied contacts of a user",
+            select(func.count()).where(
+                ProfessorContact.user_email == user_email,
+                ProfessorContact.contact_status == ContactStatus.REPLIED,
+            ),
+            "idx_prof_contact_user_replied",
+            True,
+        ),
+        (
+            "sends of a user per type",
+            select(SendLog.send_type, func.count())
+            .where(SendLog.user_email == user_email)
+            .group_by(SendLog.send_type),
+            "idx_send_log_user_type",
+            True,
+        ),
+    ]
+
+
+def _nodes(plan: dict) -> Iterator[dict]:
+    """Every node of a plan tree."""
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _nodes(child)
+
+
+def _index_family(conn, index: str) -> Set[str]:
+    """The index plus its per-partition copies."""
+    return {index, *conn.execute(text(
+        "WITH RECURSIVE tree(oid) AS ("
+        " SELECT to_regclass(:index)::oid"
+        " UNION ALL SELECT i.inhrelid FROM pg_inherits i JOIN tree t ON i.inhparent = t.oid)"
+        " SELECT c.relname FROM tree JOIN pg_class c ON c.oid = tree.oid"
+    ), {"index": index}).scalars()}
+
+
+def check_indexes(engine: Engine, user_email: str, natural: bool = False) -> List[str]:
+    """Plan every hot query; returns one message per query whose plan misses its index."""
+    problems = []
+    with engine.connect() as conn:
+        if not natural:
+            # LOCAL: ends with the transaction, before the connection returns to the pool
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+        for name, statement, index, index_only in hot_queries(user_email):
+            compiled = statement.compile(conn, compile_kwargs={"literal_binds": True})
+            plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            nodes = list(_nodes(plan[0]["Plan"]))
+            expected = ("Index Only Scan",) if index_only else ("Index Scan", "Index Only Scan")
+            family = _index_family(conn, index)
+            used = [n for n in nodes if n.get("Index Name") in family and n["Node Type"] in expected]
+            unwanted = [
+                n["Node Type"] + (f" on {n['Relation Name']}" if "Relation Name" in n else "")
+                for n in nodes
+                if n["Node Type"] in _UNWANTED_NODES
+            ]
+            if not used or unwanted:
+                got = ", ".join(unwanted) or f"no {' / '.join(expected)} using it"
+                problems.append(f"{name}: expected {'an index-only scan' if index_only else 'an index scan'} "
+                                f"using {index}, got {got}")
+            else:
+                print(f"✅ {name}: {used[0]['Node Type']} using {used[0]['Index Name']}")
+        conn.rollback()
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that the hot queries use their indexes")
+    parser.add_argument("--user", default="test.user@example.com", help="User the per-user queries are planned for")
+    parser.add_argument("--natural", action="store_true", help="Do not discourage sequential scans")
+    args = parser.parse_args()
+
+    from api.database import engine
+
+    problems = check_indexes(engine, args.user, natural=args.natural)
+    for problem in problems:
+        print(f"❌ {problem}")
+    sys.exit(1 if problems else 0)
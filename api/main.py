@@ -1,15 +1,36 @@
 """
 FastAPI main application
 """
+import asyncio
+import sys
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from api.routes import dashboard, email_templates, sending_rules, email_queue
+from api.event_hub import event_hub
+from api.routes import dashboard, email_templates, sending_rules, email_queue, workspace, events
+
+
+if sys.platform == "win32":
+    # psycopg's async driver cannot run on the default Proactor event loop. Set on import,
+    # so every process serving the app (including uvicorn's reload worker) gets it; start
+    # uvicorn with loop="none", or it creates its own Proactor loop regardless of the policy.
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Listen from the start, so changes made by workers also invalidate cached stats
+    event_hub.start()
+    yield
+    await event_hub.stop()
+
 
 # Create FastAPI app
 app = FastAPI(
     title="ApplyChe API",
     description="REST API for ApplyChe email management system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -19,6 +40,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Include routers
@@ -26,6 +48,8 @@ app.include_router(dashboard.router)
 app.include_router(email_templates.router)
 app.include_router(sending_rules.router)
 app.include_router(email_queue.router)
+app.include_router(workspace.router)
+app.include_router(events.router)
 
 
 @app.get("/")
@@ -42,17 +66,17 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     try:
-        from api.database import engine
+        from api.database import async_engine, get_pool_stats
         from sqlalchemy import text
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        return {"status": "healthy", "database": "connected"}
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return {"status": "healthy", "database": "connected", "pool": get_pool_stats()}
     except Exception as e:
         return {"status": "unhealthy", "error": str(e)}
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="none" if sys.platform == "win32" else "auto")
 
 
@@ -0,0 +1,119 @@
+"""
+Plain SQL migrations
+
+Applies DB/migrations/NNN_name.sql files in order and records each one in
+schema_migrations. A file runs in a single transaction unless its first line is
+`-- migrate: no-transaction` (needed for e.g. CREATE INDEX CONCURRENTLY); such a
+file is split on lines ending with `;` (outside $$ bodies) and each statement runs on its own.
+Migrations run without the engine's statement_timeout (DB_STATEMENT_TIMEOUT_MS):
+index builds and table rewrites on real data take longer than any API query.
+
+Usage:
+    python -m api.migrations           # apply pending migrations
+    python -m api.migrations --list    # show applied / pending
+"""
+import argparse
+import os
+import re
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "DB", "migrations")
+NO_TRANSACTION = "-- migrate: no-transaction"
+
+_FILE_PATTERN = re.compile(r"^(\d+)_[\w-]+\.sql$")
+
+
+def available_migrations(directory: str = MIGRATIONS_DIR) -> List[Tuple[str, str]]:
+    """(version, path) of every migration file, in version order."""
+    found = []
+    for name in os.listdir(directory):
+        if _FILE_PATTERN.match(name):
+            found.append((name[:-4], os.path.join(directory, name)))
+    return sorted(found, key=lambda item: int(item[0].split("_", 1)[0]))
+
+
+def applied_migrations(engine: Engine) -> List[str]:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version TEXT PRIMARY KEY,"
+            " applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())"
+        ))
+        return list(conn.execute(text("SELECT version FROM schema_migrations ORDER BY applied_at")).scalars())
+
+
+def _split_statements(sql: str) -> List[str]:
+    statements, current, in_body = [], [], False
+    for line in sql.splitlines():
+        current.append(line)
+        if line.count("$$") % 2:
+            in_body = not in_body  # `;` inside a $$-quoted DO / function body ends nothing
+        if not in_body and line.rstrip().endswith(";"):
+            if any(l.strip() and not l.strip().startswith("--") for l in current):
+                statements.append("\n".join(current).strip())
+            current = []
+    return statements
+
+
+def apply_migration(engine: Engine, version: str, path: str) -> None:
+    with open(path, encoding="utf-8") as f:
+        sql = f.read()
+
+    if sql.lstrip().startswith(NO_TRANSACTION):
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            # Session level, so reset before the connection goes back to the pool
+            conn.exec_driver_sql("SET statement_timeout = 0")
+            try:
+                for statement in _split_statements(sql):
+                    conn.exec_driver_sql(statement)
+            finally:
+                conn.exec_driver_sql("RESET statement_timeout")
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:v)"), {"v": version})
+        return
+
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = 0")
+            # No parameters: the driver sends the whole file as one multi-statement query
+            cursor.execute(sql)
+            cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+
+def migrate(engine: Engine, directory: str = MIGRATIONS_DIR) -> List[str]:
+    """Apply every pending migration; returns the versions applied."""
+    done = set(applied_migrations(engine))
+    applied = []
+    for version, path in available_migrations(directory):
+        if version in done:
+            continue
+        print(f"Applying {version} ...")
+        apply_migration(engine, version, path)
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply ApplyChe SQL migrations")
+    parser.add_argument("--list", action="store_true", help="Only list applied and pending migrations")
+    args = parser.parse_args()
+
+    from api.database import engine
+
+    if args.list:
+        done = set(applied_migrations(engine))
+        for version, _ in available_migrations():
+            print(f"{'applied' if version in done else 'pending'}  {version}")
+    else:
+        applied = migrate(engine)
+        print(f"✅ {len(applied)} migration(s) applied" if applied else "✅ Database is up to date")
@@ -3,7 +3,20 @@ Pydantic models for request/response schemas
 """
 from typing import Optional, List, Dict, Any
 from datetime import datetime, time
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, field_validator
+
+from api.db_models import EmailQueueStatus
+
+# Queue statuses a client may set; CLAIMED is only ever set by a queue worker taking a lease
+SETTABLE_QUEUE_STATUSES = (
+    EmailQueueStatus.PENDING,
+    EmailQueueStatus.SENT,
+    EmailQueueStatus.FAILED,
+    EmailQueueStatus.RETRYING,
+)
+QUEUE_STATUSES = SETTABLE_QUEUE_STATUSES + (EmailQueueStatus.CLAIMED,)
+# Largest number of items accepted by one bulk request
+MAX_BULK_ITEMS = 10000
 
 
 # Dashboard Models
@@ -123,6 +136,52 @@ class EmailQueueResponse(BaseModel):
     created_at: datetime
 
 
+class EmailQueueBulkCreate(BaseModel):
+    """Add many emails to the queue in one request"""
+    items: List[EmailQueueCreate] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+class EmailQueueBulkResponse(BaseModel):
+    """Ids assigned by a bulk enqueue, in request order, as inclusive [first, last] runs"""
+    inserted: int
+    id_ranges: List[List[int]]
+
+class EmailQueueBulkStatusUpdate(BaseModel):
+    """Move every queue item of a user that matches all given filters to `status`"""
+    user_email: EmailStr
+    status: int
+    ids: Optional[List[int]] = None
+    template_id: Optional[int] = None
+    to_email: Optional[EmailStr] = None
+    from_status: Optional[List[int]] = None
+
+    @field_validator("status")
+    @classmethod
+    def _settable_status(cls, value: int) -> int:
+        if value not in SETTABLE_QUEUE_STATUSES:
+            raise ValueError(f"status must be one of {list(SETTABLE_QUEUE_STATUSES)}")
+        return value
+
+    @field_validator("from_status")
+    @classmethod
+    def _known_statuses(cls, value: Optional[List[int]]) -> Optional[List[int]]:
+        unknown = [status for status in value or () if status not in QUEUE_STATUSES]
+        if unknown:
+            raise ValueError(f"unknown queue status(es) {unknown}; expected {list(QUEUE_STATUSES)}")
+        return value
+
+class EmailQueueBulkStatusResponse(BaseModel):
+    """Number of queue items moved, per status they had before"""
+    updated: int
+    by_previous_status: Dict[int, int]
+
+class CampaignPlanResponse(BaseModel):
+    """Campaign plan (main email + reminders) inserted into the queue"""
+    queued: int
+    by_send_type: Dict[int, int]
+    first_scheduled_at: Optional[datetime] = None
+    last_scheduled_at: Optional[datetime] = None
+
+
 # Send Log Models
 class SendLogResponse(BaseModel):
     """Send log response"""
@@ -172,3 +231,16 @@ class MessageResponse(BaseModel):
     success: bool = True
 
 
+# Workspace Models
+class QueueSummary(BaseModel):
+    """Email queue item counts of a user per status"""
+    by_status: Dict[int, int]
+    next_scheduled_at: Optional[datetime] = None
+
+class WorkspaceResponse(BaseModel):
+    """Everything the desktop app loads at startup; templates are keyed by template_type"""
+    user_email: str
+    templates: Dict[int, EmailTemplateResponse]
+    sending_rules: Optional[SendingRulesResponse] = None
+    stats: DashboardStats
+    queue: QueueSummary
@@ -0,0 +1,30 @@
+"""
+Keyset (cursor) pagination helpers
+
+A cursor is the opaque, URL-safe encoding of the sort key of the last row of a
+page: its timestamp plus its id as tiebreaker. The next page continues with a
+row-value comparison, `(ts, id) > (:ts, :id)`, which PostgreSQL answers from
+the (user_email, ts) indexes without skipping over earlier rows as OFFSET does.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    payload = json.dumps([ts.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(timestamp, id) of a cursor; ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(ts), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
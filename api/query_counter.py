@@ -0,0 +1,129 @@
+"""
+Count the SQL statements a block of code sends to the database
+
+    with count_queries(engine) as counter:
+        ...
+    print(counter.count, counter.statements)
+
+    with assert_max_queries(engine, 2):
+        ...   # AssertionError listing the statements if more than 2 ran
+
+Works with a sync Engine or an AsyncEngine (its sync_engine is instrumented).
+Running the module benchmarks the template read routes against a real user and
+fails if any of them needs more statements than its budget in ROUTE_BUDGETS:
+    python -m api.query_counter --user EMAIL [--repeat 20]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Statements seen by a count_queries block"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine) -> Iterator[QueryCounter]:
+    target = getattr(engine, "sync_engine", engine)
+    counter = QueryCounter()
+    event.listen(target, "before_cursor_execute", counter._on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(target, "before_cursor_execute", counter._on_execute)
+
+
+@contextmanager
+def assert_max_queries(engine, limit: int) -> Iterator[QueryCounter]:
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        listing = "\n".join(f"  {i + 1}. {sql.splitlines()[0]}" for i, sql in enumerate(counter.statements))
+        raise AssertionError(f"{counter.count} queries executed, expected at most {limit}:\n{listing}")
+
+
+# Template read route -> most statements it may run, however many templates and files a user has:
+# the ETag check, the templates and their files. A conditional GET that still matches stops after the first.
+ROUTE_BUDGETS = {
+    "get_email_templates": 3,
+    "get_email_template": 3,
+    "get_template_by_type": 3,
+    "not_modified": 1,
+}
+
+
+async def benchmark_template_routes(user_email: str, repeat: int = 20, session_factory=None, engine=None) -> bool:
+    """
+    Time each template read route, unconditionally and with its own ETag in
+    If-None-Match, and check both against their query budgets; True if all pass.
+    Uses api.database's async session factory and engine unless others are given.
+    """
+    from fastapi import Response
+    from api import database
+    from api.db_models import EmailTemplate, SendType
+    from api.routes import email_templates
+    from sqlalchemy import select
+
+    session_factory = session_factory or database.AsyncSessionLocal
+    engine = engine or database.async_engine
+
+    async with session_factory() as db:
+        template_id = await db.scalar(
+            select(EmailTemplate.id).where(EmailTemplate.user_email == user_email).limit(1)
+        )
+    if template_id is None:
+        print(f"⚠️ {user_email} has no templates; nothing to benchmark")
+        return True
+
+    calls = {
+        "get_email_templates": lambda db, response, etag: email_templates.get_email_templates(
+            user_email, response, if_none_match=etag, db=db),
+        "get_email_template": lambda db, response, etag: email_templates.get_email_template(
+            user_email, template_id, response, if_none_match=etag, db=db),
+        "get_template_by_type": lambda db, response, etag: email_templates.get_template_by_type(
+            user_email, SendType.MAIN, response, if_none_match=etag, db=db),
+    }
+
+    ok = True
+    for name, call in calls.items():
+        etag = None
+        for label, budget in ((name, ROUTE_BUDGETS[name]), (f"{name} (304)", ROUTE_BUDGETS["not_modified"])):
+            started = time.perf_counter()
+            worst = 0
+            for _ in range(repeat):
+                response = Response()
+                # A fresh session per call so nothing is served from the identity map
+                async with session_factory() as db:
+                    with count_queries(engine) as counter:
+                        await call(db, response, etag)
+                worst = max(worst, counter.count)
+            etag = response.headers.get("etag")
+            elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+            passed = worst <= budget
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} {label}: {worst} queries (budget {budget}), {elapsed_ms:.1f} ms/call")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the query budgets of the template read routes")
+    parser.add_argument("--user", required=True, help="User whose templates are read")
+    parser.add_argument("--repeat", type=int, default=20, help="Calls per route")
+    args = parser.parse_args()
+
+    sys.exit(0 if asyncio.run(benchmark_template_routes(args.user, args.repeat)) else 1)
@@ -0,0 +1,468 @@
+"""
+Headless email queue worker
+
+Claims due rows from email_queue in batches with SELECT ... FOR UPDATE SKIP LOCKED,
+so several worker processes can drain the queue in parallel without sending the
+same row twice. A claimed row is leased: its status becomes CLAIMED and
+last_attempt_at records when the lease was taken. If a worker dies mid-batch its
+leases expire after `lease_seconds` and the rows are claimed again by another worker;
+a worker that is stopped hands its unsent rows back right away.
+
+Sends are paced per sender account like the desktop sender: after a message goes
+out, the account's other claimed rows are rescheduled `delay_sending_mail` minutes
+apart (or 270-330 s when that is 0) instead of going out back to back.
+"""
+import logging
+import random
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Select, Update, select, update, func, tuple_
+from sqlalchemy.orm import Session
+
+from api.database import SessionLocal
+from api.event_hub import notify
+from api.send_windows import align_queue
+from api.send_log_partitions import ensure_partitions
+from api.send_log_writer import SendLogWriter
+from api.university_quota import UniversityQuotaIndex, universities_of
+from api.db_models import (
+    EmailQueue,
+    EmailQueueStatus,
+    EmailTemplate,
+    EmailProperty,
+    SendingRules,
+    SendType,
+    TemplateFile,
+)
+from controller.email_providers import provider_for
+from controller.mail_merge import looks_like_html
+from controller.smtp_pool import shared_pool
+from controller.attachment_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+
+def due_ids(limit: int) -> Select:
+    """Pending/retrying rows whose scheduled_at has passed, oldest first (idx_email_queue_due)."""
+    return (
+        select(EmailQueue.id)
+        .where(
+            EmailQueue.status.in_((EmailQueueStatus.PENDING, EmailQueueStatus.RETRYING)),
+            EmailQueue.scheduled_at <= func.now(),
+        )
+        .order_by(EmailQueue.scheduled_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def expired_lease_ids(lease_seconds: int, limit: int) -> Select:
+    """Claimed rows whose lease is older than lease_seconds, oldest first (idx_email_queue_lease)."""
+    return (
+        select(EmailQueue.id)
+        .where(
+            EmailQueue.status == EmailQueueStatus.CLAIMED,
+            EmailQueue.last_attempt_at < func.now() - timedelta(seconds=lease_seconds),
+        )
+        .order_by(EmailQueue.last_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def claim_statement(ids: Select, reclaim: bool = False) -> Update:
+    """Lease the rows selected by `ids`, returning what the worker needs to send them."""
+    values = {"status": EmailQueueStatus.CLAIMED, "last_attempt_at": func.now()}
+    if reclaim:
+        # A row reclaimed from an expired lease counts as an attempt,
+        # so a message that keeps crashing workers eventually fails.
+        values["retry_count"] = EmailQueue.retry_count + 1
+    return (
+        update(EmailQueue)
+        .where(EmailQueue.id.in_(ids))
+        .values(**values)
+        .returning(
+            EmailQueue.id,
+            EmailQueue.user_email,
+            EmailQueue.to_email,
+            EmailQueue.subject,
+            EmailQueue.body,
+            EmailQueue.template_id,
+            EmailQueue.retry_count,
+            EmailQueue.last_attempt_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+class ClaimedItem:
+    """A queue row leased by this worker"""
+
+    def __init__(self, row):
+        self.id = row.id
+        self.user_email = row.user_email
+        self.to_email = row.to_email
+        self.subject = row.subject
+        self.body = row.body
+        self.template_id = row.template_id
+        self.retry_count = row.retry_count
+        # last_attempt_at doubles as the lease token: completing the row only
+        # succeeds while it still carries the value written when we claimed it.
+        self.leased_at = row.last_attempt_at
+
+
+class EmailQueueWorker:
+    """Drain email_queue in leased batches"""
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        batch_size: int = 50,
+        lease_seconds: int = 900,
+        poll_interval: float = 5.0,
+        max_retries: int = 3,
+        retry_backoff_seconds: int = 600,
+        smtp_pool=None,
+        attachment_cache=None,
+        window_interval: float = 60.0,
+        partition_interval: float = 3600.0,
+        university_quota: Optional[UniversityQuotaIndex] = None,
+        send_log: Optional[SendLogWriter] = None,
+        send_delay_range: Tuple[float, float] = (270, 330),
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.smtp_pool = smtp_pool or shared_pool
+        self.attachment_cache = attachment_cache or shared_cache
+        self.window_interval = window_interval
+        self._last_window_alignment = None
+        self.partition_interval = partition_interval
+        self._last_partition_check = None
+        self.university_quota = university_quota or UniversityQuotaIndex()
+        # send_log rows are written behind, in bulk, by a background thread
+        self.send_log = send_log or SendLogWriter()
+        # Seconds between two sends of an account whose delay_sending_mail is 0
+        self.send_delay_range = send_delay_range
+        # Lower-cased sender -> earliest time it may send again / last slot handed out
+        self._ready_at: Dict[str, datetime] = {}
+        self._next_slot: Dict[str, datetime] = {}
+        self._stop = threading.Event()
+
+    # -----------------------------------------------------
+    # Claiming
+    # -----------------------------------------------------
+    def claim_batch(self) -> List[ClaimedItem]:
+        """
+        Lease up to batch_size due rows.
+        Claimed rows whose lease has expired (the worker holding them died) are
+        taken back first, then pending/retrying rows whose scheduled_at has
+        passed. Each is its own index-shaped claim; both commit together.
+        """
+        with self.session_factory() as db:
+            rows = db.execute(
+                claim_statement(expired_lease_ids(self.lease_seconds, self.batch_size), reclaim=True)
+            ).all()
+            if len(rows) < self.batch_size:
+                rows += db.execute(claim_statement(due_ids(self.batch_size - len(rows)))).all()
+            db.commit()
+
+        return [ClaimedItem(row) for row in rows]
+
+    def _complete(self, db: Session, item: ClaimedItem, **values) -> bool:
+        """Write the outcome of a leased row; False if the lease was lost meanwhile."""
+        result = db.execute(
+            update(EmailQueue)
+            .where(
+                EmailQueue.id == item.id,
+                EmailQueue.status == EmailQueueStatus.CLAIMED,
+                EmailQueue.last_attempt_at == item.leased_at,
+            )
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            logger.warning("Lease on queue item %s expired before it was completed", item.id)
+            return False
+        return True
+
+    # -----------------------------------------------------
+    # Processing
+    # -----------------------------------------------------
+    def process_batch(self, items: List[ClaimedItem]) -> None:
+        """Send every item of a claimed batch through pooled SMTP sessions."""
+        by_user: Dict[str, List[ClaimedItem]] = {}
+        for item in items:
+            by_user.setdefault(item.user_email, []).append(item)
+
+        with self.session_factory() as db:
+            send_types, attachments = self._load_templates(db, items)
+            universities = universities_of(db, {item.to_email for item in items})
+            self.university_quota.ensure_seeded(db, by_user)
+            db.commit()
+            for user_email, user_items in by_user.items():
+                if self._stop.is_set():
+                    self._release(db, user_items)
+                    continue
+                self._send_for_user(db, user_email, user_items, send_types, attachments, universities)
+
+    def _load_templates(self, db: Session, items: List[ClaimedItem]):
+        """Send type and attachment paths of every template used by the batch."""
+        template_ids = {item.template_id for item in items if item.template_id is not None}
+        if not template_ids:
+            return {}, {}
+        rows = db.execute(
+            select(EmailTemplate.id, EmailTemplate.template_type).where(EmailTemplate.id.in_(template_ids))
+        ).all()
+        files = db.execute(
+            select(TemplateFile.email_template_id, TemplateFile.file_path)
+            .where(TemplateFile.email_template_id.in_(template_ids))
+            .order_by(TemplateFile.id)
+        ).all()
+        attachments: Dict[int, List[str]] = {}
+        for row in files:
+            attachments.setdefault(row.email_template_id, []).append(row.file_path)
+        return {row.id: row.template_type for row in rows}, attachments
+
+    def _load_password(self, db: Session, user_email: str) -> Optional[str]:
+        domain = user_email.split("@")[-1].lower()
+        properties = db.execute(
+            select(EmailProperty).where(EmailProperty.user_email == user_email)
+        ).scalars().all()
+        for prop in properties:
+            if prop.provider and prop.provider.lower() == domain:
+                return prop.app_password
+        return properties[0].app_password if properties else None
+
+    def _send_for_user(self, db: Session, user_email: str, items: List[ClaimedItem],
+                       send_types: Dict[int, int], attachments: Dict[int, List[str]],
+                       universities: Dict[str, Optional[int]]):
+        provider = provider_for(user_email)
+        password = self._load_password(db, user_email)
+        if not provider or not password:
+            reason = "unsupported email domain" if not provider else "no email credentials"
+            for item in items:
+                self._record_failure(db, item, send_types, reason, permanent=True)
+            return
+
+        account = user_email.lower()
+        delay_range = self._send_delay_range(db, user_email)
+        for index, item in enumerate(items):
+            if self._stop.is_set():
+                self._release(db, items[index:])
+                break
+            ready_at = self._ready_at.get(account)
+            if ready_at and datetime.now(timezone.utc) < ready_at:
+                self._pace(db, account, items[index:], delay_range)
+                break
+            if item.retry_count > self.max_retries:
+                self._record_failure(db, item, send_types, "retry limit reached", permanent=True)
+                continue
+
+            # Only first contacts count against max_email_per_university
+            university_id = None
+            if send_types.get(item.template_id, SendType.MAIN) == SendType.MAIN:
+                university_id = universities.get(item.to_email.lower())
+                if not self.university_quota.try_acquire(user_email, university_id):
+                    self._defer(db, item, self.university_quota.next_allowed_at(user_email, university_id))
+                    continue
+
+            try:
+                message_id, raw = self.attachment_cache.build_message(
+                    user_email, item.to_email, item.subject, item.body,
+                    attachments.get(item.template_id, ()),
+                    subtype="html" if looks_like_html(item.body) else "plain",
+                )
+            except OSError as e:
+                # Never send an application without the CV/SOP it promises
+                self.university_quota.release(user_email, university_id)
+                self._record_failure(db, item, send_types, f"attachment unavailable: {e}", permanent=True)
+                continue
+
+            # Ready a poll interval early, so rows woken at their slot are not pushed back by polling lag
+            self._ready_at[account] = datetime.now(timezone.utc) + timedelta(
+                seconds=max(delay_range[0] - self.poll_interval, 0)
+            )
+            try:
+                self.smtp_pool.send_message(user_email, password, raw, to_addrs=[item.to_email])
+            except smtplib.SMTPRecipientsRefused as e:
+                self.university_quota.release(user_email, university_id)
+                self._record_failure(db, item, send_types, str(e), permanent=True)
+                continue
+            except Exception as e:
+                self.university_quota.release(user_email, university_id)
+                self._record_failure(db, item, send_types, str(e), permanent=False)
+                continue
+            self._record_success(db, item, send_types, message_id)
+
+    def _send_delay_range(self, db: Session, user_email: str) -> Tuple[float, float]:
+        """Seconds between two sends of the account: its delay_sending_mail, or send_delay_range."""
+        minutes = db.execute(
+            select(SendingRules.delay_sending_mail).where(SendingRules.user_email == user_email)
+        ).scalar()
+        if minutes:
+            return minutes * 60, minutes * 60
+        return self.send_delay_range
+
+    def _pace(self, db: Session, account: str, items: List[ClaimedItem], delay_range: Tuple[float, float]):
+        """
+        Give rows of an account that has just sent one slot each, delay_range
+        apart, after the slots it already handed out; the rows wait in the
+        queue (not under this worker's lease) until their slot comes up.
+        """
+        now = datetime.now(timezone.utc)
+        slot = max(self._ready_at[account], self._next_slot.get(account, now))
+        for item in items:
+            if self._complete(db, item, status=EmailQueueStatus.PENDING, scheduled_at=slot):
+                self._notify_outcome(db, item, EmailQueueStatus.PENDING, scheduled_at=slot, reason="send pacing")
+            slot += timedelta(seconds=random.uniform(*delay_range))
+        self._next_slot[account] = slot
+        db.commit()
+        logger.info("Paced %s queue item(s) of %s until %s", len(items), account, slot.isoformat())
+
+    def _release(self, db: Session, items: List[ClaimedItem]):
+        """
+        Hand claimed rows this worker is not going to send back to the queue on
+        shutdown, without counting an attempt as an expired lease would.
+        """
+        released = db.execute(
+            update(EmailQueue)
+            .where(
+                tuple_(EmailQueue.id, EmailQueue.last_attempt_at).in_([(item.id, item.leased_at) for item in items]),
+                EmailQueue.status == EmailQueueStatus.CLAIMED,
+            )
+            .values(status=EmailQueueStatus.PENDING)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        logger.info("Released %s unsent queue item(s) on shutdown", released)
+
+    def _defer(self, db: Session, item: ClaimedItem, until: datetime):
+        """Return a row to the queue untouched, to be sent at `until`."""
+        logger.info("Queue item %s deferred to %s by the per-university quota", item.id, until.isoformat())
+        if self._complete(db, item, status=EmailQueueStatus.PENDING, scheduled_at=until):
+            self._notify_outcome(db, item, EmailQueueStatus.PENDING, scheduled_at=until, reason="university quota")
+        db.commit()
+
+    def _notify_outcome(self, db: Session, item: ClaimedItem, status: int, **data):
+        """Announce the outcome of a queue item to live clients once the transaction commits."""
+        db.execute(notify(item.user_email, "send", {
+            "queue_id": item.id,
+            "to_email": item.to_email,
+            "status": status,
+            **{key: value for key, value in data.items() if value is not None},
+        }))
+
+    def _record_success(self, db: Session, item: ClaimedItem, send_types, message_id):
+        if self._complete(db, item, status=EmailQueueStatus.SENT):
+            self.send_log.add(
+                user_email=item.user_email,
+                sent_to=item.to_email,
+                subject=item.subject,
+                body=item.body,
+                template_id=item.template_id,
+                send_type=send_types.get(item.template_id, 0),
+                delivery_status=1,
+                remote_message_id=message_id,
+            )
+            self._notify_outcome(db, item, EmailQueueStatus.SENT)
+        db.commit()
+
+    def _record_failure(self, db: Session, item: ClaimedItem, send_types, reason: str, permanent: bool):
+        logger.warning("Sending queue item %s to %s failed: %s", item.id, item.to_email, reason)
+        attempts = item.retry_count + 1
+        if permanent or attempts > self.max_retries:
+            if self._complete(db, item, status=EmailQueueStatus.FAILED, retry_count=attempts):
+                self.send_log.add(
+                    user_email=item.user_email,
+                    sent_to=item.to_email,
+                    subject=item.subject,
+                    body=item.body,
+                    template_id=item.template_id,
+                    send_type=send_types.get(item.template_id, 0),
+                    delivery_status=2,
+                )
+                self._notify_outcome(db, item, EmailQueueStatus.FAILED, reason=reason[:500])
+        else:
+            backoff = timedelta(seconds=self.retry_backoff_seconds * (2 ** item.retry_count))
+            retry_at = datetime.now(timezone.utc) + backoff
+            if self._complete(
+                db,
+                item,
+                status=EmailQueueStatus.RETRYING,
+                retry_count=attempts,
+                scheduled_at=retry_at,
+            ):
+                self._notify_outcome(db, item, EmailQueueStatus.RETRYING, scheduled_at=retry_at, reason=reason[:500])
+        db.commit()
+
+    # -----------------------------------------------------
+    # Send windows
+    # -----------------------------------------------------
+    def align_send_windows(self) -> None:
+        """
+        Every window_interval seconds, move queued rows of users sending in the
+        professor's local time into the professor's next send window, so rows
+        outside it are never claimed.
+        """
+        now = time.monotonic()
+        if self._last_window_alignment is not None and now - self._last_window_alignment < self.window_interval:
+            return
+        self._last_window_alignment = now
+        with self.session_factory() as db:
+            # Twice the interval, so rows stay covered when a tick runs late
+            moved = align_queue(db, horizon=timedelta(seconds=2 * self.window_interval))
+            db.commit()
+        if moved:
+            logger.info("Moved %s queue item(s) into their professor's send window", moved)
+
+    # -----------------------------------------------------
+    # send_log partitions
+    # -----------------------------------------------------
+    def maintain_partitions(self) -> None:
+        """Every partition_interval seconds, make sure send_log has partitions for the coming months."""
+        now = time.monotonic()
+        if self._last_partition_check is not None and now - self._last_partition_check < self.partition_interval:
+            return
+        self._last_partition_check = now
+        with self.session_factory() as db:
+            created = ensure_partitions(db)
+            db.commit()
+        if created:
+            logger.info("Created %s send_log partition(s)", created)
+
+    # -----------------------------------------------------
+    # Main loop
+    # -----------------------------------------------------
+    def run_once(self) -> int:
+        """Claim and process a single batch, returning how many rows were claimed."""
+        self.maintain_partitions()
+        self.align_send_windows()
+        items = self.claim_batch()
+        if items:
+            self.process_batch(items)
+        return len(items)
+
+    def run_forever(self) -> None:
+        logger.info("Queue worker started (batch_size=%s, lease=%ss)", self.batch_size, self.lease_seconds)
+        while not self._stop.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception:
+                logger.exception("Queue worker iteration failed")
+                claimed = 0
+            if not claimed:
+                self._stop.wait(self.poll_interval)
+        self.smtp_pool.close_all()
+        self.send_log.close()
+        logger.info("Queue worker stopped")
+
+    def stop(self) -> None:
+        self._stop.set()
@@ -2,80 +2,86 @@
 Dashboard API routes using SQLAlchemy ORM
 """
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from api.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from api.database import get_async_db
 from api.models import DashboardStats
-from api.db_models import SendLog, ProfessorContact, EmailQueue
+from api.db_models import SendLog, ProfessorContact, EmailQueue, EmailQueueStatus, SendType, ContactStatus
+from api.stats_cache import dashboard_cache
+from api.user_counters import read_counters
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
 
+async def load_dashboard_stats(db: AsyncSession, user_email: str) -> DashboardStats:
+    """
+    Dashboard counts of a user, read from the trigger-maintained counters in
+    metrics (see api/user_counters.py). Users not backfilled yet fall back to one
+    round trip: a single filtered scan of send_log for the four send types, plus
+    one count each over professor_contact and email_queue.
+    Results are cached per user for a few seconds (see api/stats_cache.py).
+    """
+    cached = dashboard_cache.get(user_email)
+    if cached is not None:
+        return cached
+
+    counters = await read_counters(db, user_email)
+    if counters is not None:
+        stats = DashboardStats(**counters)
+        dashboard_cache.set(user_email, stats)
+        return stats
+
+    sent = select(
+        func.count().filter(SendLog.send_type == SendType.MAIN).label("email_you_send"),
+        func.count().filter(SendLog.send_type == SendType.FIRST_REMINDER).label("first_reminder_send"),
+        func.count().filter(SendLog.send_type == SendType.SECOND_REMINDER).label("second_reminder_send"),
+        func.count().filter(SendLog.send_type == SendType.THIRD_REMINDER).label("third_reminder_send"),
+    ).where(SendLog.user_email == user_email).subquery()
+
+    # Emails answered (contact_status = 3 means replied)
+    answered = select(func.count()).where(
+        ProfessorContact.user_email == user_email,
+        ProfessorContact.contact_status == ContactStatus.REPLIED
+    ).scalar_subquery()
+
+    # Emails remaining (status = 0 means pending)
+    remaining = select(func.count()).where(
+        EmailQueue.user_email == user_email,
+        EmailQueue.status == EmailQueueStatus.PENDING
+    ).scalar_subquery()
+
+    row = (await db.execute(select(
+        sent,
+        answered.label("number_of_email_professor_answered"),
+        remaining.label("emails_remaining"),
+    ))).one()
+
+    stats = DashboardStats(**row._asdict())
+    dashboard_cache.set(user_email, stats)
+    return stats
+
+
 @router.get("/stats/{user_email}", response_model=DashboardStats)
-async def get_dashboard_stats(user_email: str, db: Session = Depends(get_db)):
+async def get_dashboard_stats(user_email: str, db: AsyncSession = Depends(get_async_db)):
     """
     Get dashboard statistics for a user
     """
     try:
-        # Count main emails sent (send_type = 0)
-        email_you_send = db.query(func.count(SendLog.id)).filter(
-            SendLog.user_email == user_email,
-            SendLog.send_type == 0
-        ).scalar() or 0
-        
-        # Count first reminder sent (send_type = 1)
-        first_reminder_send = db.query(func.count(SendLog.id)).filter(
-            SendLog.user_email == user_email,
-            SendLog.send_type == 1
-        ).scalar() or 0
-        
-        # Count second reminder sent (send_type = 2)
-        second_reminder_send = db.query(func.count(SendLog.id)).filter(
-            SendLog.user_email == user_email,
-            SendLog.send_type == 2
-        ).scalar() or 0
-        
-        # Count third reminder sent (send_type = 3)
-        third_reminder_send = db.query(func.count(SendLog.id)).filter(
-            SendLog.user_email == user_email,
-            SendLog.send_type == 3
-        ).scalar() or 0
-        
-        # Count emails answered (contact_status = 3 means replied)
-        number_of_email_professor_answered = db.query(func.count(ProfessorContact.id)).filter(
-            ProfessorContact.user_email == user_email,
-            ProfessorContact.contact_status == 3
-        ).scalar() or 0
-        
-        # Count emails remaining (status = 0 means pending)
-        emails_remaining = db.query(func.count(EmailQueue.id)).filter(
-            EmailQueue.user_email == user_email,
-            EmailQueue.status == 0
-        ).scalar() or 0
-        
-        return DashboardStats(
-            email_you_send=email_you_send,
-            first_reminder_send=first_reminder_send,
-            second_reminder_send=second_reminder_send,
-            third_reminder_send=third_reminder_send,
-            number_of_email_professor_answered=number_of_email_professor_answered,
-            emails_remaining=emails_remaining
-        )
-            
+        return await load_dashboard_stats(db, user_email)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching dashboard stats: {str(e)}")
 
 
 @router.get("/email-analysis/{user_email}")
-async def get_email_analysis(user_email: str, email_type: str, db: Session = Depends(get_db)):
+async def get_email_analysis(user_email: str, email_type: str, db: AsyncSession = Depends(get_async_db)):
     """
     Get email analysis by type (main_mail, first_reminder, second_reminder, third_reminder)
     """
     column_mapping = {
-        "main_mail": 0,
-        "first_reminder": 1,
-        "second_reminder": 2,
-        "third_reminder": 3
+        "main_mail": "email_you_send",
+        "first_reminder": "first_reminder_send",
+        "second_reminder": "second_reminder_send",
+        "third_reminder": "third_reminder_send"
     }
     
     if email_type not in column_mapping:
@@ -85,10 +91,8 @@ async def get_email_analysis(user_email: str, email_type: str, db: Session = Dep
         )
     
     try:
-        count = db.query(func.count(SendLog.id)).filter(
-            SendLog.user_email == user_email,
-            SendLog.send_type == column_mapping[email_type]
-        ).scalar() or 0
+        stats = await load_dashboard_stats(db, user_email)
+        count = getattr(stats, column_mapping[email_type])
         
         return {"email_type": email_type, "count": count}
     except Exception as e:
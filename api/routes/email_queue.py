@@ -1,25 +1,50 @@
 """
 Email Queue and Send Log API routes using SQLAlchemy ORM
 """
-from fastapi import APIRouter, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, insert, select, tuple_, update
 from datetime import datetime, timezone
-from api.database import get_db
+from api.database import get_async_db
 from api.models import (
     EmailQueueCreate,
+    EmailQueueBulkCreate,
+    EmailQueueBulkResponse,
+    EmailQueueBulkStatusUpdate,
+    EmailQueueBulkStatusResponse,
     EmailQueueResponse,
+    CampaignPlanResponse,
     SendLogResponse,
     MessageResponse
 )
-from api.db_models import EmailQueue, SendLog
+from api.db_models import EmailQueue, EmailQueueStatus, SendLog
+from api.campaign_planner import CampaignPlanError, enqueue_campaign
+from api.exports import EXPORTS, FORMATS, export_headers, stream_export
+from api.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from api.stats_cache import invalidate_user
 from typing import List, Optional
 
 router = APIRouter(prefix="/api/email-queue", tags=["email-queue"])
 
+# Statuses that record the outcome of a sending attempt. Any other target keeps
+# last_attempt_at, which doubles as a queue worker's lease token.
+ATTEMPT_OUTCOMES = (EmailQueueStatus.SENT, EmailQueueStatus.FAILED, EmailQueueStatus.RETRYING)
+
+
+def _id_ranges(ids: List[int]) -> List[List[int]]:
+    """Collapse ids into inclusive [first, last] runs of consecutive values, keeping order."""
+    ranges: List[List[int]] = []
+    for id_ in ids:
+        if ranges and id_ == ranges[-1][1] + 1:
+            ranges[-1][1] = id_
+        else:
+            ranges.append([id_, id_])
+    return ranges
+
 
 @router.post("/", response_model=EmailQueueResponse)
-async def create_email_queue_item(item: EmailQueueCreate, db: Session = Depends(get_db)):
+async def create_email_queue_item(item: EmailQueueCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Add an email to the queue
     """
@@ -34,8 +59,9 @@ async def create_email_queue_item(item: EmailQueueCreate, db: Session = Depends(
             status=0  # pending
         )
         db.add(db_item)
-        db.commit()
-        db.refresh(db_item)
+        await db.commit()
+        invalidate_user(item.user_email)
+        await db.refresh(db_item)
         
         return EmailQueueResponse(
             id=db_item.id,
@@ -50,27 +76,105 @@ async def create_email_queue_item(item: EmailQueueCreate, db: Session = Depends(
             created_at=db_item.created_at
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error creating queue item: {str(e)}")
 
 
+@router.post("/bulk", response_model=EmailQueueBulkResponse)
+async def create_email_queue_items(payload: EmailQueueBulkCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Add many emails to the queue with one multi-row INSERT in a single transaction
+    """
+    try:
+        rows = [
+            {
+                "user_email": item.user_email,
+                "to_email": item.to_email,
+                "subject": item.subject,
+                "body": item.body,
+                "template_id": item.template_id,
+                "scheduled_at": item.scheduled_at,
+                "status": EmailQueueStatus.PENDING,
+            }
+            for item in payload.items
+        ]
+        ids = (await db.scalars(
+            insert(EmailQueue).returning(EmailQueue.id, sort_by_parameter_order=True),
+            rows
+        )).all()
+        await db.commit()
+        for user_email in {item.user_email for item in payload.items}:
+            invalidate_user(user_email)
+
+        return EmailQueueBulkResponse(inserted=len(ids), id_ranges=_id_ranges(list(ids)))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error creating queue items: {str(e)}")
+
+
+@router.post("/plan/{user_email}", response_model=CampaignPlanResponse)
+async def plan_campaign(
+    user_email: str,
+    start_at: Optional[datetime] = Query(None, description="Plan from this moment instead of now"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Schedule the main email and every enabled reminder for all eligible contacts
+    according to the user's sending rules, in one bulk insert
+    """
+    try:
+        # The planner is pandas + sync ORM code; run_sync runs it on this session's connection
+        plan = await db.run_sync(enqueue_campaign, user_email, start_at)
+        await db.commit()
+        invalidate_user(user_email)
+
+        return CampaignPlanResponse(
+            queued=len(plan),
+            by_send_type={int(k): int(v) for k, v in plan["send_type"].value_counts().sort_index().items()},
+            first_scheduled_at=plan["scheduled_at"].min() if len(plan) else None,
+            last_scheduled_at=plan["scheduled_at"].max() if len(plan) else None
+        )
+    except CampaignPlanError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error planning campaign: {str(e)}")
+
+
 @router.get("/{user_email}", response_model=List[EmailQueueResponse])
 async def get_email_queue(
     user_email: str,
+    response: Response,
     status: Optional[int] = Query(None, description="Filter by status (0=pending, 1=sent, 2=failed, 3=retrying)"),
     limit: int = Query(100, ge=1, le=1000),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get email queue items for a user
+    Get email queue items for a user, earliest first.
+    When more items follow, the X-Next-Cursor header holds the cursor of the next page.
     """
     try:
-        query = db.query(EmailQueue).filter(EmailQueue.user_email == user_email)
+        query = select(EmailQueue).where(EmailQueue.user_email == user_email)
         
         if status is not None:
-            query = query.filter(EmailQueue.status == status)
+            query = query.where(EmailQueue.status == status)
+        
+        if cursor is not None:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            query = query.where(tuple_(EmailQueue.scheduled_at, EmailQueue.id) > after)
         
-        items = query.order_by(EmailQueue.scheduled_at.asc()).limit(limit).all()
+        items = (await db.scalars(
+            query.order_by(EmailQueue.scheduled_at.asc(), EmailQueue.id.asc()).limit(limit + 1)
+        )).all()
+        
+        if len(items) > limit:
+            items = items[:limit]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1].scheduled_at, items[-1].id)
         
         return [
             EmailQueueResponse(
@@ -87,58 +191,142 @@ async def get_email_queue(
             )
             for item in items
         ]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching queue items: {str(e)}")
 
 
+@router.patch("/status", response_model=EmailQueueBulkStatusResponse)
+async def update_queue_statuses(payload: EmailQueueBulkStatusUpdate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Set the status of many queue items of a user in one UPDATE ... RETURNING.
+    Items claimed by a queue worker are only touched when `from_status` names
+    the claimed status explicitly; items already in the target status are skipped.
+    last_attempt_at is only stamped for attempt outcomes (sent, failed, retrying).
+    """
+    if payload.ids is not None and not payload.ids:
+        return EmailQueueBulkStatusResponse(updated=0, by_previous_status={})
+
+    try:
+        target = select(EmailQueue.id, EmailQueue.status).where(
+            EmailQueue.user_email == payload.user_email,
+            EmailQueue.status != payload.status,
+        )
+        if payload.ids is not None:
+            target = target.where(EmailQueue.id.in_(payload.ids))
+        if payload.template_id is not None:
+            target = target.where(EmailQueue.template_id == payload.template_id)
+        if payload.to_email is not None:
+            target = target.where(EmailQueue.to_email == payload.to_email)
+        if payload.from_status is not None:
+            target = target.where(EmailQueue.status.in_(payload.from_status))
+        else:
+            target = target.where(EmailQueue.status != EmailQueueStatus.CLAIMED)
+        previous = target.with_for_update().subquery()
+        values = {"status": payload.status}
+        if payload.status in ATTEMPT_OUTCOMES:
+            values["last_attempt_at"] = func.now()
+
+        moved = (
+            update(EmailQueue)
+            .where(EmailQueue.id == previous.c.id)
+            .values(**values)
+            .returning(previous.c.status)
+            .cte("moved")
+        )
+        counts = (await db.execute(
+            select(moved.c.status, func.count()).group_by(moved.c.status)
+        )).all()
+        await db.commit()
+        invalidate_user(payload.user_email)
+
+        by_previous_status = {status: count for status, count in counts}
+        return EmailQueueBulkStatusResponse(
+            updated=sum(by_previous_status.values()),
+            by_previous_status=by_previous_status
+        )
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error updating statuses: {str(e)}")
+
+
 @router.patch("/{queue_id}/status", response_model=MessageResponse)
 async def update_queue_status(
     queue_id: int, 
     status: int = Query(...), 
     user_email: str = Query(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update the status of a queue item
     """
     try:
-        queue_item = db.query(EmailQueue).filter(
+        queue_item = await db.scalar(select(EmailQueue).where(
             EmailQueue.id == queue_id,
             EmailQueue.user_email == user_email
-        ).first()
+        ))
         
         if not queue_item:
             raise HTTPException(status_code=404, detail="Queue item not found")
         
         queue_item.status = status
         queue_item.last_attempt_at = datetime.now(timezone.utc)
-        db.commit()
+        await db.commit()
+        invalidate_user(user_email)
         
         return MessageResponse(message="Status updated successfully")
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error updating status: {str(e)}")
 
 
 @router.get("/logs/{user_email}", response_model=List[SendLogResponse])
 async def get_send_logs(
     user_email: str,
+    response: Response,
     limit: int = Query(100, ge=1, le=1000),
     send_type: Optional[int] = Query(None, description="Filter by send type"),
-    db: Session = Depends(get_db)
+    since: Optional[datetime] = Query(None, description="Only logs sent at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only logs sent before this time"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get send logs for a user
+    Get send logs for a user, newest first.
+    When older logs follow, the X-Next-Cursor header holds the cursor of the next page.
+    since/until limit the scan to the monthly send_log partitions they cover.
     """
     try:
-        query = db.query(SendLog).filter(SendLog.user_email == user_email)
+        query = select(SendLog).where(SendLog.user_email == user_email)
         
         if send_type is not None:
-            query = query.filter(SendLog.send_type == send_type)
+            query = query.where(SendLog.send_type == send_type)
+        if since is not None:
+            query = query.where(SendLog.sent_time >= since)
+        if until is not None:
+            query = query.where(SendLog.sent_time < until)
         
-        logs = query.order_by(SendLog.sent_time.desc()).limit(limit).all()
+        if cursor is not None:
+            try:
+                before = decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            # The plain bound lets the planner skip newer partitions; the row comparison breaks ties
+            query = query.where(
+                SendLog.sent_time <= before[0],
+                tuple_(SendLog.sent_time, SendLog.id) < before
+            )
+        
+        logs = (await db.scalars(
+            query.order_by(SendLog.sent_time.desc(), SendLog.id.desc()).limit(limit + 1)
+        )).all()
+        
+        if len(logs) > limit:
+            logs = logs[:limit]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(logs[-1].sent_time, logs[-1].id)
         
         return [
             SendLogResponse(
@@ -152,5 +340,30 @@ async def get_send_logs(
             )
             for log in logs
         ]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching send logs: {str(e)}")
+
+
+@router.get("/export/{user_email}")
+async def export_history(
+    user_email: str,
+    kind: str = Query("logs", description="What to export: logs or queue"),
+    format: str = Query("ndjson", description="Output format: ndjson or csv"),
+    since: Optional[datetime] = Query(None, description="Only rows at or after this time (sent_time / scheduled_at)"),
+    until: Optional[datetime] = Query(None, description="Only rows before this time (sent_time / scheduled_at)"),
+):
+    """
+    Stream a user's complete send log or email queue as NDJSON or CSV, oldest first
+    """
+    if kind not in EXPORTS:
+        raise HTTPException(status_code=400, detail="Invalid kind. Must be one of: logs, queue")
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid format. Must be one of: ndjson, csv")
+
+    return StreamingResponse(
+        stream_export(user_email, kind, format, since=since, until=until),
+        media_type=FORMATS[format],
+        headers=export_headers(user_email, kind, format),
+    )
@@ -1,9 +1,11 @@
 """
 Email Templates API routes using SQLAlchemy ORM
 """
-from fastapi import APIRouter, HTTPException, Depends, Query
-from sqlalchemy.orm import Session
-from api.database import get_db
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete
+from sqlalchemy.orm import selectinload
+from api.database import get_async_db
 from api.models import (
     EmailTemplateCreate,
     EmailTemplateResponse,
@@ -11,16 +13,31 @@ from api.models import (
     MessageResponse
 )
 from api.db_models import EmailTemplate, TemplateFile
+from api.etags import etag_matches, make_etag, not_modified, row_version, set_etag, snapshot
 from typing import List, Optional
 
 router = APIRouter(prefix="/api/email-templates", tags=["email-templates"])
 
+# Templates together with their files: one SELECT for templates, one for all their files
+templates_with_files = select(EmailTemplate).options(selectinload(EmailTemplate.template_files))
+
+
+async def _templates_etag(db: AsyncSession, *criteria) -> str:
+    """ETag over the row versions of the matching templates and their files."""
+    rows = (await db.execute(
+        select(EmailTemplate.id, row_version(EmailTemplate), TemplateFile.id, row_version(TemplateFile))
+        .outerjoin(TemplateFile, TemplateFile.email_template_id == EmailTemplate.id)
+        .where(*criteria)
+        .order_by(EmailTemplate.id, TemplateFile.id)
+    )).all()
+    return make_etag(rows)
+
 
 @router.post("/", response_model=EmailTemplateResponse)
 async def create_email_template(
     template: EmailTemplateCreate, 
     file_paths: Optional[List[str]] = Query(default=None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new email template with optional file paths
@@ -33,7 +50,7 @@ async def create_email_template(
             subject=template.subject
         )
         db.add(db_template)
-        db.flush()  # Get the ID without committing
+        await db.flush()  # Get the ID without committing
         
         # Add template files if provided
         if file_paths:
@@ -44,11 +61,11 @@ async def create_email_template(
                 )
                 db.add(template_file)
         
-        db.commit()
-        db.refresh(db_template)
+        await db.commit()
+        await db.refresh(db_template)
         
         # Get file paths
-        file_paths_list = [tf.file_path for tf in db_template.template_files]
+        file_paths_list = [tf.file_path for tf in await db_template.awaitable_attrs.template_files]
         
         return EmailTemplateResponse(
             id=db_template.id,
@@ -60,19 +77,32 @@ async def create_email_template(
             file_paths=file_paths_list
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error creating template: {str(e)}")
 
 
 @router.get("/{user_email}", response_model=List[EmailTemplateResponse])
-async def get_email_templates(user_email: str, db: Session = Depends(get_db)):
+async def get_email_templates(
+    user_email: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Get all email templates for a user
+    Get all email templates for a user (304 if If-None-Match still matches)
     """
     try:
-        templates = db.query(EmailTemplate).filter(
-            EmailTemplate.user_email == user_email
-        ).order_by(EmailTemplate.created_at.desc()).all()
+        await snapshot(db)
+        etag = await _templates_etag(db, EmailTemplate.user_email == user_email)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
+        
+        templates = (await db.scalars(
+            templates_with_files.where(
+                EmailTemplate.user_email == user_email
+            ).order_by(EmailTemplate.created_at.desc())
+        )).all()
         
         return [
             EmailTemplateResponse(
@@ -91,15 +121,25 @@ async def get_email_templates(user_email: str, db: Session = Depends(get_db)):
 
 
 @router.get("/{user_email}/{template_id}", response_model=EmailTemplateResponse)
-async def get_email_template(user_email: str, template_id: int, db: Session = Depends(get_db)):
+async def get_email_template(
+    user_email: str,
+    template_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Get a specific email template
+    Get a specific email template (304 if If-None-Match still matches)
     """
     try:
-        template = db.query(EmailTemplate).filter(
-            EmailTemplate.id == template_id,
-            EmailTemplate.user_email == user_email
-        ).first()
+        criteria = (EmailTemplate.id == template_id, EmailTemplate.user_email == user_email)
+        await snapshot(db)
+        etag = await _templates_etag(db, *criteria)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
+        
+        template = await db.scalar(templates_with_files.where(*criteria))
         
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
@@ -125,16 +165,16 @@ async def update_email_template(
     template: EmailTemplateUpdate, 
     user_email: str = Query(...),
     file_paths: List[str] = Query(default=None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update an email template
     """
     try:
-        db_template = db.query(EmailTemplate).filter(
+        db_template = await db.scalar(select(EmailTemplate).where(
             EmailTemplate.id == template_id,
             EmailTemplate.user_email == user_email
-        ).first()
+        ))
         
         if not db_template:
             raise HTTPException(status_code=404, detail="Template not found")
@@ -150,9 +190,9 @@ async def update_email_template(
         # Update file paths if provided
         if file_paths is not None:
             # Delete existing files
-            db.query(TemplateFile).filter(
+            await db.execute(delete(TemplateFile).where(
                 TemplateFile.email_template_id == template_id
-            ).delete()
+            ))
             # Add new files
             for file_path in file_paths:
                 template_file = TemplateFile(
@@ -161,8 +201,8 @@ async def update_email_template(
                 )
                 db.add(template_file)
         
-        db.commit()
-        db.refresh(db_template)
+        await db.commit()
+        await db.refresh(db_template)
         
         return EmailTemplateResponse(
             id=db_template.id,
@@ -171,12 +211,12 @@ async def update_email_template(
             template_type=db_template.template_type,
             subject=db_template.subject,
             created_at=db_template.created_at,
-            file_paths=[tf.file_path for tf in db_template.template_files]
+            file_paths=[tf.file_path for tf in await db_template.awaitable_attrs.template_files]
         )
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error updating template: {str(e)}")
 
 
@@ -184,43 +224,56 @@ async def update_email_template(
 async def delete_email_template(
     template_id: int, 
     user_email: str = Query(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Delete an email template
     """
     try:
-        template = db.query(EmailTemplate).filter(
+        template = await db.scalar(select(EmailTemplate).where(
             EmailTemplate.id == template_id,
             EmailTemplate.user_email == user_email
-        ).first()
+        ))
         
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         
-        db.delete(template)
-        db.commit()
+        await db.delete(template)
+        await db.commit()
         
         return MessageResponse(message="Template deleted successfully")
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error deleting template: {str(e)}")
 
 
 @router.get("/{user_email}/by-type/{template_type}", response_model=Optional[EmailTemplateResponse])
-async def get_template_by_type(user_email: str, template_type: int, db: Session = Depends(get_db)):
+async def get_template_by_type(
+    user_email: str,
+    template_type: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Get the most recent template of a specific type for a user
     Useful for loading main_template (0), first_reminder (1), second_reminder (2), third_reminder (3)
-    Returns None if no template found
+    Returns None if no template found (304 if If-None-Match still matches)
     """
     try:
-        template = db.query(EmailTemplate).filter(
+        latest_id = select(EmailTemplate.id).where(
             EmailTemplate.user_email == user_email,
             EmailTemplate.template_type == template_type
-        ).order_by(EmailTemplate.created_at.desc()).first()
+        ).order_by(EmailTemplate.created_at.desc()).limit(1).scalar_subquery()
+        await snapshot(db)
+        etag = await _templates_etag(db, EmailTemplate.id == latest_id)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
+        
+        template = await db.scalar(templates_with_files.where(EmailTemplate.id == latest_id))
         
         if not template:
             return None
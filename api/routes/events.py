@@ -0,0 +1,50 @@
+"""
+Live event stream (Server-Sent Events) API route
+"""
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Header, Query, Request
+from fastapi.responses import StreamingResponse
+
+from api.event_hub import event_hub
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+# Seconds between keep-alive comments on an idle stream
+KEEP_ALIVE_SECONDS = 15.0
+
+
+@router.get("/{user_email}")
+async def stream_events(
+    user_email: str,
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    since: Optional[str] = Query(None, description="Event id to resume after, for clients that cannot set Last-Event-ID"),
+):
+    """
+    Stream queue changes, send results and counter deltas of a user as Server-Sent Events.
+    Event types: queue, send, counters, and resync (reload state, then keep listening)
+    """
+    subscription = event_hub.subscribe(user_email, last_event_id or since)
+
+    async def body():
+        try:
+            yield "retry: 2000\n\n"
+            while not await request.is_disconnected():
+                events = await subscription.next(timeout=KEEP_ALIVE_SECONDS)
+                if not events:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield "".join(
+                    f"id: {event_hub.event_id(seq)}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+                    for seq, event_type, data in events
+                )
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,9 +1,10 @@
 """
 Sending Rules API routes using SQLAlchemy ORM
 """
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from api.database import get_db
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from api.database import get_async_db
 from api.models import (
     SendingRulesCreate,
     SendingRulesResponse,
@@ -11,20 +12,22 @@ from api.models import (
     MessageResponse
 )
 from api.db_models import SendingRules
+from api.etags import etag_matches, make_etag, not_modified, row_version, set_etag, snapshot
+from typing import Optional
 
 router = APIRouter(prefix="/api/sending-rules", tags=["sending-rules"])
 
 
 @router.post("/", response_model=SendingRulesResponse)
-async def create_sending_rules(rules: SendingRulesCreate, db: Session = Depends(get_db)):
+async def create_sending_rules(rules: SendingRulesCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Create or update sending rules for a user
     """
     try:
         # Check if rules exist
-        existing = db.query(SendingRules).filter(
+        existing = await db.scalar(select(SendingRules).where(
             SendingRules.user_email == rules.user_email
-        ).first()
+        ))
         
         if existing:
             # Update existing
@@ -38,8 +41,8 @@ async def create_sending_rules(rules: SendingRulesCreate, db: Session = Depends(
             existing.period_between_reminders = rules.period_between_reminders
             existing.delay_sending_mail = rules.delay_sending_mail
             existing.start_time_send = rules.start_time_send
-            db.commit()
-            db.refresh(existing)
+            await db.commit()
+            await db.refresh(existing)
             result = existing
         else:
             # Insert new
@@ -57,8 +60,8 @@ async def create_sending_rules(rules: SendingRulesCreate, db: Session = Depends(
                 start_time_send=rules.start_time_send
             )
             db.add(db_rules)
-            db.commit()
-            db.refresh(db_rules)
+            await db.commit()
+            await db.refresh(db_rules)
             result = db_rules
         
         return SendingRulesResponse(
@@ -77,23 +80,38 @@ async def create_sending_rules(rules: SendingRulesCreate, db: Session = Depends(
             created_at=result.created_at
         )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error creating/updating sending rules: {str(e)}")
 
 
 @router.get("/{user_email}", response_model=SendingRulesResponse)
-async def get_sending_rules(user_email: str, db: Session = Depends(get_db)):
+async def get_sending_rules(
+    user_email: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Get sending rules for a user
+    Get sending rules for a user (304 if If-None-Match still matches)
     """
     try:
-        rules = db.query(SendingRules).filter(
+        await snapshot(db)
+        version = (await db.execute(select(SendingRules.id, row_version(SendingRules)).where(
             SendingRules.user_email == user_email
-        ).first()
+        ))).first()
         
-        if not rules:
+        if not version:
             raise HTTPException(status_code=404, detail="Sending rules not found")
         
+        etag = make_etag([version])
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
+        
+        rules = await db.scalar(select(SendingRules).where(
+            SendingRules.id == version.id
+        ))
+        
         return SendingRulesResponse(
             id=rules.id,
             user_email=rules.user_email,
@@ -116,14 +134,14 @@ async def get_sending_rules(user_email: str, db: Session = Depends(get_db)):
 
 
 @router.patch("/{user_email}", response_model=SendingRulesResponse)
-async def update_sending_rules(user_email: str, rules: SendingRulesUpdate, db: Session = Depends(get_db)):
+async def update_sending_rules(user_email: str, rules: SendingRulesUpdate, db: AsyncSession = Depends(get_async_db)):
     """
     Partially update sending rules for a user
     """
     try:
-        db_rules = db.query(SendingRules).filter(
+        db_rules = await db.scalar(select(SendingRules).where(
             SendingRules.user_email == user_email
-        ).first()
+        ))
         
         if not db_rules:
             raise HTTPException(status_code=404, detail="Sending rules not found")
@@ -150,8 +168,8 @@ async def update_sending_rules(user_email: str, rules: SendingRulesUpdate, db: S
         if rules.start_time_send is not None:
             db_rules.start_time_send = rules.start_time_send
         
-        db.commit()
-        db.refresh(db_rules)
+        await db.commit()
+        await db.refresh(db_rules)
         
         return SendingRulesResponse(
             id=db_rules.id,
@@ -171,5 +189,5 @@ async def update_sending_rules(user_email: str, rules: SendingRulesUpdate, db: S
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error updating sending rules: {str(e)}")
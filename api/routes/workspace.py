@@ -0,0 +1,108 @@
+"""
+Workspace API route: all startup state of a user in one request
+"""
+import asyncio
+
+from fastapi import APIRouter, HTTPException
+from sqlalchemy import func, select
+
+from api import database
+from api.models import (
+    EmailTemplateResponse,
+    QueueSummary,
+    SendingRulesResponse,
+    WorkspaceResponse
+)
+from api.db_models import EmailQueue, EmailQueueStatus, EmailTemplate, SendingRules
+from api.routes.dashboard import load_dashboard_stats
+from api.routes.email_templates import templates_with_files
+
+router = APIRouter(prefix="/api/workspace", tags=["workspace"])
+
+
+async def _latest_templates(user_email: str):
+    # DISTINCT ON keeps the newest template of each type; files come with one more query
+    async with database.AsyncSessionLocal() as db:
+        templates = (await db.scalars(
+            templates_with_files.where(EmailTemplate.user_email == user_email)
+            .distinct(EmailTemplate.template_type)
+            .order_by(EmailTemplate.template_type, EmailTemplate.created_at.desc())
+        )).all()
+    return {
+        t.template_type: EmailTemplateResponse(
+            id=t.id,
+            user_email=t.user_email,
+            template_body=t.template_body,
+            template_type=t.template_type,
+            subject=t.subject,
+            created_at=t.created_at,
+            file_paths=[tf.file_path for tf in t.template_files]
+        )
+        for t in templates
+    }
+
+
+async def _sending_rules(user_email: str):
+    async with database.AsyncSessionLocal() as db:
+        rules = await db.scalar(select(SendingRules).where(SendingRules.user_email == user_email))
+    if not rules:
+        return None
+    return SendingRulesResponse(
+        id=rules.id,
+        user_email=rules.user_email,
+        main_mail_number=rules.main_mail_number,
+        reminder_one=rules.reminder_one,
+        reminder_two=rules.reminder_two,
+        reminder_three=rules.reminder_three,
+        local_professor_time=rules.local_professor_time,
+        max_email_per_university=rules.max_email_per_university,
+        send_working_day_only=rules.send_working_day_only,
+        period_between_reminders=rules.period_between_reminders,
+        delay_sending_mail=rules.delay_sending_mail,
+        start_time_send=str(rules.start_time_send) if rules.start_time_send else None,
+        created_at=rules.created_at
+    )
+
+
+async def _stats(user_email: str):
+    async with database.AsyncSessionLocal() as db:
+        return await load_dashboard_stats(db, user_email)
+
+
+async def _queue_summary(user_email: str):
+    async with database.AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(EmailQueue.status, func.count(), func.min(EmailQueue.scheduled_at))
+            .where(EmailQueue.user_email == user_email)
+            .group_by(EmailQueue.status)
+        )).all()
+    by_status = {status: count for status, count, _ in rows}
+    next_scheduled_at = next(
+        (first for status, _, first in rows if status == EmailQueueStatus.PENDING), None
+    )
+    return QueueSummary(by_status=by_status, next_scheduled_at=next_scheduled_at)
+
+
+@router.get("/{user_email}", response_model=WorkspaceResponse)
+async def get_workspace(user_email: str):
+    """
+    Get the latest template of each type (with files), the sending rules,
+    dashboard stats and queue summary of a user.
+    The four parts are read concurrently, each on its own pooled connection.
+    """
+    try:
+        templates, rules, stats, queue = await asyncio.gather(
+            _latest_templates(user_email),
+            _sending_rules(user_email),
+            _stats(user_email),
+            _queue_summary(user_email),
+        )
+        return WorkspaceResponse(
+            user_email=user_email,
+            templates=templates,
+            sending_rules=rules,
+            stats=stats,
+            queue=queue
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading workspace: {str(e)}")
@@ -0,0 +1,112 @@
+"""
+send_log partition maintenance
+
+send_log is range-partitioned by UTC month of sent_time (DB/migrations/
+003_send_log_partitions.sql). Partitions for the coming months are created
+ahead of time by the queue worker; old months are retired whole: detached
+from send_log and moved to the send_log_archive schema, or dropped. Either
+is a catalog change, however many rows the month holds.
+
+Usage:
+    python -m api.send_log_partitions                    # create the coming months
+    python -m api.send_log_partitions --keep-months 24   # ... and archive older months
+    python -m api.send_log_partitions --keep-months 24 --drop
+    python -m api.send_log_partitions --list
+
+Per-user counters in metrics are not reduced when a month is retired; they keep
+counting every email ever sent.
+"""
+import argparse
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+ARCHIVE_SCHEMA = "send_log_archive"
+
+_PARTITION_NAME = re.compile(r"^send_log_y(\d{4})m(\d{2})$")
+
+
+def _month_start(day: date, months_back: int = 0) -> date:
+    index = day.year * 12 + day.month - 1 - months_back
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def ensure_partitions(db, months_ahead: int = 3) -> int:
+    """
+    Create the partitions of the current month and the next `months_ahead`
+    months that do not exist yet; returns how many were created. Works on a
+    Session or Connection; the caller commits.
+    """
+    return db.execute(
+        text("SELECT send_log_ensure_partitions(date_trunc('month', now() AT TIME ZONE 'UTC')::date, :months)"),
+        {"months": months_ahead + 1},
+    ).scalar()
+
+
+def list_partitions(engine: Engine) -> List[Tuple[str, Optional[date]]]:
+    """(name, month) of every partition attached to send_log, oldest first; month is None for the default."""
+    with engine.connect() as conn:
+        names = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'send_log'::regclass"
+        )).scalars().all()
+    partitions = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1) if match else None))
+    return sorted(partitions, key=lambda item: (item[1] is not None, item[1] or date.min))
+
+
+def apply_retention(engine: Engine, keep_months: int, drop: bool = False, today: Optional[date] = None) -> List[str]:
+    """
+    Retire every month older than the newest `keep_months` (the current month
+    counts as one): detach it and move it to ARCHIVE_SCHEMA, or drop it.
+    Each month is retired in its own short transaction; returns their names.
+    """
+    if keep_months < 1:
+        raise ValueError("keep_months must be at least 1")
+    cutoff = _month_start(today or datetime.now(timezone.utc).date(), keep_months - 1)
+
+    retired = []
+    for name, month in list_partitions(engine):
+        if month is None or month >= cutoff:
+            continue
+        with engine.begin() as conn:
+            # DETACH needs a brief exclusive lock on send_log; give up rather than queue behind long reads
+            conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+            conn.execute(text(f'ALTER TABLE send_log DETACH PARTITION "{name}"'))
+            if drop:
+                conn.execute(text(f'DROP TABLE "{name}"'))
+            else:
+                # Archived rows get no new ids; without the default the table no longer depends on send_log_id_seq
+                conn.execute(text(f'ALTER TABLE "{name}" ALTER COLUMN id DROP DEFAULT'))
+                conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{ARCHIVE_SCHEMA}"'))
+                conn.execute(text(f'ALTER TABLE "{name}" SET SCHEMA "{ARCHIVE_SCHEMA}"'))
+        retired.append(name)
+    return retired
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain send_log monthly partitions")
+    parser.add_argument("--months-ahead", type=int, default=3, help="Future months to create")
+    parser.add_argument("--keep-months", type=int, help="Retire months older than this many (current included)")
+    parser.add_argument("--drop", action="store_true", help="Drop retired months instead of archiving them")
+    parser.add_argument("--list", action="store_true", help="Only list partitions")
+    args = parser.parse_args()
+
+    from api.database import engine
+
+    if args.list:
+        for name, month in list_partitions(engine):
+            print(f"{month.strftime('%Y-%m') if month else 'default':8} {name}")
+    else:
+        with engine.begin() as conn:
+            created = ensure_partitions(conn, args.months_ahead)
+        print(f"✅ {created} partition(s) created")
+        if args.keep_months is not None:
+            retired = apply_retention(engine, args.keep_months, drop=args.drop)
+            action = "dropped" if args.drop else f"moved to {ARCHIVE_SCHEMA}"
+            print(f"✅ {len(retired)} partition(s) {action}" + (f": {', '.join(retired)}" if retired else ""))
@@ -0,0 +1,229 @@
+"""
+Write-behind send_log writer
+
+Delivery results are buffered in memory and written by a background thread in
+bulk: with COPY ... FROM STDIN on psycopg, with a multi-row INSERT otherwise.
+A flush happens when `batch_size` rows are waiting or `flush_interval` seconds
+after the oldest waiting row, and on close() / interpreter exit.
+
+When a bulk write fails the batch is written row by row, so one bad row (e.g. a
+foreign key violation) cannot hold back the others. Rows rejected by the
+database are dead-lettered: logged, and appended to `dead_letter_path` as NDJSON
+when one is set. Rows that failed because the database was unreachable stay
+buffered for up to `max_retries` more flushes; the buffer holds at most
+`max_buffered` rows, dead-lettering the oldest beyond that.
+"""
+import atexit
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import exc, insert
+from sqlalchemy.engine import Engine
+
+from api.database import engine as default_engine
+from api.db_models import SendLog
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = [
+    "user_email",
+    "sent_to",
+    "sent_time",
+    "subject",
+    "body",
+    "template_id",
+    "send_type",
+    "delivery_status",
+    "remote_message_id",
+]
+
+
+class SendLogWriter:
+    """Buffer SendLog rows from any thread and flush them in bulk"""
+
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        use_copy: bool = True,
+        max_retries: int = 5,
+        max_buffered: int = 100000,
+        dead_letter_path: Optional[str] = None,
+    ):
+        self.engine = engine or default_engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.use_copy = use_copy
+        self.max_retries = max_retries
+        self.max_buffered = max_buffered
+        self.dead_letter_path = dead_letter_path
+        self._rows: List[Tuple[tuple, int]] = []  # (row, failed flushes so far)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dead_lettered = 0
+
+    def add(
+        self,
+        user_email: str,
+        sent_to: str,
+        send_type: int,
+        delivery_status: int,
+        subject: Optional[str] = None,
+        body: Optional[str] = None,
+        template_id: Optional[int] = None,
+        remote_message_id: Optional[str] = None,
+        sent_time: Optional[datetime] = None,
+    ) -> None:
+        """Queue one send_log row; sent_time defaults to now."""
+        row = (
+            user_email,
+            sent_to,
+            sent_time or datetime.now(timezone.utc),
+            subject,
+            body,
+            template_id,
+            send_type,
+            delivery_status,
+            remote_message_id,
+        )
+        overflow = []
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SendLogWriter is closed")
+            self._rows.append((row, 0))
+            if len(self._rows) > self.max_buffered:
+                overflow = [r for r, _ in self._rows[:len(self._rows) - self.max_buffered]]
+                del self._rows[:len(overflow)]
+            if self._thread is None:
+                self._start()
+            if len(self._rows) >= self.batch_size:
+                self._wakeup.notify()
+        if overflow:
+            self._dead_letter(overflow, f"buffer full ({self.max_buffered} rows)")
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    # -----------------------------------------------------
+    # Flushing
+    # -----------------------------------------------------
+    def flush(self) -> int:
+        """Write every buffered row now; returns how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._rows = self._rows, []
+            if not entries:
+                return 0
+            rows = [row for row, _ in entries]
+            try:
+                self._write(rows)
+                written, retry = len(rows), []
+            except Exception:
+                logger.warning("Bulk write of %s send_log row(s) failed, writing them one by one",
+                               len(rows), exc_info=True)
+                written, retry = self._write_each(entries)
+            self.written += written
+
+            if retry:
+                expired = [row for row, attempts in retry if attempts >= self.max_retries]
+                if expired:
+                    self._dead_letter(expired, f"database unavailable for {self.max_retries + 1} flushes")
+                with self._lock:
+                    self._rows[:0] = [(row, attempts + 1) for row, attempts in retry if attempts < self.max_retries]
+        return written
+
+    def _write_each(self, entries: List[Tuple[tuple, int]]) -> Tuple[int, List[Tuple[tuple, int]]]:
+        """
+        Insert rows one per transaction. Rows the database rejects are
+        dead-lettered; once the connection itself fails, the rest are returned
+        for a later flush. Returns (rows written, entries to retry).
+        """
+        written = 0
+        for index, (row, _) in enumerate(entries):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(SendLog), [dict(zip(COLUMNS, row))])
+            except (exc.OperationalError, exc.InterfaceError) as e:
+                logger.warning("send_log unavailable, keeping %s row(s) for the next flush: %s",
+                               len(entries) - index, e)
+                return written, entries[index:]
+            except Exception as e:
+                self._dead_letter([row], str(e).splitlines()[0])
+                continue
+            written += 1
+        return written, []
+
+    def _dead_letter(self, rows: List[tuple], reason: str) -> None:
+        """Give up on rows: log them and append them to dead_letter_path, if set."""
+        self.dead_lettered += len(rows)
+        logger.error("Dropping %s send_log row(s) (%s): %s", len(rows), reason,
+                     ", ".join(f"{row[0]} -> {row[1]} at {row[2]}" for row in rows[:10])
+                     + (", ..." if len(rows) > 10 else ""))
+        if not self.dead_letter_path:
+            return
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    record = {name: value.isoformat() if isinstance(value, datetime) else value
+                              for name, value in zip(COLUMNS, row)}
+                    f.write(json.dumps({**record, "reason": reason}, ensure_ascii=False) + "\n")
+        except OSError:
+            logger.exception("Could not write send_log dead letters to %s", self.dead_letter_path)
+
+    def _write(self, rows: List[tuple]) -> None:
+        if self.use_copy:
+            raw = self.engine.raw_connection()
+            try:
+                with raw.cursor() as cursor:
+                    if hasattr(cursor, "copy"):  # psycopg 3
+                        with cursor.copy(f"COPY send_log ({', '.join(COLUMNS)}) FROM STDIN") as copy:
+                            for row in rows:
+                                copy.write_row(row)
+                        raw.commit()
+                        return
+            except Exception:
+                raw.rollback()
+                raise
+            finally:
+                raw.close()
+
+        with self.engine.begin() as conn:
+            conn.execute(insert(SendLog), [dict(zip(COLUMNS, row)) for row in rows])
+
+    def _start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="send-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._closed and len(self._rows) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                if self._closed:
+                    return
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the background thread and write everything still buffered."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        with self._lock:
+            leftover, self._rows = [row for row, _ in self._rows], []
+        if leftover:
+            self._dead_letter(leftover, "not written before shutdown")
@@ -0,0 +1,294 @@
+"""
+Professor-local send windows
+
+Resolves a professor's timezone from the country of their university (or of an
+open position they supervise) and maps the user's daily start/end time, read as
+the professor's wall-clock time, to UTC.
+
+All work is vectorized over rows; the only per-value Python work is done once
+per distinct country, and once per (timezone, day) for the UTC offset, both of
+which are cached. Times are handled as int64 minutes since the Unix epoch.
+"""
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, TZPATH
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import BigInteger, DateTime, column, select, update, values, func
+from sqlalchemy.orm import Session
+
+from api.db_models import EmailQueue, EmailQueueStatus, OpenPosition, Professor, SendingRules, University
+
+DEFAULT_ZONE = "UTC"
+DEFAULT_START_TIME = time(9, 0)
+# The UI's end time (txt_end_time) has no column in sending_rules yet
+DEFAULT_END_TIME = time(17, 0)
+# Spacing used when delay_sending_mail is 0, close to the desktop sender's 4.5–5.5 minutes
+DEFAULT_SPACING_MINUTES = 5
+MINUTES_PER_DAY = 24 * 60
+
+_EPOCH = date(1970, 1, 1)
+# Common spellings that are not the iso3166.tab names
+_COUNTRY_ALIASES = {
+    "usa": "US",
+    "united states": "US",
+    "united states of america": "US",
+    "uk": "GB",
+    "united kingdom": "GB",
+    "england": "GB",
+    "scotland": "GB",
+    "south korea": "KR",
+    "korea": "KR",
+    "russia": "RU",
+    "iran": "IR",
+    "the netherlands": "NL",
+    "holland": "NL",
+}
+
+
+# -----------------------------------------------------
+# Country -> timezone
+# -----------------------------------------------------
+def _read_tab(name: str):
+    """Rows of a tzdata table (zone.tab, iso3166.tab) from the system zoneinfo or the tzdata package."""
+    text = None
+    for base in TZPATH:
+        path = os.path.join(base, name)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            break
+    if text is None:
+        try:
+            from importlib import resources
+            text = resources.files("tzdata.zoneinfo").joinpath(name).read_text(encoding="utf-8")
+        except (ImportError, OSError):
+            return []
+    return [line.split("\t") for line in text.splitlines() if line.strip() and not line.startswith("#")]
+
+
+@lru_cache(maxsize=1)
+def _country_tables() -> Tuple[Dict[str, str], Dict[str, str]]:
+    """(ISO code -> principal zone, lower-cased country name -> ISO code)"""
+    zones: Dict[str, str] = {}
+    for row in _read_tab("zone.tab"):
+        if len(row) >= 3:
+            # zone.tab lists the most populous zone of a country first
+            zones.setdefault(row[0].upper(), row[2])
+    codes = dict(_COUNTRY_ALIASES)
+    for row in _read_tab("iso3166.tab"):
+        if len(row) >= 2:
+            codes.setdefault(row[1].strip().lower(), row[0].upper())
+    return zones, codes
+
+
+@lru_cache(maxsize=4096)
+def resolve_zone(country: Optional[str]) -> str:
+    """
+    IANA timezone for a country given as ISO 3166-1 alpha-2 code, English name or
+    timezone name; DEFAULT_ZONE when it cannot be resolved.
+    """
+    if not isinstance(country, str) or not country.strip():
+        return DEFAULT_ZONE
+    value = country.strip()
+    if "/" in value:
+        try:
+            ZoneInfo(value)
+            return value
+        except (ZoneInfoNotFoundError, ValueError):
+            return DEFAULT_ZONE
+    zones, codes = _country_tables()
+    code = value.upper() if len(value) == 2 else codes.get(value.lower())
+    return zones.get(code, DEFAULT_ZONE)
+
+
+def resolve_zones(countries) -> np.ndarray:
+    """resolve_zone for a whole column, resolving each distinct country once."""
+    countries = pd.Series(countries, dtype=object).where(pd.notna(countries), None)
+    return countries.map(resolve_zone).to_numpy(dtype=object)
+
+
+def position_country(professor_email):
+    """
+    SQL expression for the country of an open position supervised by a professor,
+    used when the professor's university has no country.
+    """
+    return (
+        select(OpenPosition.country)
+        .where(OpenPosition.supervisor_email == professor_email, OpenPosition.country.isnot(None))
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+# -----------------------------------------------------
+# Offsets and windows
+# -----------------------------------------------------
+@lru_cache(maxsize=65536)
+def utc_offset_minutes(zone: str, day: int) -> int:
+    """
+    UTC offset of `zone` on `day` (days since the epoch), taken at local noon:
+    send windows never straddle the early-morning DST switch.
+    """
+    noon = datetime.combine(_EPOCH + timedelta(days=day), time(12), tzinfo=ZoneInfo(zone))
+    return int(noon.utcoffset().total_seconds()) // 60
+
+
+def _offsets(zone: str, days: np.ndarray) -> np.ndarray:
+    unique, inverse = np.unique(days, return_inverse=True)
+    return np.array([utc_offset_minutes(zone, int(d)) for d in unique], dtype=np.int64)[inverse]
+
+
+def to_minutes(values) -> np.ndarray:
+    """Epoch minutes (UTC) of datetimes / a datetime Series."""
+    stamps = pd.to_datetime(pd.Series(values), utc=True).dt.tz_convert(None)
+    return stamps.to_numpy().astype("datetime64[m]").astype(np.int64)
+
+
+def from_minutes(minutes) -> pd.Series:
+    """UTC timestamps of epoch minutes."""
+    return pd.Series(pd.to_datetime(np.asarray(minutes, dtype=np.int64), unit="m", utc=True))
+
+
+def time_to_minutes(value: Optional[time], default: time) -> int:
+    value = value or default
+    return value.hour * 60 + value.minute
+
+
+def local_to_utc(days, minutes, zones) -> np.ndarray:
+    """
+    UTC epoch minutes of local wall-clock times: `days` since the epoch and
+    `minutes` past local midnight, in each row's timezone.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    zones = np.asarray(zones, dtype=object)
+    result = days * MINUTES_PER_DAY + np.asarray(minutes, dtype=np.int64)
+    for zone in pd.unique(zones):
+        mask = zones == zone
+        result[mask] -= _offsets(zone, days[mask])
+    return result
+
+
+def align_to_windows(utc_minutes, zones, start_minutes, end_minutes, working_days_only=False) -> np.ndarray:
+    """
+    Earliest moment at or after each row's time that falls inside the row's
+    local [start, end) window, skipping weekends where working_days_only is set.
+    Times already inside their window are returned unchanged.
+    """
+    utc_minutes = np.asarray(utc_minutes, dtype=np.int64)
+    n = len(utc_minutes)
+    zones = np.asarray(zones, dtype=object)
+    start = np.broadcast_to(np.asarray(start_minutes, dtype=np.int64), n)
+    end = np.broadcast_to(np.asarray(end_minutes, dtype=np.int64), n)
+    end = np.where(end <= start, MINUTES_PER_DAY, end)
+    working = np.broadcast_to(np.asarray(working_days_only, dtype=bool), n)
+
+    result = utc_minutes.copy()
+    for zone in pd.unique(zones):
+        mask = zones == zone
+        utc = utc_minutes[mask]
+        local = utc + _offsets(zone, utc // MINUTES_PER_DAY)
+        # Second pass picks the offset of the local day, which differs near midnight
+        local = utc + _offsets(zone, local // MINUTES_PER_DAY)
+        day, minute = np.divmod(local, MINUTES_PER_DAY)
+
+        target = np.where(minute >= end[mask], day + 1, day)
+        zone_working = working[mask]
+        if zone_working.any():
+            business = np.busday_offset(target.astype("datetime64[D]"), 0, roll="forward").astype(np.int64)
+            target = np.where(zone_working, business, target)
+
+        moved = (target != day) | (minute < start[mask])
+        aligned = utc.copy()
+        if moved.any():
+            aligned[moved] = local_to_utc(target[moved], start[mask][moved], np.full(moved.sum(), zone, dtype=object))
+        result[mask] = aligned
+    return result
+
+
+# -----------------------------------------------------
+# Queue
+# -----------------------------------------------------
+def align_queue(db: Session, user_email: Optional[str] = None, now: Optional[datetime] = None,
+                horizon: Optional[timedelta] = None) -> int:
+    """
+    Move pending/retrying queue items of users with local_professor_time into
+    the next send window of their professor, in one UPDATE ... FROM (VALUES ...).
+    Items already due are aligned from `now`, so an overdue item is never sent
+    outside the window just because its scheduled_at once fell inside one.
+    Items moved into the same window of a user keep their order and are spaced
+    delay_sending_mail minutes apart rather than all landing on its start.
+    With `horizon`, only items due before now + horizon are looked at; later
+    ones are aligned by a later call, closer to their time.
+    Returns the number of rescheduled items (the caller commits).
+    """
+    now = now or datetime.now(timezone.utc)
+    query = (
+        select(
+            EmailQueue.id,
+            EmailQueue.user_email,
+            EmailQueue.scheduled_at,
+            func.coalesce(University.country, position_country(EmailQueue.to_email)).label("country"),
+            SendingRules.start_time_send,
+            SendingRules.send_working_day_only,
+            SendingRules.delay_sending_mail,
+        )
+        .join(SendingRules, SendingRules.user_email == EmailQueue.user_email)
+        .outerjoin(Professor, Professor.email == EmailQueue.to_email)
+        .outerjoin(University, University.id == Professor.university_id)
+        .where(
+            EmailQueue.status.in_((EmailQueueStatus.PENDING, EmailQueueStatus.RETRYING)),
+            SendingRules.local_professor_time.is_(True),
+        )
+    )
+    if user_email is not None:
+        query = query.where(EmailQueue.user_email == user_email)
+    if horizon is not None:
+        query = query.where(EmailQueue.scheduled_at <= now + horizon)
+    result = db.execute(query)
+    rows = pd.DataFrame(result.all(), columns=list(result.keys()))
+    if rows.empty:
+        return 0
+
+    scheduled = to_minutes(rows["scheduled_at"])
+    earliest = np.maximum(scheduled, to_minutes([now])[0])
+    starts = np.fromiter(
+        (time_to_minutes(t, DEFAULT_START_TIME) for t in rows["start_time_send"]), dtype=np.int64, count=len(rows)
+    )
+    aligned = align_to_windows(
+        earliest,
+        resolve_zones(rows["country"]),
+        starts,
+        time_to_minutes(DEFAULT_END_TIME, DEFAULT_END_TIME),
+        rows["send_working_day_only"].to_numpy(dtype=bool),
+    )
+    moved = np.flatnonzero(aligned != earliest)
+    if len(moved) == 0:
+        return 0
+    # n-th item of a user moved into the same window goes n spacings after its start
+    order = moved[np.argsort(scheduled[moved], kind="stable")]
+    rank = pd.DataFrame({
+        "user": rows["user_email"].str.lower().to_numpy()[order],
+        "window": aligned[order],
+    }).groupby(["user", "window"]).cumcount().to_numpy()
+    spacing = rows["delay_sending_mail"].to_numpy(dtype=np.int64)[order]
+    aligned[order] += rank * np.where(spacing > 0, spacing, DEFAULT_SPACING_MINUTES)
+    new_times = values(
+        column("id", BigInteger), column("scheduled_at", DateTime(timezone=True)), name="aligned"
+    ).data([
+        (int(queue_id), when.to_pydatetime())
+        for queue_id, when in zip(rows["id"].to_numpy()[moved], from_minutes(aligned[moved]))
+    ])
+    # Re-checks the status: rows claimed since they were read are left alone
+    return db.execute(
+        update(EmailQueue)
+        .where(
+            EmailQueue.id == new_times.c.id,
+            EmailQueue.status.in_((EmailQueueStatus.PENDING, EmailQueueStatus.RETRYING)),
+        )
+        .values(scheduled_at=new_times.c.scheduled_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
@@ -0,0 +1,63 @@
+"""
+Short-lived per-user cache of dashboard statistics
+
+Entries expire after `ttl` seconds and are dropped as soon as this process
+changes a user's queue. Changes made by other processes (e.g. a queue worker
+writing send_log) reach the API as NOTIFY events, and api/event_hub.py drops
+the user's entry when one arrives; without the hub they show up once the
+entry expires.
+"""
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire after `ttl` seconds"""
+
+    def __init__(self, ttl: float = 10.0, max_entries: int = 10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key.lower())
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self.clock():
+                del self._entries[key.lower()]
+                return None
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = self.clock()
+                for stale in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                    del self._entries[stale]
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[key.lower()] = (self.clock() + self.ttl, value)
+
+    def invalidate(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key.lower(), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Dashboard stats per user email
+dashboard_cache = TTLCache(ttl=10.0)
+
+
+def invalidate_user(user_email: str) -> None:
+    """Drop every cached statistic of a user."""
+    dashboard_cache.invalidate(user_email)
+
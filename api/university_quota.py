@@ -0,0 +1,172 @@
+"""
+Per-university sending quota
+
+Enforces SendingRules.max_email_per_university: at most that many main emails
+from one user to professors of the same university within a sliding window
+(24 hours by default).
+
+The index keeps, per (user, university), a deque of send times in ascending
+order. Expired times are dropped from the left, so an allow/deny decision is
+amortized O(1) and never touches the database. It is seeded per user from
+send_log and professor_contact, and re-seeded every `reseed_seconds` to pick
+up sends made by other workers or the desktop app.
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select, union_all, func
+from sqlalchemy.orm import Session
+
+from api.db_models import Professor, ProfessorContact, SendingRules, SendLog, SendType
+
+
+class UniversityQuotaIndex:
+    """Sliding-window count of main emails per (user, university)"""
+
+    def __init__(self, window_seconds: int = 24 * 3600, reseed_seconds: int = 300, clock=time.time):
+        self.window_seconds = window_seconds
+        self.reseed_seconds = reseed_seconds
+        self.clock = clock
+        self._sends: Dict[Tuple[str, int], Deque[float]] = {}
+        self._limits: Dict[str, int] = {}
+        self._seeded_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    # -----------------------------------------------------
+    # Decisions
+    # -----------------------------------------------------
+    def _window(self, user_email: str, university_id: int, now: float) -> Deque[float]:
+        sends = self._sends.setdefault((user_email.lower(), university_id), deque())
+        horizon = now - self.window_seconds
+        while sends and sends[0] <= horizon:
+            sends.popleft()
+        return sends
+
+    def allow(self, user_email: str, university_id: Optional[int]) -> bool:
+        """Whether one more main email to this university is within the user's quota."""
+        limit = self._limits.get(user_email.lower(), 0)
+        if university_id is None or limit <= 0:
+            return True
+        with self._lock:
+            return len(self._window(user_email, university_id, self.clock())) < limit
+
+    def try_acquire(self, user_email: str, university_id: Optional[int]) -> bool:
+        """allow() and count the send in one step; undo with release() if the send fails."""
+        limit = self._limits.get(user_email.lower(), 0)
+        if university_id is None or limit <= 0:
+            return True
+        with self._lock:
+            now = self.clock()
+            sends = self._window(user_email, university_id, now)
+            if len(sends) >= limit:
+                return False
+            sends.append(now)
+            return True
+
+    def release(self, user_email: str, university_id: Optional[int]) -> None:
+        """Give back the slot taken by the last try_acquire()."""
+        if university_id is None or self._limits.get(user_email.lower(), 0) <= 0:
+            return
+        with self._lock:
+            sends = self._sends.get((user_email.lower(), university_id))
+            if sends:
+                sends.pop()
+
+    def next_allowed_at(self, user_email: str, university_id: Optional[int]) -> datetime:
+        """Earliest time at which allow() can become true again."""
+        with self._lock:
+            now = self.clock()
+            sends = self._window(user_email, university_id, now) if university_id is not None else None
+            at = sends[0] + self.window_seconds if sends else now
+        return datetime.fromtimestamp(at, tz=timezone.utc)
+
+    # -----------------------------------------------------
+    # Seeding (user emails are CITEXT, so IN matches case-insensitively)
+    # -----------------------------------------------------
+    def ensure_seeded(self, db: Session, user_emails: Iterable[str]) -> None:
+        """Seed users never seen before, or last seeded more than reseed_seconds ago."""
+        now = self.clock()
+        stale = {
+            email.lower() for email in user_emails
+            if now - self._seeded_at.get(email.lower(), float("-inf")) >= self.reseed_seconds
+        }
+        if stale:
+            self.seed(db, stale)
+
+    def seed(self, db: Session, user_emails: Iterable[str]) -> None:
+        """Load quota limits and in-window sends of `user_emails` from the database."""
+        users = {email.lower() for email in user_emails}
+        if not users:
+            return
+        since = datetime.fromtimestamp(self.clock() - self.window_seconds, tz=timezone.utc)
+
+        limits = db.execute(
+            select(SendingRules.user_email, SendingRules.max_email_per_university)
+            .where(SendingRules.user_email.in_(users))
+        ).all()
+
+        logged = (
+            select(
+                SendLog.user_email.label("user_email"),
+                SendLog.sent_to.label("professor_email"),
+                SendLog.sent_time.label("sent_time"),
+            )
+            .where(
+                SendLog.user_email.in_(users),
+                SendLog.send_type == SendType.MAIN,
+                SendLog.delivery_status == 1,
+                SendLog.sent_time > since,
+            )
+        )
+        contacted = (
+            select(
+                ProfessorContact.user_email.label("user_email"),
+                ProfessorContact.professor_email.label("professor_email"),
+                ProfessorContact.last_contact_time.label("sent_time"),
+            )
+            .where(
+                ProfessorContact.user_email.in_(users),
+                ProfessorContact.last_contact_time > since,
+            )
+        )
+        sends = union_all(logged, contacted).subquery()
+        # One send per professor: a contact also recorded in send_log counts once
+        rows = db.execute(
+            select(
+                sends.c.user_email,
+                Professor.university_id,
+                func.max(sends.c.sent_time).label("sent_time"),
+            )
+            .join(Professor, Professor.email == sends.c.professor_email)
+            .where(Professor.university_id.isnot(None))
+            .group_by(sends.c.user_email, sends.c.professor_email, Professor.university_id)
+            .order_by(func.max(sends.c.sent_time))
+        ).all()
+
+        seeded: Dict[Tuple[str, int], Deque[float]] = {}
+        for row in rows:
+            seeded.setdefault((row.user_email.lower(), row.university_id), deque()).append(row.sent_time.timestamp())
+
+        with self._lock:
+            for user in users:
+                self._limits[user] = 0
+                self._seeded_at[user] = self.clock()
+            for row in limits:
+                self._limits[row.user_email.lower()] = row.max_email_per_university
+            for key in [key for key in self._sends if key[0] in users]:
+                del self._sends[key]
+            self._sends.update(seeded)
+
+
+def universities_of(db: Session, professor_emails: Iterable[str]) -> Dict[str, Optional[int]]:
+    """Lower-cased professor email -> university id, for one batch of recipients."""
+    emails = {email.lower() for email in professor_emails}
+    if not emails:
+        return {}
+    rows = db.execute(
+        select(Professor.email, Professor.university_id).where(Professor.email.in_(emails))
+    ).all()
+    return {row.email.lower(): row.university_id for row in rows}
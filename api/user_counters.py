@@ -0,0 +1,133 @@
+"""
+Per-user running counters
+
+The dashboard counts live in the metrics table, one row per (user, metric_key),
+and are kept current by the triggers in DB/migrations/001_user_counters.sql in
+the same transaction as every change to send_log, professor_contact and
+email_queue. Reading them is a fixed-size primary-key lookup, however much
+history a user has.
+
+Triggers only apply deltas, so existing history must be loaded once with the
+backfill, which also marks the user with `counters_ready`. Users created later
+are marked on insert (DB/migrations/005_new_user_counters.sql), having no
+history to load:
+    python -m api.user_counters [--chunk-size 200] [--user EMAIL ...]
+"""
+import argparse
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import select, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.db_models import (
+    ContactStatus,
+    EmailQueue,
+    EmailQueueStatus,
+    Metric,
+    ProfessorContact,
+    SendLog,
+    SendType,
+    User,
+)
+
+# DashboardStats field -> metric_key
+COUNTER_KEYS = {
+    "email_you_send": f"sent_type_{SendType.MAIN}",
+    "first_reminder_send": f"sent_type_{SendType.FIRST_REMINDER}",
+    "second_reminder_send": f"sent_type_{SendType.SECOND_REMINDER}",
+    "third_reminder_send": f"sent_type_{SendType.THIRD_REMINDER}",
+    "number_of_email_professor_answered": "contacts_replied",
+    "emails_remaining": "queue_pending",
+}
+READY_KEY = "counters_ready"
+
+
+async def read_counters(db: AsyncSession, user_email: str) -> Optional[Dict[str, int]]:
+    """Dashboard counts of a user, or None if the user has not been backfilled yet."""
+    rows = (await db.execute(
+        select(Metric.metric_key, Metric.metric_value).where(
+            Metric.user_email == user_email,
+            Metric.metric_key.in_([*COUNTER_KEYS.values(), READY_KEY]),
+        )
+    )).all()
+    values = {row.metric_key: row.metric_value for row in rows}
+    if READY_KEY not in values:
+        return None
+    return {field: int(values.get(key) or 0) for field, key in COUNTER_KEYS.items()}
+
+
+def backfill_counters(engine: Engine, chunk_size: int = 200, user_emails: Optional[Iterable[str]] = None) -> int:
+    """
+    Recompute every counter from history, `chunk_size` users per transaction.
+    Each chunk briefly takes SHARE locks on the three source tables so no write
+    can land between counting and storing; writers wait for at most one chunk.
+    Returns the number of users processed.
+    """
+    query = select(User.email).order_by(User.email).limit(chunk_size)
+    if user_emails is not None:
+        query = query.where(User.email.in_(list(user_emails)))
+    last_email = ""
+    processed = 0
+    while True:
+        with engine.begin() as conn:
+            users = list(conn.execute(query.where(User.email > last_email)).scalars())
+            if not users:
+                break
+
+            # A chunk of heavy users can outlast the API's statement_timeout
+            conn.execute(text("SET LOCAL statement_timeout = 0"))
+            conn.execute(text("LOCK TABLE send_log, professor_contact, email_queue IN SHARE MODE"))
+
+            # user_email is citext: history rows may spell an address in another case than
+            # users.email, and metrics would take both spellings for the same row
+            spelling = {user.lower(): user for user in users}
+            values = defaultdict(int, {(user, key): 0 for user in users for key in COUNTER_KEYS.values()})
+            for row in conn.execute(
+                select(SendLog.user_email, SendLog.send_type, func.count())
+                .where(SendLog.user_email.in_(users))
+                .group_by(SendLog.user_email, SendLog.send_type)
+            ):
+                values[(spelling[row[0].lower()], f"sent_type_{row[1]}")] += row[2]
+            for row in conn.execute(
+                select(ProfessorContact.user_email, func.count())
+                .where(ProfessorContact.user_email.in_(users), ProfessorContact.contact_status == ContactStatus.REPLIED)
+                .group_by(ProfessorContact.user_email)
+            ):
+                values[(spelling[row[0].lower()], COUNTER_KEYS["number_of_email_professor_answered"])] += row[1]
+            for row in conn.execute(
+                select(EmailQueue.user_email, func.count())
+                .where(EmailQueue.user_email.in_(users), EmailQueue.status == EmailQueueStatus.PENDING)
+                .group_by(EmailQueue.user_email)
+            ):
+                values[(spelling[row[0].lower()], COUNTER_KEYS["emails_remaining"])] += row[1]
+            for user in users:
+                values[(user, READY_KEY)] = 1
+
+            stmt = insert(Metric).values([
+                {"user_email": user, "metric_key": key, "metric_value": value}
+                for (user, key), value in sorted(values.items())
+            ])
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=[Metric.user_email, Metric.metric_key],
+                set_={"metric_value": stmt.excluded.metric_value, "updated_at": func.now()},
+            ))
+
+        processed += len(users)
+        last_email = users[-1]
+        print(f"  {processed} user(s) backfilled")
+    return processed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild per-user dashboard counters from history")
+    parser.add_argument("--chunk-size", type=int, default=200, help="Users per transaction")
+    parser.add_argument("--user", action="append", dest="users", help="Only backfill this user (repeatable)")
+    args = parser.parse_args()
+
+    from api.database import engine
+
+    total = backfill_counters(engine, chunk_size=args.chunk_size, user_emails=args.users)
+    print(f"✅ Counters rebuilt for {total} user(s)")
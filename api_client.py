@@ -1,9 +1,13 @@
 """
 API Client for main_ui.py to interact with FastAPI backend
 """
+import json
+import time
 import requests
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Iterable, Iterator, Tuple
 from datetime import datetime, timezone
+from itertools import islice
+from urllib.parse import quote
 
 
 class ApplyCheAPIClient:
@@ -12,11 +16,23 @@ class ApplyCheAPIClient:
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url.rstrip('/')
         self.session = requests.Session()
+        # (endpoint, params) -> (ETag, body) of responses that carried an ETag
+        self._validators: Dict[Tuple[str, str], Tuple[str, bytes]] = {}
     
     def _get(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
-        """Make GET request"""
-        response = self.session.get(f"{self.base_url}{endpoint}", params=params)
+        """Make GET request, revalidating a cached body with If-None-Match when there is one"""
+        key = (endpoint, repr(sorted((params or {}).items())))
+        cached = self._validators.get(key)
+        headers = {"If-None-Match": cached[0]} if cached else None
+        response = self.session.get(f"{self.base_url}{endpoint}", params=params, headers=headers)
+        if response.status_code == 304 and cached:
+            return json.loads(cached[1])
         response.raise_for_status()
+        etag = response.headers.get("ETag")
+        if etag:
+            self._validators[key] = (etag, response.content)
+        else:
+            self._validators.pop(key, None)
         return response.json()
     
     def _post(self, endpoint: str, data: Dict) -> Dict:
@@ -43,6 +59,22 @@ class ApplyCheAPIClient:
         response.raise_for_status()
         return response.json()
     
+    def _get_page(self, endpoint: str, params: Dict) -> Tuple[List[Dict], Optional[str]]:
+        """Make GET request to a paginated listing; returns (items, next cursor)"""
+        response = self.session.get(f"{self.base_url}{endpoint}", params=params)
+        response.raise_for_status()
+        return response.json(), response.headers.get("X-Next-Cursor")
+    
+    def _iter_pages(self, endpoint: str, params: Dict) -> Iterator[Dict]:
+        """Yield every item of a paginated listing, following X-Next-Cursor"""
+        params = dict(params)
+        while True:
+            items, cursor = self._get_page(endpoint, params)
+            yield from items
+            if not cursor:
+                return
+            params["cursor"] = cursor
+    
     # Dashboard methods
     def get_dashboard_stats(self, user_email: str) -> Dict:
         """Get dashboard statistics"""
@@ -158,24 +190,160 @@ class ApplyCheAPIClient:
             "scheduled_at": scheduled_at.isoformat() if isinstance(scheduled_at, datetime) else scheduled_at
         })
     
-    def get_email_queue(self, user_email: str, status: Optional[int] = None, limit: int = 100) -> List[Dict]:
-        """Get email queue items"""
+    def create_email_queue_items(self, items: Iterable[Dict], chunk_size: int = 1000) -> List[int]:
+        """
+        Add many emails to the queue; `items` may be any iterable (e.g. a generator) of dicts with
+        the create_email_queue_item fields. Sent `chunk_size` per request, each request in one
+        transaction. Returns the assigned ids in input order.
+        """
+        ids: List[int] = []
+        iterator = iter(items)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return ids
+            payload = []
+            for item in chunk:
+                scheduled_at = item.get("scheduled_at") or datetime.now(timezone.utc)
+                payload.append({
+                    "user_email": item["user_email"],
+                    "to_email": item["to_email"],
+                    "subject": item.get("subject"),
+                    "body": item["body"],
+                    "template_id": item.get("template_id"),
+                    "scheduled_at": scheduled_at.isoformat() if isinstance(scheduled_at, datetime) else scheduled_at
+                })
+            result = self._post("/api/email-queue/bulk", {"items": payload})
+            for first, last in result["id_ranges"]:
+                ids.extend(range(first, last + 1))
+    
+    def get_email_queue(self, user_email: str, status: Optional[int] = None, limit: int = 100,
+                        cursor: Optional[str] = None) -> List[Dict]:
+        """Get email queue items (one page; pass `cursor` to continue after a previous page)"""
         params = {"limit": limit}
         if status is not None:
             params["status"] = status
+        if cursor is not None:
+            params["cursor"] = cursor
         return self._get(f"/api/email-queue/{user_email}", params=params)
     
+    def iter_email_queue(self, user_email: str, status: Optional[int] = None, page_size: int = 500) -> Iterator[Dict]:
+        """Iterate over all email queue items of a user, earliest first"""
+        params = {"limit": page_size}
+        if status is not None:
+            params["status"] = status
+        return self._iter_pages(f"/api/email-queue/{user_email}", params)
+    
     def update_queue_status(self, queue_id: int, status: int, user_email: str) -> Dict:
         """Update queue item status"""
         return self._patch(f"/api/email-queue/{queue_id}/status?status={status}&user_email={user_email}", {})
     
-    def get_send_logs(self, user_email: str, limit: int = 100, send_type: Optional[int] = None) -> List[Dict]:
-        """Get send logs"""
+    def update_queue_statuses(self, user_email: str, status: int, ids: Optional[List[int]] = None,
+                              template_id: Optional[int] = None, to_email: Optional[str] = None,
+                              from_status: Optional[List[int]] = None) -> Dict:
+        """Set the status of every queue item of a user matching all given filters in one call"""
+        return self._patch("/api/email-queue/status", {
+            "user_email": user_email,
+            "status": status,
+            "ids": ids,
+            "template_id": template_id,
+            "to_email": to_email,
+            "from_status": from_status
+        })
+    
+    def plan_campaign(self, user_email: str, start_at: Optional[datetime] = None) -> Dict:
+        """Queue the main email and all enabled reminders for every eligible contact"""
+        endpoint = f"/api/email-queue/plan/{user_email}"
+        if start_at is not None:
+            endpoint += f"?start_at={quote(start_at.isoformat())}"
+        return self._post(endpoint, {})
+    
+    def get_send_logs(self, user_email: str, limit: int = 100, send_type: Optional[int] = None,
+                      cursor: Optional[str] = None, since: Optional[datetime] = None,
+                      until: Optional[datetime] = None) -> List[Dict]:
+        """Get send logs (one page; pass `cursor` to continue after a previous page)"""
         params = {"limit": limit}
         if send_type is not None:
             params["send_type"] = send_type
+        if since is not None:
+            params["since"] = since.isoformat()
+        if until is not None:
+            params["until"] = until.isoformat()
+        if cursor is not None:
+            params["cursor"] = cursor
         return self._get(f"/api/email-queue/logs/{user_email}", params=params)
     
+    def iter_send_logs(self, user_email: str, send_type: Optional[int] = None, page_size: int = 500) -> Iterator[Dict]:
+        """Iterate over all send logs of a user, newest first"""
+        params = {"limit": page_size}
+        if send_type is not None:
+            params["send_type"] = send_type
+        return self._iter_pages(f"/api/email-queue/logs/{user_email}", params)
+    
+    def export_history(self, user_email: str, path: str, kind: str = "logs", format: str = "ndjson") -> int:
+        """Stream a user's full send log (kind="logs") or queue (kind="queue") to a file; returns bytes written"""
+        written = 0
+        with self.session.get(f"{self.base_url}/api/email-queue/export/{user_email}",
+                              params={"kind": kind, "format": format}, stream=True) as response:
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=65536):
+                    written += f.write(chunk)
+        return written
+    
+    # Workspace methods
+    def get_workspace(self, user_email: str) -> Dict:
+        """Get latest templates per type, sending rules, dashboard stats and queue summary in one request"""
+        return self._get(f"/api/workspace/{user_email}")
+    
+    # Live events
+    def stream_events(self, user_email: str, last_event_id: Optional[str] = None,
+                      reconnect: bool = True) -> Iterator[Dict]:
+        """
+        Yield live events of a user as {"id", "event", "data"} dicts (Server-Sent Events).
+        Reconnects after network errors and resumes after the last event received;
+        on a "resync" event reload state (e.g. get_workspace) and keep iterating.
+        """
+        url = f"{self.base_url}/api/events/{user_email}"
+        retry_seconds = 2.0
+        while True:
+            headers = {"Accept": "text/event-stream"}
+            if last_event_id:
+                headers["Last-Event-ID"] = last_event_id
+            try:
+                # Read timeout well above the server's 15 s keep-alive
+                with self.session.get(url, headers=headers, stream=True, timeout=(10, 60)) as response:
+                    response.raise_for_status()
+                    event: Dict[str, Any] = {}
+                    data_lines: List[str] = []
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line is None:
+                            continue
+                        if not line:
+                            if data_lines:
+                                event["data"] = json.loads("\n".join(data_lines))
+                                event.setdefault("event", "message")
+                                last_event_id = event.get("id", last_event_id)
+                                yield event
+                            event, data_lines = {}, []
+                            continue
+                        if line.startswith(":"):
+                            continue
+                        field, _, value = line.partition(":")
+                        value = value[1:] if value.startswith(" ") else value
+                        if field == "data":
+                            data_lines.append(value)
+                        elif field in ("id", "event"):
+                            event[field] = value
+                        elif field == "retry" and value.isdigit():
+                            retry_seconds = int(value) / 1000
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                if not reconnect:
+                    raise
+            if not reconnect:
+                return
+            time.sleep(retry_seconds)
+    
     # Health check
     def health_check(self) -> Dict:
         """Check API health"""
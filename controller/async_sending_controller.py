@@ -0,0 +1,168 @@
+# controller/async_sending_controller.py
+import asyncio
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from .email_providers import provider_for
+from .smtp_pool import shared_pool
+from .mail_merge import MailMerge, template_text, template_attachments
+from .attachment_cache import shared_cache
+from .template_preflight import preflight_campaign
+
+
+class AsyncSendMailController:
+    """
+    asyncio delivery engine that runs many sender accounts at once.
+
+    Listens to the same bus events as SendMailController ("start_sending",
+    "stop_sending") and publishes the same "log" messages, but every
+    start_sending starts an independent campaign for its sender account instead
+    of being rejected while another one runs. Sends are bounded by
+    `max_concurrency` across all accounts and `per_account_concurrency` per account.
+    SMTP itself stays blocking (smtplib + the shared pool) and runs on a
+    dedicated executor sized to the global limit.
+    """
+
+    def __init__(self, bus, max_concurrency=50, per_account_concurrency=1,
+                 delay_range=(270, 330), smtp_pool=None):
+        self.bus = bus
+        self.max_concurrency = max_concurrency
+        self.per_account_concurrency = per_account_concurrency
+        self.delay_range = delay_range
+        self.smtp_pool = smtp_pool or shared_pool
+        self.attachment_cache = shared_cache
+        self._campaigns = {}  # sender -> asyncio.Task
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="smtp-send")
+        self._loop = asyncio.new_event_loop()
+        self._global_limit = asyncio.Semaphore(max_concurrency)
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+        # Subscribe to bus events
+        self.bus.subscribe("start_sending", self.start_sending)
+        self.bus.subscribe("stop_sending", self.stop_sending)
+
+    # -----------------------------------------------------
+    # Bus handlers (may be called from any thread)
+    # -----------------------------------------------------
+    def start_sending(self, info):
+        future = asyncio.run_coroutine_threadsafe(self._start_campaign(info), self._loop)
+        future.add_done_callback(self._report_start_failure)
+
+    def _report_start_failure(self, future):
+        # Nobody waits on the future: an unexpected error would otherwise vanish
+        if not future.cancelled() and future.exception() is not None:
+            self.bus.publish("log", f"❌ Could not start sending: {future.exception()!r}")
+
+    def stop_sending(self, sender=None):
+        """Cancel the campaign of `sender`, or every running campaign when None."""
+        self._loop.call_soon_threadsafe(self._cancel_campaigns, sender)
+
+    def shutdown(self):
+        self.stop_sending()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
+
+    # -----------------------------------------------------
+    # Campaigns (run on the engine's event loop)
+    # -----------------------------------------------------
+    async def _start_campaign(self, info):
+        sender = info.get("email")
+        if sender in self._campaigns:
+            self.bus.publish("log", f"⚠️ Already sending emails from {sender}.")
+            return
+
+        provider = provider_for(sender)
+        if not provider:
+            self.bus.publish("log", f"❌ Unsupported email domain: {sender.split('@')[-1].lower()}")
+            return
+
+        professor_list = info.get("professor_list")
+        if not (isinstance(professor_list, pd.DataFrame) and "email" in professor_list.columns):
+            self.bus.publish("log", "❌ professor_list is invalid or missing 'email' column.")
+            return
+
+        try:
+            report = preflight_campaign(info)
+        except Exception as e:
+            self.bus.publish("log", f"❌ Pre-flight check of {sender} failed: {e}")
+            return
+        for line in report.messages():
+            self.bus.publish("log", line)
+        if not report.ok:
+            self.bus.publish("log", f"🛑 Sending from {sender} not started, fix the issues above first.")
+            return
+
+        task = self._loop.create_task(self._run_campaign(info, professor_list))
+        self._campaigns[sender] = task
+        task.add_done_callback(lambda _: self._campaigns.pop(sender, None))
+        self.bus.publish("log", f"🚀 Started sending emails from {sender}...")
+
+    def _cancel_campaigns(self, sender=None):
+        if not self._campaigns:
+            self.bus.publish("log", "⚠️ No sending process active.")
+            return
+        for campaign_sender, task in list(self._campaigns.items()):
+            if sender is None or campaign_sender == sender:
+                task.cancel()
+        self.bus.publish("log", "🛑 Stop command received.")
+
+    async def _run_campaign(self, info, professor_list):
+        sender = info.get("email")
+        password = info.get("password")
+        subject = info.get("txt_main_subject")
+        body = template_text(info.get("body")) or template_text(info.get("main_template"))
+        attachments = template_attachments(info.get("main_template"))
+        domain = sender.split("@")[-1].lower()
+        total = int(professor_list["email"].notna().sum())
+
+        try:
+            await self._in_executor(self._check_login, sender, password)
+            self.bus.publish("log", f"✅ Connected to {domain} SMTP server.")
+
+            messages = MailMerge(subject, body).iter_messages(professor_list)
+            account_limit = asyncio.Semaphore(self.per_account_concurrency)
+            progress = {"sent": 0}
+            senders = [
+                self._account_sender(sender, password, messages, attachments, account_limit, progress, total)
+                for _ in range(self.per_account_concurrency)
+            ]
+            await asyncio.gather(*senders)
+            self.bus.publish("log", "✅ All emails sent successfully.")
+        except asyncio.CancelledError:
+            self.bus.publish("log", "🛑 Sending stopped by user.")
+        except Exception as e:
+            self.bus.publish("log", f"❌ Error: {e}")
+
+    async def _account_sender(self, sender, password, messages, attachments, account_limit, progress, total):
+        # `messages` is shared by every coroutine of the account; next() never awaits,
+        # so each recipient is taken exactly once.
+        for _, recipient, subject, body in messages:
+            _, raw = self.attachment_cache.build_message(sender, recipient, subject, body, attachments)
+
+            async with account_limit:
+                async with self._global_limit:
+                    try:
+                        await self._in_executor(self.smtp_pool.send_message, sender, password, raw, [recipient])
+                        progress["sent"] += 1
+                        self.bus.publish("log", f"📤 Email {progress['sent']}/{total} sent to {recipient}")
+                    except Exception as e:
+                        self.bus.publish("log", f"❌ Failed to send to {recipient}: {e}")
+
+                # Delay 4.5–5.5 minutes to avoid spam flagging; holding the account
+                # slot while waiting is what paces the account.
+                delay = random.uniform(*self.delay_range)
+                self.bus.publish("log", f"⏳ Waiting {delay / 60:.1f} minutes before next email from {sender}...")
+                await asyncio.sleep(delay)
+
+    def _check_login(self, sender, password):
+        with self.smtp_pool.connection(sender, password):
+            pass
+
+    def _in_executor(self, func, *args):
+        return self._loop.run_in_executor(self._executor, func, *args)
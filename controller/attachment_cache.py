@@ -0,0 +1,129 @@
+# controller/attachment_cache.py
+import hashlib
+import mimetypes
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from email import encoders, policy
+from email.message import EmailMessage
+from email.mime.base import MIMEBase
+from email.mime.text import MIMEText
+from email.utils import formatdate, make_msgid
+
+
+class AttachmentCache:
+    """
+    Encode-once cache of MIME attachment parts.
+
+    Each file is read, base64-encoded and serialized once; the resulting part
+    bytes are keyed by the SHA-256 of the file content and the file name (which
+    the part's Content-Disposition carries) and spliced verbatim into every
+    recipient's message. A per-path (size, mtime) index avoids re-reading a file
+    just to hash it. Parts are evicted least-recently-used once their total size
+    exceeds `max_bytes`, together with the index entries that point to them.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._parts = OrderedDict()  # (content digest, file name) -> encoded part bytes
+        self._files = {}             # path -> (size, mtime_ns, part key) of a cached part
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def part(self, path):
+        """Serialized MIME part for the file at `path`."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            size, mtime_ns, key = self._files.get(path, (None, None, None))
+            if (size, mtime_ns) == (st.st_size, st.st_mtime_ns) and key in self._parts:
+                self._parts.move_to_end(key)
+                self.hits += 1
+                return self._parts[key]
+
+        with open(path, "rb") as f:
+            data = f.read()
+        name = os.path.basename(path)
+        key = (hashlib.sha256(data).hexdigest(), name)
+
+        with self._lock:
+            if key in self._parts:
+                # Same content and name under another directory, or a touched file
+                self._files[path] = (st.st_size, st.st_mtime_ns, key)
+                self._parts.move_to_end(key)
+                self.hits += 1
+                return self._parts[key]
+            self.misses += 1
+
+        encoded = _encode_part(name, data)
+        with self._lock:
+            if len(encoded) <= self.max_bytes and key not in self._parts:
+                self._parts[key] = encoded
+                self._files[path] = (st.st_size, st.st_mtime_ns, key)
+                self._size += len(encoded)
+                evicted_keys = set()
+                while self._size > self.max_bytes:
+                    evicted_key, evicted = self._parts.popitem(last=False)
+                    evicted_keys.add(evicted_key)
+                    self._size -= len(evicted)
+                if evicted_keys:
+                    self._files = {p: entry for p, entry in self._files.items() if entry[2] not in evicted_keys}
+        return encoded
+
+    def build_message(self, sender, recipient, subject, body, attachments=(), subtype="plain"):
+        """
+        Raw message bytes for one recipient, plus its Message-ID. The body part is
+        encoded per recipient; attachment parts come from the cache.
+        """
+        message_id = make_msgid()
+        headers = EmailMessage(policy=policy.SMTP)
+        headers["From"] = sender
+        headers["To"] = recipient
+        headers["Subject"] = subject or ""
+        headers["Date"] = formatdate(localtime=True)
+        headers["Message-ID"] = message_id
+        headers["MIME-Version"] = "1.0"
+
+        boundary = f"==============={uuid.uuid4().hex}=="
+        delimiter = f"--{boundary}\r\n".encode()
+        chunks = [
+            headers.as_bytes().rstrip(b"\r\n"),
+            f'\r\nContent-Type: multipart/mixed; boundary="{boundary}"\r\n\r\n'.encode(),
+            delimiter,
+            _text_part(body or "", subtype),
+        ]
+        for path in attachments:
+            chunks.append(b"\r\n" + delimiter)
+            chunks.append(self.part(path))
+        chunks.append(f"\r\n--{boundary}--\r\n".encode())
+        return message_id, b"".join(chunks)
+
+    def stats(self):
+        with self._lock:
+            return {"parts": len(self._parts), "bytes": self._size, "hits": self.hits, "misses": self.misses}
+
+
+def _text_part(body, subtype):
+    part = MIMEText(body, subtype, "utf-8")
+    del part["MIME-Version"]
+    return part.as_bytes(policy=policy.SMTP)
+
+
+def _encode_part(filename, data):
+    ctype, encoding = mimetypes.guess_type(filename)
+    if ctype is None or encoding is not None:
+        ctype = "application/octet-stream"
+    maintype, subtype = ctype.split("/", 1)
+    part = MIMEBase(maintype, subtype)
+    part.set_payload(data)
+    encoders.encode_base64(part)
+    part.add_header("Content-Disposition", "attachment", filename=filename)
+    del part["MIME-Version"]
+    return part.as_bytes(policy=policy.SMTP)
+
+
+# Process-wide cache so every campaign in the process shares encoded files
+shared_cache = AttachmentCache()
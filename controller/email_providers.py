@@ -0,0 +1,27 @@
+# controller/email_providers.py
+import smtplib
+
+# Supported providers
+EMAIL_PROVIDERS = {
+    "gmail.com": {"smtp": "smtp.gmail.com", "port": 465, "use_ssl": True},
+    "yahoo.com": {"smtp": "smtp.mail.yahoo.com", "port": 465, "use_ssl": True},
+    "rocketmail.com": {"smtp": "smtp.mail.yahoo.com", "port": 465, "use_ssl": True},
+    "hotmail.com": {"smtp": "smtp.office365.com", "port": 587, "use_ssl": False},
+    "outlook.com": {"smtp": "smtp.office365.com", "port": 587, "use_ssl": False},
+}
+
+
+def provider_for(sender):
+    """Return the provider settings for a sender address, or None if unsupported."""
+    domain = sender.split("@")[-1].lower()
+    return EMAIL_PROVIDERS.get(domain)
+
+
+def open_smtp_connection(provider, timeout=60):
+    """Open an (unauthenticated) SMTP connection for a provider entry."""
+    if provider["use_ssl"]:
+        server = smtplib.SMTP_SSL(provider["smtp"], provider["port"], timeout=timeout)
+    else:
+        server = smtplib.SMTP(provider["smtp"], provider["port"], timeout=timeout)
+        server.starttls()
+    return server
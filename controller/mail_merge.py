@@ -0,0 +1,198 @@
+# controller/mail_merge.py
+import re
+import string
+from html.parser import HTMLParser
+from itertools import repeat
+
+_formatter = string.Formatter()
+_CONVERTERS = {"s": str, "r": repr, "a": ascii}
+# Start of a {col.attr} or {col[key]} lookup in a field name
+_LOOKUP = re.compile(r"[.\[]")
+
+
+def looks_like_html(text):
+    """True for a whole HTML document, such as QTextEdit.toHtml() output."""
+    if not isinstance(text, str):
+        return False
+    head = text.lstrip()[:64].lower()
+    return head.startswith("<!doctype html") or head.startswith("<html")
+
+
+class _TextExtractor(HTMLParser):
+    """Visible text of an HTML document, one line per paragraph and <br>"""
+
+    _SKIPPED = {"head", "style", "script", "title"}
+    _BLOCKS = {"p", "div", "li", "pre", "blockquote", "tr", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skipping = 0
+        self._block_start = None  # len(parts) when the open block started
+        self._href = None
+        self._link_start = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIPPED:
+            self._skipping += 1
+        elif tag in self._BLOCKS:
+            self._block_start = len(self.parts)
+        elif tag == "br":
+            self.parts.append("\n")
+        elif tag == "a":
+            self._href = dict(attrs).get("href")
+            self._link_start = len(self.parts)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag == "br":
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIPPED:
+            self._skipping = max(self._skipping - 1, 0)
+        elif tag in self._BLOCKS:
+            # An empty paragraph (Qt writes <p><br /></p>) is one blank line, not two
+            content = self.parts[self._block_start:] if self._block_start is not None else []
+            if not content or content[-1] != "\n":
+                self.parts.append("\n")
+            self._block_start = None
+        elif tag == "a" and self._href:
+            label = "".join(self.parts[self._link_start:]).strip()
+            if label != self._href and not self._href.startswith("#"):
+                self.parts.append(f" ({self._href})")
+            self._href = None
+
+    def handle_data(self, data):
+        # Outside a block, whitespace is only the markup's own line breaks
+        if self._skipping or (self._block_start is None and not data.strip()):
+            return
+        self.parts.append(data.replace("\xa0", " "))
+
+    def text(self):
+        return "".join(self.parts).strip("\n")
+
+
+def html_to_text(html):
+    """Plain text of an HTML document: paragraphs become lines, links keep their address."""
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return parser.text()
+
+
+def plain_text(text):
+    """`text` itself, or its plain text when it is an HTML document."""
+    return html_to_text(text) if looks_like_html(text) else text
+
+
+def template_text(value):
+    """
+    Plain-text body of a template as stored by EmailEditor ({"html": ..., "attachments": [...]})
+    or given as a str. The editor stores toHtml() output, whose stylesheet would be
+    read as placeholders; emails are rendered and sent from its text instead.
+    """
+    if isinstance(value, dict):
+        value = value.get("html")
+    return plain_text(value) if isinstance(value, str) else ""
+
+
+def template_attachments(value):
+    """Attachment paths of a template as stored by EmailEditor, or [] for a plain str."""
+    if isinstance(value, dict):
+        return list(value.get("attachments") or [])
+    return []
+
+
+class _Field:
+    def __init__(self, field_name, conversion, format_spec):
+        if not field_name or field_name.isdigit():
+            raise ValueError("Format string contains positional fields")
+        if "{" in format_spec:
+            raise ValueError(f"Nested replacement fields are not supported: {{{field_name}:{format_spec}}}")
+        self.field_name = field_name
+        lookup = _LOOKUP.search(field_name)
+        self.column = field_name[:lookup.start()] if lookup else field_name
+        self.has_lookup = lookup is not None  # {col.attr} or {col[key]}
+        self.conversion = conversion
+        self.format_spec = format_spec
+        self.is_plain = not (self.has_lookup or conversion or format_spec)
+
+    def format_value(self, value):
+        if self.has_lookup:
+            value = _formatter.get_field(self.field_name, (), {self.column: value})[0]
+        if self.conversion:
+            value = _CONVERTERS[self.conversion](value)
+        return format(value, self.format_spec)
+
+    def render_column(self, values):
+        if self.is_plain:
+            return list(map(str, values))
+        return [self.format_value(v) for v in values]
+
+
+class CompiledTemplate:
+    """
+    A str.format_map template parsed once into literal and field segments.
+
+    Rendering binds whole DataFrame columns to the fields instead of building a
+    dict per row, so a list of professors is personalised column-wise with the
+    same output as `template.format_map(row.to_dict())`.
+    """
+
+    def __init__(self, template):
+        self.template = template or ""
+        self.segments = []  # alternating literal str / _Field
+        for literal, field_name, format_spec, conversion in _formatter.parse(self.template):
+            if literal:
+                self.segments.append(literal)
+            if field_name is not None:
+                self.segments.append(_Field(field_name, conversion, format_spec or ""))
+        self.fields = list(dict.fromkeys(seg.column for seg in self.segments if isinstance(seg, _Field)))
+
+    def render(self, mapping):
+        """Render a single mapping (KeyError for a missing field, like format_map)."""
+        return "".join(
+            seg if isinstance(seg, str) else seg.format_value(mapping[seg.column])
+            for seg in self.segments
+        )
+
+    def render_all(self, df):
+        """Render every row of `df`; raises KeyError when a field has no matching column."""
+        n = len(df)
+        if not self.fields:
+            return [self.template.replace("{{", "{").replace("}}", "}")] * n
+        columns = {name: df[name].tolist() for name in self.fields}
+        parts = [
+            repeat(seg, n) if isinstance(seg, str) else seg.render_column(columns[seg.column])
+            for seg in self.segments
+        ]
+        return ["".join(row) for row in zip(*parts)]
+
+    def iter_render(self, df, chunk_size=5000):
+        """Lazily render `df` chunk by chunk."""
+        for start in range(0, len(df), chunk_size):
+            yield from self.render_all(df.iloc[start:start + chunk_size])
+
+
+class MailMerge:
+    """Compiled subject + body for one campaign"""
+
+    def __init__(self, subject, body, recipient_column="email"):
+        self.subject = CompiledTemplate(subject)
+        self.body = CompiledTemplate(body)
+        self.recipient_column = recipient_column
+
+    def iter_messages(self, df, chunk_size=5000):
+        """
+        Yield (position, recipient, subject, body) for every row of `df`, rendering
+        one chunk at a time. Rows without a recipient are skipped.
+        """
+        for start in range(0, len(df), chunk_size):
+            chunk = df.iloc[start:start + chunk_size]
+            recipients = chunk[self.recipient_column].tolist()
+            subjects = self.subject.render_all(chunk)
+            bodies = self.body.render_all(chunk)
+            for offset, (recipient, subject, body) in enumerate(zip(recipients, subjects, bodies)):
+                if not recipient or recipient != recipient:  # None, "" or NaN
+                    continue
+                yield start + offset, recipient, subject, body
@@ -0,0 +1,106 @@
+# controller/send_scheduler.py
+import heapq
+import itertools
+import random
+import threading
+import time
+
+
+class SendScheduler:
+    """
+    Paces sending for many accounts on a single thread.
+
+    Every account has a `send_next()` callable that sends one message and returns
+    True while the account has more to send. The scheduler keeps a heap of each
+    account's next eligible send time, sleeps until the earliest one is due, and
+    after a send re-arms the account at now + random.uniform(*delay_range), with
+    jitter drawn independently per account. stop() and add_account() wake the
+    thread immediately instead of waiting for the next poll.
+    """
+
+    def __init__(self, delay_range=(270, 330), on_wait=None):
+        self.delay_range = delay_range
+        # on_wait(account, delay_seconds) is called whenever an account is re-armed
+        self.on_wait = on_wait
+        self._cond = threading.Condition()
+        self._heap = []                 # (due monotonic time, seq, account, generation)
+        self._accounts = {}             # account -> (send_next, delay_range, generation)
+        self._generation = itertools.count()
+        self._seq = itertools.count()
+        self._stopped = False
+
+    def add_account(self, account, send_next, start_at=None, delay_range=None):
+        """Register (or replace) an account; its first send is due at `start_at` (monotonic) or now."""
+        with self._cond:
+            generation = next(self._generation)
+            self._accounts[account] = (send_next, delay_range or self.delay_range, generation)
+            self._push(account, generation, start_at if start_at is not None else time.monotonic())
+            self._cond.notify()
+
+    def remove_account(self, account):
+        with self._cond:
+            # Heap entries of a removed account are skipped when they surface
+            self._accounts.pop(account, None)
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    def run(self, until_idle=True):
+        """
+        Run the scheduler on the calling thread until stop() is called, or, with
+        `until_idle`, until every account is exhausted.
+        """
+        while True:
+            with self._cond:
+                account, send_next = self._next_due(until_idle)
+            if account is None:
+                return
+
+            try:
+                more = send_next()
+            except Exception:
+                self.remove_account(account)
+                raise
+
+            with self._cond:
+                entry = self._accounts.get(account)
+                if entry is None or entry[0] is not send_next or self._stopped:
+                    continue
+                if not more:
+                    del self._accounts[account]
+                    continue
+                delay = random.uniform(*entry[1])
+                self._push(account, entry[2], time.monotonic() + delay)
+            if self.on_wait:
+                self.on_wait(account, delay)
+
+    def _next_due(self, until_idle):
+        """Block until an account is due; returns (None, None) on stop or when idle."""
+        while not self._stopped:
+            if not self._heap:
+                if until_idle:
+                    return None, None
+                self._cond.wait()
+                continue
+            due, _, account, generation = self._heap[0]
+            entry = self._accounts.get(account)
+            if entry is None or entry[2] != generation:
+                heapq.heappop(self._heap)
+                continue
+            wait = due - time.monotonic()
+            if wait > 0:
+                self._cond.wait(wait)
+                continue
+            heapq.heappop(self._heap)
+            return account, entry[0]
+        return None, None
+
+    def _push(self, account, generation, due):
+        heapq.heappush(self._heap, (due, next(self._seq), account, generation))
@@ -1,11 +1,12 @@
 # controller/send_mail_controller.py
 import threading
-import smtplib
-from datetime import time
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from random import random
 from .check_premium import CheckPremium
+from .email_providers import EMAIL_PROVIDERS
+from .smtp_pool import shared_pool
+from .send_scheduler import SendScheduler
+from .mail_merge import MailMerge, template_text, template_attachments
+from .attachment_cache import shared_cache
+from .template_preflight import preflight_campaign
 import pandas as pd
 
 dummy_password= "<PASSWORD>"
@@ -15,7 +16,10 @@ class SendMailController:
         self.bus = bus
         self._sending = False
         self._thread = None
+        self._scheduler = None
         self.info = None
+        self.smtp_pool = shared_pool
+        self.attachment_cache = shared_cache
         premium = CheckPremium(dummy_email, dummy_password)
         self.is_premium = premium.check_premium()
 
@@ -25,13 +29,7 @@ class SendMailController:
         self.bus.subscribe("stop_sending", self.stop_sending)
 
         # Supported providers
-        self.EMAIL_PROVIDERS = {
-            "gmail.com": {"smtp": "smtp.gmail.com", "port": 465, "use_ssl": True},
-            "yahoo.com": {"smtp": "smtp.mail.yahoo.com", "port": 465, "use_ssl": True},
-            "rocketmail.com": {"smtp": "smtp.mail.yahoo.com", "port": 465, "use_ssl": True},
-            "hotmail.com": {"smtp": "smtp.office365.com", "port": 587, "use_ssl": False},
-            "outlook.com": {"smtp": "smtp.office365.com", "port": 587, "use_ssl": False},
-        }
+        self.EMAIL_PROVIDERS = EMAIL_PROVIDERS
 
     # -----------------------------------------------------
     # Event handler for starting email sending
@@ -41,6 +39,18 @@ class SendMailController:
             self.bus.publish("log", "⚠️ Already sending emails.")
             return
 
+        # Validate every template against the professor list before any throttled sending
+        try:
+            report = preflight_campaign(info)
+        except Exception as e:
+            self.bus.publish("log", f"❌ Pre-flight check failed: {e}")
+            return
+        for line in report.messages():
+            self.bus.publish("log", line)
+        if not report.ok:
+            self.bus.publish("log", "🛑 Sending not started, fix the issues above first.")
+            return
+
         self._sending = True
         self.info = info
         self.professor_list = self.info.get("professor_list")
@@ -59,7 +69,8 @@ class SendMailController:
         sender = self.info.get("email")
         password = self.info.get("password")
         subject = self.info.get("txt_main_subject")
-        body = self.info.get("body")
+        body = template_text(self.info.get("body")) or template_text(self.info.get("main_template"))
+        attachments = template_attachments(self.info.get("main_template"))
         domain = sender.split("@")[-1].lower()
 
         provider = self.EMAIL_PROVIDERS.get(domain)
@@ -76,58 +87,46 @@ class SendMailController:
             self._sending = False
             return
 
-        host = provider["smtp"]
-        port = provider["port"]
-        use_ssl = provider["use_ssl"]
-
         try:
-            if use_ssl:
-                server = smtplib.SMTP_SSL(host, port)
-            else:
-                server = smtplib.SMTP(host, port)
-                server.starttls()
-
-            server.login(sender, password)
+            # Log in once up front so bad credentials fail before the first recipient
+            with self.smtp_pool.connection(sender, password):
+                pass
             self.bus.publish("log", f"✅ Connected to {domain} SMTP server.")
 
-            for i, row in self.professor_list.iterrows():
-                if not self._sending:
-                    self.bus.publish("log", "🛑 Sending stopped by user.")
-                    server.quit()
-                    self._sending = False
-                    return
-
-                recipient = row.get("email")
-                if not recipient:
-                    continue
-
-                custom_body = body.format_map(row.to_dict())
-
-                msg = MIMEMultipart()
-                msg["From"] = sender
-                msg["To"] = recipient
-                msg["Subject"] = subject
-                msg.attach(MIMEText(custom_body, "plain"))
-
-                try:
-                    server.send_message(msg)
-                    self.bus.publish("log", f"📤 Email {i + 1}/{len(recipients)} sent to {recipient}")
-                except Exception as e:
-                    self.bus.publish("log", f"❌ Failed to send to {recipient}: {e}")
-
-                # Delay 4.5–5.5 minutes to avoid spam flagging
-                delay = random.uniform(270, 330)
-                self.bus.publish("log", f"⏳ Waiting {delay / 60:.1f} minutes before next email...")
-                for _ in range(int(delay)):
-                    if not self._sending:
-                        self.bus.publish("log", "🛑 Sending stopped by user during delay.")
-                        server.quit()
-                        self._sending = False
-                        return
-                    time.sleep(1)
-
-            server.quit()
-            self.bus.publish("log", "✅ All emails sent successfully.")
+            # Placeholders are parsed once and rendered column-wise, chunk by chunk
+            messages = MailMerge(subject, body).iter_messages(self.professor_list)
+
+            def send_next():
+                # Send to the next recipient; False once the list is exhausted
+                for i, recipient, custom_subject, custom_body in messages:
+                    # Attachments are encoded once and reused for every recipient
+                    _, raw = self.attachment_cache.build_message(
+                        sender, recipient, custom_subject, custom_body, attachments)
+
+                    try:
+                        self.smtp_pool.send_message(sender, password, raw, to_addrs=[recipient])
+                        self.bus.publish("log", f"📤 Email {i + 1}/{len(recipients)} sent to {recipient}")
+                    except Exception as e:
+                        self.bus.publish("log", f"❌ Failed to send to {recipient}: {e}")
+                    return True
+                return False
+
+            # Delay 4.5–5.5 minutes between emails to avoid spam flagging
+            self._scheduler = SendScheduler(
+                delay_range=(270, 330),
+                on_wait=lambda _, delay: self.bus.publish(
+                    "log", f"⏳ Waiting {delay / 60:.1f} minutes before next email..."),
+            )
+            self._scheduler.add_account(sender, send_next)
+            if not self._sending:
+                # Stop arrived while we were still logging in
+                self._scheduler.stop()
+            self._scheduler.run()
+
+            if self._scheduler.stopped:
+                self.bus.publish("log", "🛑 Sending stopped by user.")
+            else:
+                self.bus.publish("log", "✅ All emails sent successfully.")
         except Exception as e:
             self.bus.publish("log", f"❌ Error: {e}")
         finally:
@@ -141,4 +140,7 @@ class SendMailController:
             self.bus.publish("log", "⚠️ No sending process active.")
             return
         self._sending = False
+        if self._scheduler:
+            # Wakes the sending thread right away, even in the middle of a delay
+            self._scheduler.stop()
         self.bus.publish("log", "🛑 Stop command received.")
@@ -0,0 +1,216 @@
+# controller/smtp_pool.py
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+from .email_providers import provider_for, open_smtp_connection
+
+# "421 Service not available, closing transmission channel"
+_SERVICE_CLOSING = 421
+
+
+class _PooledConnection:
+    def __init__(self, key, host, server):
+        self.key = key
+        self.host = host
+        self.server = server
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    Authenticated SMTP sessions kept warm and shared between campaigns.
+
+    Sessions are keyed by (provider SMTP host, sender account) and at most
+    `max_per_host` sessions are open against one host at any time. A session that
+    sat idle for more than `health_check_after` seconds is checked with NOOP before
+    reuse; sessions idle for longer than `idle_timeout` are closed instead.
+    """
+
+    def __init__(self, max_per_host=4, health_check_after=30, idle_timeout=600,
+                 acquire_timeout=120, timeout=60):
+        self.max_per_host = max_per_host
+        self.health_check_after = health_check_after
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._idle = {}        # key -> [_PooledConnection], most recently used last
+        self._open = {}        # host -> number of open sessions (idle + checked out)
+        self._closed = False
+
+    # -----------------------------------------------------
+    # Public API
+    # -----------------------------------------------------
+    @contextmanager
+    def connection(self, sender, password):
+        """Check out a logged-in session for `sender`; it returns to the pool afterwards."""
+        conn = self._acquire(sender, password)
+        try:
+            yield conn.server
+        except BaseException as e:
+            if _is_connection_error(e):
+                self._discard(conn)
+            else:
+                self._release(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def send_message(self, sender, password, msg, to_addrs=None):
+        """
+        Send `msg` (an email.message.Message, or raw bytes together with `to_addrs`)
+        through a pooled session. A session that was dropped by the server (421,
+        disconnect or timeout) is replaced and the send retried once.
+        """
+        for attempt in range(2):
+            conn = self._acquire(sender, password)
+            try:
+                if isinstance(msg, (bytes, str)):
+                    result = conn.server.sendmail(sender, to_addrs, msg)
+                else:
+                    result = conn.server.send_message(msg, from_addr=sender, to_addrs=to_addrs)
+            except Exception as e:
+                if not _is_connection_error(e):
+                    self._release(conn)
+                    raise
+                self._discard(conn)
+                if attempt:
+                    raise
+                continue
+            self._release(conn)
+            return result
+
+    def close_all(self):
+        """Close every idle session and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conns in self._idle.values() for conn in conns]
+            self._idle.clear()
+            for conn in idle:
+                self._open[conn.host] -= 1
+            self._cond.notify_all()
+        for conn in idle:
+            _close_quietly(conn.server)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "open_per_host": dict(self._open),
+                "idle": sum(len(conns) for conns in self._idle.values()),
+            }
+
+    # -----------------------------------------------------
+    # Checkout / return
+    # -----------------------------------------------------
+    def _acquire(self, sender, password):
+        provider = provider_for(sender)
+        if not provider:
+            raise ValueError(f"Unsupported email domain: {sender.split('@')[-1].lower()}")
+        host = provider["smtp"]
+        key = (host, sender.lower())
+        deadline = time.monotonic() + self.acquire_timeout
+
+        conn = None
+        evicted = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("SMTP connection pool is closed")
+                idle = self._idle.get(key)
+                if idle:
+                    conn = idle.pop()
+                    break
+                if self._open.get(host, 0) < self.max_per_host:
+                    self._open[host] = self._open.get(host, 0) + 1
+                    break
+                # Host is at its cap: hand the slot of an idle session that belongs
+                # to another account on the same host over to this one.
+                evicted = self._pop_idle_for_host(host)
+                if evicted:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No SMTP connection to {host} available within {self.acquire_timeout}s")
+                self._cond.wait(remaining)
+
+        if evicted:
+            _close_quietly(evicted.server)
+        if conn is not None:
+            if self._is_healthy(conn):
+                return conn
+            # Keep the slot and replace the stale session with a new one
+            _close_quietly(conn.server)
+
+        try:
+            server = open_smtp_connection(provider, timeout=self.timeout)
+            server.login(sender, password)
+        except BaseException:
+            with self._cond:
+                self._open[host] -= 1
+                self._cond.notify()
+            raise
+        return _PooledConnection(key, host, server)
+
+    def _pop_idle_for_host(self, host):
+        oldest = None
+        for key, conns in self._idle.items():
+            if key[0] == host and conns and (oldest is None or conns[0].last_used < oldest[0].last_used):
+                oldest = conns
+        return oldest.pop(0) if oldest else None
+
+    def _is_healthy(self, conn):
+        idle_for = time.monotonic() - conn.last_used
+        if idle_for > self.idle_timeout:
+            return False
+        if idle_for <= self.health_check_after:
+            return True
+        try:
+            code, _ = conn.server.noop()
+        except Exception:
+            return False
+        return code == 250
+
+    def _release(self, conn):
+        conn.last_used = time.monotonic()
+        with self._cond:
+            if not self._closed:
+                self._idle.setdefault(conn.key, []).append(conn)
+                self._cond.notify()
+                return
+            self._open[conn.host] -= 1
+        _close_quietly(conn.server)
+
+    def _discard(self, conn):
+        _close_quietly(conn.server)
+        with self._cond:
+            self._open[conn.host] -= 1
+            self._cond.notify()
+
+
+def _is_connection_error(error):
+    """True for errors after which a session is dead and must be replaced."""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == _SERVICE_CLOSING
+    if isinstance(error, smtplib.SMTPException):
+        # e.g. refused recipients: the session itself is still usable
+        return False
+    # Socket errors and timeouts (SMTPException is itself an OSError, hence the order)
+    return isinstance(error, OSError)
+
+
+def _close_quietly(server):
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+# Process-wide pool so campaigns and workers in the same process share sessions
+shared_pool = SMTPConnectionPool()
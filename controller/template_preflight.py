@@ -0,0 +1,107 @@
+# controller/template_preflight.py
+import numpy as np
+import pandas as pd
+
+from .mail_merge import CompiledTemplate, template_text
+
+# info keys of the campaign templates, in sending order
+TEMPLATE_KEYS = ["main_template", "first_reminder", "second_reminder", "third_reminder"]
+# Cell values that would render as an empty or meaningless greeting
+_BLANK_VALUES = ["", "nan", "none", "null", "nat"]
+
+
+class PreflightReport:
+    """Result of checking a campaign's templates against its professor list"""
+
+    def __init__(self, total_rows):
+        self.total_rows = total_rows
+        self.template_errors = {}     # template key -> parse error
+        self.missing_columns = {}     # template key -> placeholders without a column
+        self.empty_values = {}        # column -> row positions with an empty value
+        self.invalid_recipients = []  # row positions without a recipient address
+
+    @property
+    def ok(self):
+        """True when the campaign can run to the end without a broken email."""
+        return not (self.template_errors or self.missing_columns or self.empty_values)
+
+    def messages(self, max_rows=10):
+        """Human readable lines, suitable for the send log."""
+        lines = []
+        for key, error in self.template_errors.items():
+            lines.append(f"❌ {key}: {error}")
+        for key, columns in self.missing_columns.items():
+            lines.append(f"❌ {key}: no column for placeholder(s) {', '.join(columns)}")
+        for column, rows in self.empty_values.items():
+            lines.append(f"❌ Column '{column}' is empty in {len(rows)} row(s): {_row_list(rows, max_rows)}")
+        if self.invalid_recipients:
+            lines.append(
+                f"⚠️ {len(self.invalid_recipients)} row(s) have no email and will be skipped: "
+                f"{_row_list(self.invalid_recipients, max_rows)}"
+            )
+        if self.ok:
+            lines.append(f"✅ Templates checked against {self.total_rows} professor(s).")
+        return lines
+
+
+def preflight_templates(templates, df, subject=None, recipient_column="email"):
+    """
+    Check `templates` ({key: template text}) and the main `subject` against the
+    columns of `df` and, in one vectorized sweep, against empty cells in every
+    column a placeholder uses. Only rows that will actually be sent are checked.
+    """
+    report = PreflightReport(len(df))
+    to_check = dict(templates)
+    if subject:
+        to_check["subject"] = subject
+
+    used_columns = []
+    for key, text in to_check.items():
+        if not text or not text.strip():
+            if key == TEMPLATE_KEYS[0]:
+                report.template_errors[key] = "template is empty"
+            continue
+        try:
+            compiled = CompiledTemplate(text)
+        except ValueError as e:
+            report.template_errors[key] = str(e)
+            continue
+        missing = [f for f in compiled.fields if f not in df.columns]
+        if missing:
+            report.missing_columns[key] = missing
+        used_columns.extend(f for f in compiled.fields if f in df.columns)
+
+    if recipient_column in df.columns:
+        recipients = df[recipient_column]
+        no_recipient = recipients.isna().to_numpy() | (recipients.astype(str).str.strip() == "").to_numpy()
+        report.invalid_recipients = np.flatnonzero(no_recipient).tolist()
+    else:
+        report.missing_columns.setdefault("recipients", []).append(recipient_column)
+        no_recipient = np.zeros(len(df), dtype=bool)
+
+    used_columns = list(dict.fromkeys(used_columns))
+    if used_columns and len(df):
+        values = df[used_columns]
+        normalized = values.astype(str).apply(lambda col: col.str.strip().str.lower())
+        # Not in place: to_numpy() may return a read-only view (pandas 3 copy-on-write)
+        blank = (values.isna() | normalized.isin(_BLANK_VALUES)).to_numpy() & ~no_recipient[:, None]
+        for i in np.flatnonzero(blank.any(axis=0)):
+            report.empty_values[used_columns[i]] = np.flatnonzero(blank[:, i]).tolist()
+
+    return report
+
+
+def preflight_campaign(info):
+    """Pre-flight check for the `info` dict sent with "start_sending"."""
+    df = info.get("professor_list")
+    if not isinstance(df, pd.DataFrame):
+        df = pd.DataFrame()
+    templates = {key: template_text(info.get(key)) for key in TEMPLATE_KEYS}
+    if template_text(info.get("body")):
+        templates[TEMPLATE_KEYS[0]] = template_text(info.get("body"))
+    return preflight_templates(templates, df, subject=info.get("txt_main_subject"))
+
+
+def _row_list(rows, max_rows):
+    shown = ", ".join(str(r + 1) for r in rows[:max_rows])
+    return shown + (", ..." if len(rows) > max_rows else "")
@@ -10,6 +10,8 @@ from typing import List
 from sqlalchemy import text
 
 from api.database import SessionLocal, engine
+from api.migrations import migrate
+from api.send_log_partitions import ensure_partitions
 from api.db_models import (
     EmailQueue,
     Base,
@@ -188,6 +190,10 @@ def main():
     with engine.begin() as conn:
         conn.execute(text("CREATE EXTENSION IF NOT EXISTS citext"))
     Base.metadata.create_all(bind=engine)
+    # Triggers, functions and send_log partitions live in DB/migrations
+    migrate(engine)
+    with engine.begin() as conn:
+        ensure_partitions(conn)
 
     session = SessionLocal()
     try:
@@ -1,15 +1,19 @@
 """
 Start the FastAPI server
 """
+import sys
+
 import uvicorn
 
 if __name__ == "__main__":
+    # On Windows, loop="none" makes uvicorn use the selector loop policy api.main sets on import
     uvicorn.run(
         "api.main:app",
         host="0.0.0.0",
         port=8000,
         reload=True,
-        log_level="info"
+        log_level="info",
+        loop="none" if sys.platform == "win32" else "auto"
     )
 
 
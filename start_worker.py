@@ -0,0 +1,42 @@
+"""
+Start a headless email queue worker
+
+Run several of these side by side to drain the queue in parallel.
+"""
+import argparse
+import logging
+import signal
+
+from api.queue_worker import EmailQueueWorker
+from api.send_log_writer import SendLogWriter
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ApplyChe email queue worker")
+    parser.add_argument("--batch-size", type=int, default=50, help="Rows claimed per batch")
+    parser.add_argument("--lease-seconds", type=int, default=900,
+                        help="Seconds before rows claimed by a dead worker return to the queue")
+    parser.add_argument("--poll-interval", type=float, default=5.0,
+                        help="Seconds to wait when the queue has nothing due")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--window-interval", type=float, default=60.0,
+                        help="Seconds between moving queued rows into professor-local send windows")
+    parser.add_argument("--partition-interval", type=float, default=3600.0,
+                        help="Seconds between checks that send_log has partitions for the coming months")
+    parser.add_argument("--send-log-dead-letters", metavar="PATH",
+                        help="NDJSON file receiving send_log rows that could not be written")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    worker = EmailQueueWorker(
+        batch_size=args.batch_size,
+        lease_seconds=args.lease_seconds,
+        poll_interval=args.poll_interval,
+        max_retries=args.max_retries,
+        window_interval=args.window_interval,
+        partition_interval=args.partition_interval,
+        send_log=SendLogWriter(dead_letter_path=args.send_log_dead_letters),
+    )
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    worker.run_forever()
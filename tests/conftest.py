@@ -0,0 +1,61 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+
+# A disposable PostgreSQL database; tests that need one are skipped without it
+TEST_DATABASE_URL = os.getenv("APPLYCHE_TEST_DATABASE_URL")
+
+
+@pytest.fixture
+def pg_url():
+    if not TEST_DATABASE_URL:
+        pytest.skip("APPLYCHE_TEST_DATABASE_URL is not set")
+    return TEST_DATABASE_URL
+
+
+def _create_engine(pg_url):
+    engine = create_engine(pg_url)
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT to_regtype('citext')")).scalar() is None:
+            conn.execute(text("CREATE EXTENSION citext"))
+    return engine
+
+
+@pytest.fixture
+def pg_engine(pg_url):
+    """Engine on the test database with the users and template tables freshly created."""
+    from api.db_models import Base, EmailTemplate, TemplateFile, User
+
+    tables = [User.__table__, EmailTemplate.__table__, TemplateFile.__table__]
+    engine = _create_engine(pg_url)
+    Base.metadata.drop_all(engine, tables=tables)
+    Base.metadata.create_all(engine, tables=tables)
+    yield engine
+    Base.metadata.drop_all(engine, tables=tables)
+    engine.dispose()
+
+
+@pytest.fixture
+def pg_schema(pg_url):
+    """Engine on the test database with every table of api.db_models freshly created."""
+    from api.db_models import Base
+
+    engine = _create_engine(pg_url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+        conn.execute(text("DROP SCHEMA IF EXISTS send_log_archive CASCADE"))
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def pg_migrated(pg_schema):
+    """pg_schema with DB/migrations applied on top (counter triggers, send_log partitions, ...)."""
+    from api.migrations import migrate
+
+    migrate(pg_schema)
+    return pg_schema
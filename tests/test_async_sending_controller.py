@@ -0,0 +1,28 @@
+import threading
+
+from controller.async_sending_controller import AsyncSendMailController
+
+
+class RecordingBus:
+    def __init__(self):
+        self.logs = []
+        self.logged = threading.Event()
+
+    def subscribe(self, event, handler):
+        pass
+
+    def publish(self, event, message):
+        self.logs.append(message)
+        self.logged.set()
+
+
+def test_errors_while_starting_a_campaign_are_reported():
+    bus = RecordingBus()
+    controller = AsyncSendMailController(bus, max_concurrency=1)
+    try:
+        controller.start_sending(None)  # not a campaign dict
+        assert bus.logged.wait(5)
+    finally:
+        controller.shutdown()
+
+    assert bus.logs[0] == "❌ Could not start sending: AttributeError(\"'NoneType' object has no attribute 'get'\")"
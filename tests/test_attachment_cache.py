@@ -0,0 +1,42 @@
+from controller.attachment_cache import AttachmentCache
+
+
+def test_same_content_under_two_names_keeps_each_name(tmp_path):
+    cv = tmp_path / "cv.pdf"
+    resume = tmp_path / "resume.pdf"
+    cv.write_bytes(b"%PDF same bytes")
+    resume.write_bytes(b"%PDF same bytes")
+    cache = AttachmentCache()
+
+    assert b'filename="cv.pdf"' in cache.part(str(cv))
+    assert b'filename="resume.pdf"' in cache.part(str(resume))
+    assert cache.part(str(cv)) == cache.part(str(cv))
+    assert cache.stats()["parts"] == 2
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_changed_file_is_reencoded(tmp_path):
+    cv = tmp_path / "cv.pdf"
+    cv.write_bytes(b"version one")
+    cache = AttachmentCache()
+    first = cache.part(str(cv))
+
+    cv.write_bytes(b"version two, longer")
+    assert cache.part(str(cv)) != first
+    assert len(cache._files) == 1
+
+
+def test_evicted_parts_leave_the_path_index(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"file{i}.bin"
+        path.write_bytes(bytes([i]) * 1000)
+        paths.append(str(path))
+    one_part = len(AttachmentCache().part(paths[0]))
+    cache = AttachmentCache(max_bytes=2 * one_part)
+
+    for path in paths:
+        cache.part(path)
+
+    assert cache.stats()["parts"] == 2
+    assert sorted(cache._files) == paths[-2:]
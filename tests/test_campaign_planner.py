@@ -0,0 +1,53 @@
+from datetime import datetime, time, timezone
+
+import numpy as np
+import pandas as pd
+
+from api.campaign_planner import _fit_days, _timestamps, daily_slots
+from api.db_models import SendingRules, SendType
+
+
+def _rules(**values):
+    defaults = dict(start_time_send=time(16, 0), delay_sending_mail=20, local_professor_time=False,
+                    send_working_day_only=False)
+    return SendingRules(**{**defaults, **values})
+
+
+def _plan(days, send_types=None, positions=None):
+    n = len(days)
+    return pd.DataFrame({
+        "position": np.arange(n) if positions is None else positions,
+        "send_type": np.zeros(n, dtype=np.int64) if send_types is None else send_types,
+        "day": np.asarray(days, dtype=np.int64),
+        "country": [None] * n,
+    })
+
+
+def test_daily_slots_fill_the_window():
+    assert daily_slots(_rules()) == 3                                     # 16:00, 16:20, 16:40
+    assert daily_slots(_rules(start_time_send=time(9, 0), delay_sending_mail=0)) == 96
+    assert daily_slots(_rules(start_time_send=time(18, 0), delay_sending_mail=60)) == 6  # until midnight
+
+
+def test_overfull_days_spill_into_the_next_and_stay_in_the_window():
+    rules = _rules()
+    plan = _plan([0] * 7)
+    _fit_days(plan, daily_slots(rules), period=1)
+    plan["slot"] = plan.groupby("day").cumcount().to_numpy()
+
+    assert plan["day"].tolist() == [0, 0, 0, 1, 1, 1, 2]
+    scheduled = _timestamps(rules, plan, datetime(2026, 3, 2, 8, 0, tzinfo=timezone.utc))
+    assert scheduled.dt.hour.tolist() == [16] * 7
+    assert scheduled.dt.day.tolist() == [2, 2, 2, 3, 3, 3, 4]
+
+
+def test_spilled_main_email_pushes_its_reminder_back():
+    main, reminder = SendType.MAIN, SendType.FIRST_REMINDER
+    plan = _plan([0, 0, 0, 1, 1], send_types=[main, main, main, reminder, reminder], positions=[0, 1, 2, 0, 1])
+    _fit_days(plan, per_day=2, period=1)
+
+    days = plan.set_index(["send_type", "position"])["day"]
+    assert days[(main, 2)] == 1
+    assert (plan.groupby("day").size() <= 2).all()
+    for position in (0, 1):
+        assert days[(reminder, position)] >= days[(main, position)] + 1
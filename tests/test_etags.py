@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import api.routes.email_templates as email_templates
+from api.database import get_async_db
+from api.main import app
+
+
+@pytest.fixture
+def client(pg_engine, pg_url):
+    with pg_engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (email, password_hash) VALUES ('a@uni.edu', 'x')"))
+        conn.execute(text(
+            "INSERT INTO email_templates (user_email, template_body, template_type, subject) "
+            "VALUES ('a@uni.edu', 'Dear {name}', 0, 'Hello')"
+        ))
+    engine = create_async_engine(pg_url, poolclass=NullPool)
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def get_test_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = get_test_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_async_db)
+
+
+def test_unchanged_templates_answer_304(client, pg_engine):
+    first = client.get("/api/email-templates/a@uni.edu")
+    etag = first.headers["ETag"]
+
+    assert client.get("/api/email-templates/a@uni.edu", headers={"If-None-Match": etag}).status_code == 304
+
+    with pg_engine.begin() as conn:
+        conn.execute(text("UPDATE email_templates SET subject = 'Hi'"))
+    changed = client.get("/api/email-templates/a@uni.edu", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["subject"] == "Hi"
+
+
+def test_etag_and_body_come_from_one_snapshot(client, pg_engine, monkeypatch):
+    versioned = email_templates._templates_etag
+
+    async def etag_then_concurrent_update(db, *criteria):
+        etag = await versioned(db, *criteria)
+        with pg_engine.begin() as conn:
+            conn.execute(text("UPDATE email_templates SET subject = 'Hi'"))
+        return etag
+
+    monkeypatch.setattr(email_templates, "_templates_etag", etag_then_concurrent_update)
+    stale = client.get("/api/email-templates/a@uni.edu")
+    monkeypatch.undo()
+
+    # The body matches the versions the ETag was built from, not the later write
+    assert stale.json()[0]["subject"] == "Hello"
+    fresh = client.get("/api/email-templates/a@uni.edu", headers={"If-None-Match": stale.headers["ETag"]})
+    assert fresh.status_code == 200
+    assert fresh.json()[0]["subject"] == "Hi"
@@ -0,0 +1,44 @@
+from api.event_hub import RESYNC, EventHub
+
+
+def _types(events):
+    return [event[1] for event in events]
+
+
+def test_replay_returns_the_missed_events():
+    hub = EventHub(buffer_size=3)
+    first = hub.publish("a@uni.edu", "queue", {})
+    hub.publish("A@uni.edu", "send", {})
+
+    assert _types(hub._replay("a@uni.edu", hub.event_id(first[0]))) == ["send"]
+    assert _types(hub._replay("a@uni.edu", "other-epoch-1")) == [RESYNC]
+
+
+def test_replay_past_a_buffer_overrun_resyncs():
+    hub = EventHub(buffer_size=2)
+    first = hub.publish("a@uni.edu", "queue", {})
+    for _ in range(3):
+        hub.publish("a@uni.edu", "queue", {})
+
+    assert _types(hub._replay("a@uni.edu", hub.event_id(first[0]))) == [RESYNC]
+
+
+def test_replay_after_the_users_buffer_was_evicted_resyncs():
+    hub = EventHub(max_users=1)
+    seen = hub.publish("a@uni.edu", "queue", {})
+    hub.publish("a@uni.edu", "send", {})
+    hub.publish("b@uni.edu", "queue", {})  # evicts a@uni.edu
+
+    assert _types(hub._replay("a@uni.edu", hub.event_id(seen[0]))) == [RESYNC]
+    # Also once a new event recreated the buffer without the lost one
+    hub.publish("a@uni.edu", "counters", {})
+    assert _types(hub._replay("a@uni.edu", hub.event_id(seen[0]))) == [RESYNC]
+
+
+def test_replay_after_the_listener_reconnected_resyncs():
+    hub = EventHub()
+    seen = hub.publish("a@uni.edu", "queue", {})
+    hub._resync_all()
+
+    assert _types(hub._replay("a@uni.edu", hub.event_id(seen[0]))) == [RESYNC]
+    assert _types(hub._replay("c@uni.edu", hub.event_id(seen[0]))) == [RESYNC]
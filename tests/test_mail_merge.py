@@ -0,0 +1,33 @@
+import pandas as pd
+
+from controller.mail_merge import CompiledTemplate, MailMerge, template_text
+
+# Shape of QTextEdit.toHtml(), as saved by EmailEditor
+QT_HTML = (
+    '<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.0//EN" "http://www.w3.org/TR/REC-html40/strict.dtd">\n'
+    '<html><head><meta name="qrichtext" content="1" /><meta charset="utf-8" /><style type="text/css">\n'
+    'p, li { white-space: pre-wrap; }\n'
+    '</style></head><body style=" font-family:\'Segoe UI\'; font-size:9pt;">\n'
+    '<p style=" margin-top:0px;">Dear Prof. {name},</p>\n'
+    '<p style="-qt-paragraph-type:empty; margin-top:0px;"><br /></p>\n'
+    '<p style=" margin-top:0px;">I enjoyed your work on <span style=" font-weight:700;">{major}</span> &amp; '
+    'more: <a href="https://me.example"><span>my site</span></a>.</p></body></html>'
+)
+
+
+def test_editor_html_renders_as_plain_text():
+    body = template_text({"html": QT_HTML, "attachments": []})
+    compiled = CompiledTemplate(body)
+
+    assert compiled.fields == ["name", "major"]
+    assert compiled.render({"name": "Smith", "major": "ML"}) == (
+        "Dear Prof. Smith,\n\nI enjoyed your work on ML & more: my site (https://me.example)."
+    )
+
+
+def test_render_all_matches_format_map():
+    df = pd.DataFrame({"email": ["a@uni.edu", None], "name": ["Ada", "Bob"], "pos": [{"x": 1}, {"x": 2}]})
+    template = "Hi {name!r:>8}, {pos[x]}"
+
+    assert CompiledTemplate(template).render_all(df) == [template.format_map(row) for row in df.to_dict("records")]
+    assert [m[1] for m in MailMerge("{name}", template).iter_messages(df)] == ["a@uni.edu"]
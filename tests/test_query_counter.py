@@ -0,0 +1,31 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from api.query_counter import benchmark_template_routes
+
+
+def test_template_routes_stay_within_budget(pg_engine, pg_url):
+    with pg_engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (email, password_hash) VALUES ('a@uni.edu', 'x')"))
+        for template_type in (0, 1):
+            template_id = conn.execute(text(
+                "INSERT INTO email_templates (user_email, template_body, template_type, subject) "
+                "VALUES ('a@uni.edu', 'Dear {name}', :t, 'Hello') RETURNING id"
+            ), {"t": template_type}).scalar()
+            conn.execute(text(
+                "INSERT INTO template_files (email_template_id, file_path) VALUES (:id, 'cv.pdf'), (:id, 'sop.pdf')"
+            ), {"id": template_id})
+
+    async def run():
+        engine = create_async_engine(pg_url)
+        try:
+            return await benchmark_template_routes(
+                "a@uni.edu", repeat=2,
+                session_factory=async_sessionmaker(engine, expire_on_commit=False), engine=engine,
+            )
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(run())
@@ -0,0 +1,140 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from api.db_models import EmailQueueStatus
+from api.queue_worker import EmailQueueWorker
+
+SENDER = "me@gmail.com"
+
+
+class FakePool:
+    """Records sends instead of talking SMTP; on_send runs after every message."""
+
+    def __init__(self, on_send=None):
+        self.sent = []
+        self.on_send = on_send
+
+    def send_message(self, sender, password, msg, to_addrs=None):
+        self.sent.append((sender, to_addrs))
+        if self.on_send:
+            self.on_send()
+
+    def close_all(self):
+        pass
+
+
+class FakeSendLog:
+    def __init__(self):
+        self.rows = []
+
+    def add(self, **row):
+        self.rows.append(row)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def queue_db(pg_schema):
+    with pg_schema.begin() as conn:
+        conn.execute(text("INSERT INTO users (email, password_hash) VALUES (:e, 'x')"), {"e": SENDER})
+        conn.execute(text(
+            "INSERT INTO email_properties (user_email, app_password, provider) VALUES (:e, 'pw', 'gmail.com')"
+        ), {"e": SENDER})
+    return pg_schema
+
+
+def _enqueue(engine, to_email, scheduled="now()", status=EmailQueueStatus.PENDING, last_attempt_at=None):
+    with engine.begin() as conn:
+        return conn.execute(text(
+            f"INSERT INTO email_queue (user_email, to_email, subject, body, scheduled_at, status, last_attempt_at) "
+            f"VALUES (:user, :to, 'Hi', 'Dear Prof', {scheduled}, :status, {last_attempt_at or 'NULL'}) RETURNING id"
+        ), {"user": SENDER, "to": to_email, "status": status}).scalar()
+
+
+def _rows(engine):
+    with engine.connect() as conn:
+        return {row.id: row for row in conn.execute(text(
+            "SELECT id, status, retry_count, scheduled_at, last_attempt_at FROM email_queue"
+        ))}
+
+
+def _worker(engine, pool=None, **kwargs):
+    return EmailQueueWorker(
+        session_factory=sessionmaker(engine), smtp_pool=pool or FakePool(), send_log=FakeSendLog(), **kwargs
+    )
+
+
+def test_expired_leases_are_claimed_before_due_rows(queue_db):
+    due = _enqueue(queue_db, "a@uni.edu", scheduled="now() - interval '1 day'")
+    expired = _enqueue(queue_db, "b@uni.edu", status=EmailQueueStatus.CLAIMED,
+                       last_attempt_at="now() - interval '1 hour'")
+    held = _enqueue(queue_db, "c@uni.edu", status=EmailQueueStatus.CLAIMED, last_attempt_at="now()")
+
+    worker = _worker(queue_db, batch_size=1, lease_seconds=60)
+    assert [item.id for item in worker.claim_batch()] == [expired]
+    assert [item.id for item in worker.claim_batch()] == [due]
+    assert worker.claim_batch() == []
+
+    rows = _rows(queue_db)
+    assert rows[expired].retry_count == 1
+    assert rows[due].retry_count == 0
+    assert rows[held].retry_count == 0
+
+
+def test_complete_needs_the_lease_it_was_claimed_with(queue_db):
+    queue_id = _enqueue(queue_db, "a@uni.edu")
+    worker = _worker(queue_db)
+    [item] = worker.claim_batch()
+
+    # Another worker reclaimed the row after our lease expired
+    with queue_db.begin() as conn:
+        conn.execute(text("UPDATE email_queue SET last_attempt_at = now() + interval '1 second' WHERE id = :id"),
+                     {"id": queue_id})
+
+    with worker.session_factory() as db:
+        assert not worker._complete(db, item, status=EmailQueueStatus.SENT)
+        db.commit()
+    assert _rows(queue_db)[queue_id].status == EmailQueueStatus.CLAIMED
+
+
+def test_stop_releases_unsent_claims(queue_db):
+    ids = [_enqueue(queue_db, f"p{i}@uni.edu") for i in range(3)]
+    worker = _worker(queue_db)
+    worker.smtp_pool = FakePool(on_send=worker.stop)
+
+    worker.process_batch(worker.claim_batch())
+
+    rows = _rows(queue_db)
+    assert len(worker.smtp_pool.sent) == 1
+    assert rows[ids[0]].status == EmailQueueStatus.SENT
+    for queue_id in ids[1:]:
+        assert rows[queue_id].status == EmailQueueStatus.PENDING
+        assert rows[queue_id].retry_count == 0
+
+
+def test_sends_of_one_account_are_paced(queue_db):
+    with queue_db.begin() as conn:
+        conn.execute(text("INSERT INTO sending_rules (user_email, delay_sending_mail) VALUES (:e, 2)"),
+                     {"e": SENDER})
+    ids = [_enqueue(queue_db, f"p{i}@uni.edu") for i in range(3)]
+    worker = _worker(queue_db, poll_interval=5)
+
+    worker.process_batch(worker.claim_batch())
+
+    rows = _rows(queue_db)
+    assert len(worker.smtp_pool.sent) == 1
+    assert rows[ids[0]].status == EmailQueueStatus.SENT
+    first, second = rows[ids[1]], rows[ids[2]]
+    assert first.status == second.status == EmailQueueStatus.PENDING
+    assert first.scheduled_at - rows[ids[0]].last_attempt_at >= timedelta(seconds=115)
+    assert second.scheduled_at - first.scheduled_at == timedelta(minutes=2)
+    # Nothing is due yet, and a row enqueued later is slotted after the others
+    assert worker.claim_batch() == []
+    late = _enqueue(queue_db, "late@uni.edu")
+    worker.process_batch(worker.claim_batch())
+    assert len(worker.smtp_pool.sent) == 1
+    assert _rows(queue_db)[late].scheduled_at - second.scheduled_at == timedelta(minutes=2)
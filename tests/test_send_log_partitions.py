@@ -0,0 +1,72 @@
+from datetime import date
+
+from sqlalchemy import text
+
+from api.migrations import migrate
+from api.send_log_partitions import ARCHIVE_SCHEMA, apply_retention, ensure_partitions, list_partitions
+
+
+def _log(conn, sent_time):
+    conn.execute(text(
+        "INSERT INTO send_log (user_email, sent_to, sent_time, send_type, delivery_status) "
+        "VALUES ('me@uni.edu', 'p@uni.edu', :at, 0, 1)"
+    ), {"at": sent_time})
+
+
+def _months(conn, start, count):
+    conn.execute(text("SELECT send_log_ensure_partitions(:start, :count)"), {"start": start, "count": count})
+
+
+def test_migration_partitions_an_existing_send_log(pg_schema):
+    with pg_schema.begin() as conn:
+        conn.execute(text("DROP TABLE send_log"))
+        conn.execute(text(
+            "CREATE TABLE send_log (id BIGSERIAL PRIMARY KEY, user_email CITEXT NOT NULL REFERENCES users(email), "
+            "sent_to CITEXT NOT NULL, sent_time TIMESTAMPTZ NOT NULL DEFAULT now(), subject TEXT, body TEXT, "
+            "template_id INTEGER, send_type SMALLINT NOT NULL, delivery_status SMALLINT NOT NULL, "
+            "remote_message_id TEXT)"
+        ))
+        conn.execute(text("INSERT INTO users (email, password_hash) VALUES ('me@uni.edu', 'x')"))
+        _log(conn, "2025-11-20 10:00+00")
+        _log(conn, "2026-01-05 10:00+00")
+
+    migrate(pg_schema)
+
+    months = [month for _, month in list_partitions(pg_schema)]
+    assert months[0] is None                                    # the default partition is listed first
+    assert months[1:4] == [date(2025, 11, 1), date(2025, 12, 1), date(2026, 1, 1)]
+    with pg_schema.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM send_log_y2025m11")).scalar() == 1
+        assert conn.execute(text("SELECT count(*) FROM send_log_y2026m01")).scalar() == 1
+        assert conn.execute(text("SELECT count(*) FROM send_log_default")).scalar() == 0
+        # New rows keep getting ids from the old sequence
+        _log(conn, "2026-01-06 10:00+00")
+        assert conn.execute(text("SELECT max(id) FROM send_log")).scalar() == 3
+
+
+def test_new_month_takes_its_rows_over_from_the_default_partition(pg_migrated):
+    with pg_migrated.begin() as conn:
+        assert ensure_partitions(conn) == 0
+        conn.execute(text("INSERT INTO users (email, password_hash) VALUES ('me@uni.edu', 'x')"))
+        _log(conn, "2099-05-10 10:00+00")
+        _months(conn, "2099-05-01", 1)
+
+    with pg_migrated.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM send_log_y2099m05")).scalar() == 1
+        assert conn.execute(text("SELECT count(*) FROM send_log_default")).scalar() == 0
+
+
+def test_retention_archives_or_drops_old_months(pg_migrated):
+    with pg_migrated.begin() as conn:
+        _months(conn, "2024-01-01", 3)
+        conn.execute(text("INSERT INTO users (email, password_hash) VALUES ('me@uni.edu', 'x')"))
+        _log(conn, "2024-01-15 10:00+00")
+
+    assert apply_retention(pg_migrated, keep_months=2, today=date(2024, 3, 10)) == ["send_log_y2024m01"]
+    assert apply_retention(pg_migrated, keep_months=1, drop=True, today=date(2024, 3, 10)) == ["send_log_y2024m02"]
+
+    with pg_migrated.connect() as conn:
+        assert conn.execute(text(f"SELECT count(*) FROM {ARCHIVE_SCHEMA}.send_log_y2024m01")).scalar() == 1
+        assert conn.execute(text("SELECT to_regclass('send_log_y2024m02')")).scalar() is None
+        assert conn.execute(text("SELECT count(*) FROM send_log")).scalar() == 0
+    assert date(2024, 3, 1) in [month for _, month in list_partitions(pg_migrated)]
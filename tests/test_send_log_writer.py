@@ -0,0 +1,71 @@
+import json
+from contextlib import contextmanager
+
+from sqlalchemy import exc
+
+from api.send_log_writer import SendLogWriter
+
+
+class FakeEngine:
+    """Stands in for an Engine: records inserted rows, rejects some, or is 'down'"""
+
+    def __init__(self, bad_recipients=()):
+        self.bad_recipients = set(bad_recipients)
+        self.down = False
+        self.rows = []
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    def execute(self, statement, rows):
+        if self.down:
+            raise exc.OperationalError("INSERT", {}, Exception("connection refused"))
+        if any(row["sent_to"] in self.bad_recipients for row in rows):
+            raise exc.IntegrityError("INSERT", {}, Exception("violates foreign key constraint"))
+        self.rows.extend(rows)
+
+
+def _writer(engine, **kwargs):
+    writer = SendLogWriter(engine=engine, use_copy=False, **kwargs)
+    writer._start = lambda: None  # flushed by hand
+    return writer
+
+
+def test_bad_row_is_dead_lettered_without_blocking_the_batch(tmp_path):
+    engine = FakeEngine(bad_recipients={"bad@uni.edu"})
+    dead_letters = tmp_path / "dead.ndjson"
+    writer = _writer(engine, dead_letter_path=str(dead_letters))
+    for to in ("a@uni.edu", "bad@uni.edu", "b@uni.edu"):
+        writer.add(user_email="me@x.com", sent_to=to, send_type=0, delivery_status=1)
+
+    assert writer.flush() == 2
+    assert [row["sent_to"] for row in engine.rows] == ["a@uni.edu", "b@uni.edu"]
+    assert writer.pending() == 0
+    [record] = [json.loads(line) for line in dead_letters.read_text().splitlines()]
+    assert record["sent_to"] == "bad@uni.edu" and "foreign key" in record["reason"]
+
+
+def test_rows_are_retried_while_the_database_is_down_then_dead_lettered():
+    engine = FakeEngine()
+    writer = _writer(engine, max_retries=2)
+    writer.add(user_email="me@x.com", sent_to="a@uni.edu", send_type=0, delivery_status=1)
+
+    engine.down = True
+    assert writer.flush() == 0 and writer.pending() == 1
+    assert writer.flush() == 0 and writer.pending() == 1
+    assert writer.flush() == 0 and writer.pending() == 0
+    assert writer.dead_lettered == 1
+
+    writer.add(user_email="me@x.com", sent_to="b@uni.edu", send_type=0, delivery_status=1)
+    engine.down = False
+    assert writer.flush() == 1
+
+
+def test_buffer_is_capped():
+    writer = _writer(FakeEngine(), max_buffered=3, batch_size=100)
+    for i in range(5):
+        writer.add(user_email="me@x.com", sent_to=f"{i}@uni.edu", send_type=0, delivery_status=1)
+
+    assert writer.pending() == 3
+    assert writer.dead_lettered == 2
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from controller.send_scheduler import SendScheduler
+
+
+def _account(name, count, sent):
+    remaining = [count]
+
+    def send_next():
+        sent.append(name)
+        remaining[0] -= 1
+        return remaining[0] > 0
+
+    return send_next
+
+
+def test_accounts_are_paced_independently_and_interleaved():
+    sent, waits = [], []
+    scheduler = SendScheduler(delay_range=(0.05, 0.05), on_wait=lambda account, delay: waits.append((account, delay)))
+    scheduler.add_account("a", _account("a", 3, sent))
+    scheduler.add_account("b", _account("b", 2, sent))
+
+    started = time.monotonic()
+    scheduler.run()
+
+    assert sent == ["a", "b", "a", "b", "a"]
+    assert waits == [("a", 0.05), ("b", 0.05), ("a", 0.05)]
+    assert time.monotonic() - started >= 0.1  # account a waited twice
+
+
+def test_stop_wakes_a_waiting_scheduler():
+    sent = []
+    scheduler = SendScheduler(delay_range=(60, 60))
+    scheduler.add_account("a", _account("a", 5, sent))
+    thread = threading.Thread(target=scheduler.run, kwargs={"until_idle": False})
+    thread.start()
+    while not sent:
+        time.sleep(0.01)
+
+    scheduler.stop()
+    thread.join(timeout=1)
+
+    assert not thread.is_alive()
+    assert sent == ["a"]
+
+
+def test_replaced_account_drops_its_old_schedule():
+    sent = []
+    scheduler = SendScheduler(delay_range=(0, 0))
+    scheduler.add_account("a", _account("old", 5, sent), start_at=time.monotonic() + 60)
+    scheduler.add_account("a", _account("new", 2, sent))
+
+    scheduler.run()
+
+    assert sent == ["new", "new"]
+
+
+def test_failing_account_is_removed_and_the_error_raised():
+    scheduler = SendScheduler(delay_range=(0, 0))
+
+    def broken():
+        raise RuntimeError("SMTP down")
+
+    scheduler.add_account("a", broken)
+    with pytest.raises(RuntimeError):
+        scheduler.run()
+    scheduler.run()  # nothing left to send
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from api.send_windows import align_queue
+
+# A Monday, after the 09:00-17:00 window (professors without a known country are on UTC)
+NOW = datetime(2026, 3, 2, 18, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def queue_db(pg_schema):
+    with pg_schema.begin() as conn:
+        conn.execute(text("INSERT INTO users (email, password_hash) VALUES ('me@uni.edu', 'x')"))
+        conn.execute(text(
+            "INSERT INTO sending_rules (user_email, local_professor_time, send_working_day_only, delay_sending_mail) "
+            "VALUES ('me@uni.edu', true, true, 10)"
+        ))
+    return pg_schema
+
+
+def _enqueue(engine, scheduled_at):
+    with engine.begin() as conn:
+        return conn.execute(text(
+            "INSERT INTO email_queue (user_email, to_email, scheduled_at) VALUES ('me@uni.edu', 'p@uni.edu', :at) "
+            "RETURNING id"
+        ), {"at": scheduled_at}).scalar()
+
+
+def _scheduled(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(text("SELECT id, scheduled_at FROM email_queue")).all())
+
+
+def test_rows_moved_into_a_window_keep_their_order_and_spacing(queue_db):
+    overdue = _enqueue(queue_db, NOW - timedelta(hours=2))
+    late = [_enqueue(queue_db, NOW + timedelta(minutes=m)) for m in (2, 1)]
+    inside = _enqueue(queue_db, NOW + timedelta(hours=16))          # Tuesday 10:00
+
+    with Session(queue_db) as db:
+        assert align_queue(db, now=NOW) == 3
+        db.commit()
+
+    tuesday_nine = datetime(2026, 3, 3, 9, 0, tzinfo=timezone.utc)
+    scheduled = _scheduled(queue_db)
+    assert scheduled[overdue] == tuesday_nine
+    assert scheduled[late[1]] == tuesday_nine + timedelta(minutes=10)
+    assert scheduled[late[0]] == tuesday_nine + timedelta(minutes=20)
+    assert scheduled[inside] == NOW + timedelta(hours=16)
+
+
+def test_horizon_leaves_later_rows_for_later_ticks(queue_db):
+    soon = _enqueue(queue_db, NOW + timedelta(minutes=1))
+    friday_night = _enqueue(queue_db, NOW + timedelta(days=4, hours=3))
+
+    with Session(queue_db) as db:
+        assert align_queue(db, now=NOW, horizon=timedelta(minutes=2)) == 1
+        db.commit()
+
+    scheduled = _scheduled(queue_db)
+    assert scheduled[soon] == datetime(2026, 3, 3, 9, 0, tzinfo=timezone.utc)
+    assert scheduled[friday_night] == NOW + timedelta(days=4, hours=3)
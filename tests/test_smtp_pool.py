@@ -0,0 +1,97 @@
+import smtplib
+import socket
+
+import pytest
+
+from controller.smtp_pool import SMTPConnectionPool
+
+
+class FakeSMTP:
+    """Stands in for smtplib.SMTP / SMTP_SSL; `failures` are raised by the next sendmail calls."""
+
+    opened = []
+    failures = []
+
+    def __init__(self, host, port, timeout=None):
+        self.host = host
+        self.logins = []
+        self.sent = []
+        self.closed = False
+        FakeSMTP.opened.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        self.logins.append(user)
+
+    def sendmail(self, sender, to_addrs, msg):
+        if FakeSMTP.failures:
+            raise FakeSMTP.failures.pop(0)
+        self.sent.append((sender, to_addrs))
+        return {}
+
+    def noop(self):
+        return 250, b"OK"
+
+    def quit(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    FakeSMTP.opened = []
+    FakeSMTP.failures = []
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    monkeypatch.setattr(smtplib, "SMTP_SSL", FakeSMTP)
+    return SMTPConnectionPool(max_per_host=2)
+
+
+def test_sessions_are_keyed_by_host_and_lower_cased_sender(pool):
+    pool.send_message("Me@gmail.com", "pw", b"raw", to_addrs=["a@uni.edu"])
+    pool.send_message("me@GMAIL.com", "pw", b"raw", to_addrs=["b@uni.edu"])
+    pool.send_message("other@gmail.com", "pw", b"raw", to_addrs=["c@uni.edu"])
+
+    assert len(FakeSMTP.opened) == 2
+    assert [server.host for server in FakeSMTP.opened] == ["smtp.gmail.com"] * 2
+    assert len(FakeSMTP.opened[0].sent) == 2
+    assert pool.stats() == {"open_per_host": {"smtp.gmail.com": 2}, "idle": 2}
+
+
+@pytest.mark.parametrize("failure", [
+    smtplib.SMTPResponseException(421, b"Service not available"),
+    smtplib.SMTPServerDisconnected("Connection unexpectedly closed"),
+    socket.timeout("timed out"),
+])
+def test_dropped_session_is_replaced_and_the_send_retried_once(pool, failure):
+    pool.send_message("me@gmail.com", "pw", b"raw", to_addrs=["a@uni.edu"])
+    FakeSMTP.failures = [failure]
+
+    pool.send_message("me@gmail.com", "pw", b"raw", to_addrs=["b@uni.edu"])
+
+    stale, fresh = FakeSMTP.opened
+    assert stale.closed
+    assert fresh.sent == [("me@gmail.com", ["b@uni.edu"])]
+    assert pool.stats() == {"open_per_host": {"smtp.gmail.com": 1}, "idle": 1}
+
+
+def test_a_second_failure_is_raised_and_no_session_is_kept(pool):
+    FakeSMTP.failures = [smtplib.SMTPServerDisconnected("gone"), smtplib.SMTPServerDisconnected("gone again")]
+
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        pool.send_message("me@gmail.com", "pw", b"raw", to_addrs=["a@uni.edu"])
+
+    assert len(FakeSMTP.opened) == 2
+    assert all(server.closed for server in FakeSMTP.opened)
+    assert pool.stats() == {"open_per_host": {"smtp.gmail.com": 0}, "idle": 0}
+
+
+def test_refused_recipient_keeps_the_session_without_retrying(pool):
+    FakeSMTP.failures = [smtplib.SMTPRecipientsRefused({"a@uni.edu": (550, b"No such user")})]
+
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        pool.send_message("me@gmail.com", "pw", b"raw", to_addrs=["a@uni.edu"])
+
+    [server] = FakeSMTP.opened
+    assert not server.closed
+    assert pool.stats() == {"open_per_host": {"smtp.gmail.com": 1}, "idle": 1}
@@ -0,0 +1,41 @@
+import pandas as pd
+
+from controller.template_preflight import preflight_campaign, preflight_templates
+
+
+def _professors():
+    return pd.DataFrame({
+        "email": ["a@uni.edu", "", "c@uni.edu"],
+        "name": ["Ada", None, " "],
+    })
+
+
+def test_unknown_placeholders_and_broken_templates_are_reported():
+    df = pd.DataFrame({"email": ["a@uni.edu", " "]})
+    report = preflight_templates(
+        {"main_template": "Dear {nmae}", "first_reminder": "Hi {", "second_reminder": ""}, df, subject="Re: {title}"
+    )
+
+    assert report.missing_columns == {"main_template": ["nmae"], "subject": ["title"]}
+    assert list(report.template_errors) == ["first_reminder"]
+    assert report.invalid_recipients == [1]
+    assert not report.ok
+
+
+def test_blank_cells_of_unsent_rows_are_ignored():
+    report = preflight_templates({"main_template": "Dear {name}"}, _professors())
+
+    assert report.invalid_recipients == [1]
+    assert report.empty_values == {"name": [2]}
+    assert not report.ok
+
+
+def test_campaign_with_placeholders_passes():
+    df = pd.DataFrame({"email": ["a@uni.edu", "b@uni.edu"], "name": ["Ada", "Bob"]})
+    report = preflight_campaign({
+        "professor_list": df,
+        "main_template": {"html": "Dear {name}", "attachments": []},
+        "txt_main_subject": "Hello {name}",
+    })
+
+    assert report.ok, report.messages()
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from api.university_quota import UniversityQuotaIndex, universities_of
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _seeded_index(pg_migrated, clock, sent_hours_ago=(), contacted_hours_ago=()):
+    """me@uni.edu may send 2 main emails per university per day; earlier sends go to university 1."""
+    now = datetime.fromtimestamp(clock(), tz=timezone.utc)
+    with pg_migrated.begin() as conn:
+        conn.execute(text("INSERT INTO users (email, password_hash) VALUES ('me@uni.edu', 'x')"))
+        conn.execute(text("INSERT INTO sending_rules (user_email, max_email_per_university) VALUES ('me@uni.edu', 2)"))
+        conn.execute(text("INSERT INTO universities (id, name) VALUES (1, 'One'), (2, 'Two')"))
+        for i in range(4):
+            conn.execute(text("INSERT INTO professors (email, name, university_id) VALUES (:e, 'Prof', :u)"),
+                         {"e": f"p{i}@one.edu", "u": 1})
+        conn.execute(text("INSERT INTO professors (email, name, university_id) VALUES ('q@two.edu', 'Prof', 2)"))
+        for i, hours in enumerate(sent_hours_ago):
+            conn.execute(text(
+                "INSERT INTO send_log (user_email, sent_to, sent_time, send_type, delivery_status) "
+                "VALUES ('me@uni.edu', :to, :at, 0, 1)"
+            ), {"to": f"p{i}@one.edu", "at": now - timedelta(hours=hours)})
+        for i, hours in enumerate(contacted_hours_ago):
+            conn.execute(text(
+                "INSERT INTO professor_contact (user_email, professor_email, last_contact_time) "
+                "VALUES ('me@uni.edu', :p, :at)"
+            ), {"p": f"p{i}@one.edu", "at": now - timedelta(hours=hours)})
+    index = UniversityQuotaIndex(clock=clock)
+    with Session(pg_migrated) as db:
+        index.ensure_seeded(db, ["Me@uni.edu"])
+    return index
+
+
+def test_quota_counts_sends_within_the_sliding_window(pg_migrated):
+    clock = Clock()
+    index = _seeded_index(pg_migrated, clock, sent_hours_ago=[30])
+
+    assert index.try_acquire("me@uni.edu", 1)
+    assert index.try_acquire("ME@uni.edu", 1)
+    assert not index.try_acquire("me@uni.edu", 1)
+    assert index.try_acquire("me@uni.edu", 2)
+    assert index.try_acquire("me@uni.edu", None)
+
+    clock.now += 24 * 3600
+    assert index.try_acquire("me@uni.edu", 1)
+
+
+def test_release_gives_the_slot_back(pg_migrated):
+    clock = Clock()
+    index = _seeded_index(pg_migrated, clock, sent_hours_ago=[1])
+
+    assert index.try_acquire("me@uni.edu", 1)
+    index.release("me@uni.edu", 1)
+    assert index.try_acquire("me@uni.edu", 1)
+    assert not index.try_acquire("me@uni.edu", 1)
+
+
+def test_seed_counts_each_contacted_professor_once(pg_migrated):
+    clock = Clock()
+    # p0 is both logged and a contact; p1 only a contact
+    index = _seeded_index(pg_migrated, clock, sent_hours_ago=[5], contacted_hours_ago=[2, 3])
+
+    assert not index.try_acquire("me@uni.edu", 1)
+    # The oldest counted send (p1, 3 hours ago) leaves the window first
+    assert index.next_allowed_at("me@uni.edu", 1) == datetime.fromtimestamp(clock() + 21 * 3600, tz=timezone.utc)
+    with Session(pg_migrated) as db:
+        assert universities_of(db, ["P0@one.edu", "q@two.edu", "nobody@x.edu"]) == {"p0@one.edu": 1, "q@two.edu": 2}
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from api.user_counters import backfill_counters, read_counters
+
+
+def _counters(pg_url, user_email):
+    async def run():
+        engine = create_async_engine(pg_url)
+        try:
+            async with AsyncSession(engine) as db:
+                return await read_counters(db, user_email)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_backfill_merges_case_variants_of_an_address(pg_migrated, pg_url):
+    with pg_migrated.connect() as conn:
+        if conn.execute(text("SELECT typtype FROM pg_type WHERE typname = 'citext'")).scalar() != "b":
+            pytest.skip("needs the citext extension")
+    with pg_migrated.begin() as conn:
+        # Created before the counters existed: neither marked nor counted
+        conn.execute(text("ALTER TABLE users DISABLE TRIGGER trg_users_counters_ready"))
+        conn.execute(text("INSERT INTO users (email, password_hash) VALUES ('Ada@uni.edu', 'x')"))
+        conn.execute(text("ALTER TABLE users ENABLE TRIGGER trg_users_counters_ready"))
+        conn.execute(text(
+            "INSERT INTO email_queue (user_email, to_email, scheduled_at) "
+            "VALUES ('Ada@uni.edu', 'p1@uni.edu', now()), ('ada@uni.edu', 'p2@uni.edu', now()), "
+            "('ADA@UNI.EDU', 'p3@uni.edu', now())"
+        ))
+    assert _counters(pg_url, "ada@uni.edu") is None
+
+    assert backfill_counters(pg_migrated) == 1
+
+    assert _counters(pg_url, "ada@uni.edu")["emails_remaining"] == 3
+
+
+def test_new_users_read_counters_without_backfill(pg_migrated, pg_url):
+    with pg_migrated.begin() as conn:
+        conn.execute(text("INSERT INTO users (email, password_hash) VALUES ('bob@uni.edu', 'x')"))
+    assert _counters(pg_url, "bob@uni.edu")["emails_remaining"] == 0
+
+    with pg_migrated.begin() as conn:
+        conn.execute(text("INSERT INTO email_queue (user_email, to_email, scheduled_at) "
+                          "VALUES ('bob@uni.edu', 'p@uni.edu', now())"))
+    assert _counters(pg_url, "bob@uni.edu")["emails_remaining"] == 1
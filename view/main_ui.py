@@ -377,9 +377,19 @@ class EmailEditor(QtCore.QObject):
             "third_reminder": (3, self.txt_third_reminder)
         }
         
+        # One request for all four templates; fall back to one request per type
+        try:
+            latest = self.api_client.get_workspace(self.user_email)["templates"]
+        except Exception as e:
+            print(f"Workspace not available, loading templates one by one: {e}")
+            latest = None
+        
         for template_key, (template_type, editor) in template_mapping.items():
             try:
-                template = self.api_client.get_template_by_type(self.user_email, template_type)
+                if latest is not None:
+                    template = latest.get(str(template_type))
+                else:
+                    template = self.api_client.get_template_by_type(self.user_email, template_type)
                 if template:
                     # Store template ID for updates
                     self.template_ids[template_key] = template.get("id")